@@ -1,21 +1,53 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from services.orchestrator import WorkoutOrchestrator
 from fastapi.middleware.cors import CORSMiddleware 
-from models.user import FitnessGoal, PhysicalStats, Restrictions, UserPreferences, UserProfile
+from fastapi.responses import StreamingResponse
 from models.schemas import (
-    ChatIn, ChatOut, ChatStage, ConversationState, Basics, GoalBlock, PrefsConstraints,
+    ChatIn, ChatOut, ChatStage, PlanJobIn, ConversationState, Basics, GoalBlock, PrefsConstraints,
     GENDER, ACTIVITY, GOALS, EQUIPMENT, WORKOUT_TYPES, TIMES
 )
+import asyncio
+import base64
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import tempfile
 import uuid
-from typing import Dict
+from typing import AsyncIterator, Dict, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
 
 from services.transcription import (
-    save_upload_to_temp,
+    decode_upload,
     transcribe_audio_to_text,
     extract_fields_from_transcript,
     compute_missing,
-    _get_whisper_model,
+    get_transcription_backend,
+    local_transcription_status,
+    transcription_mode,
+    MAX_UPLOAD_BYTES,
 )
+from services.backend_router import get_backend_router
+from services.bulk_plans import ORDERS, BulkPlanner, Checkpoint, CheckpointBusy, bulk_slots, detect_format, iter_lines, parse_rows
+from services.fast_extract import extraction_stats
+from services.llm_client import close_llm_client
+from services.plan_cache import create_plan_cache
+from services.plan_engine import create_plan_engine
+from services.plan_jobs import create_plan_job_queue
+from services.profiles import create_user_profile
+from services.response_cache import create_response_cache
+from services.session_store import create_session_store
+from services.streaming_transcription import create_streaming_transcriber, stream_limiter
+from services.structured_plan import structured_plans_enabled
+from services.speculation import create_plan_speculator, predicted_prefs
+from services.state_codec import STATE_ENCODING, encode_state
+from services.telemetry import TimingMiddleware, flatten_stats, metrics, span
+from services.transcript_cache import create_transcript_cache, transcript_cache_key
+from services.upload_limit import MULTIPART_OVERHEAD_BYTES, UploadLimitMiddleware
+from services.vad import vad_stats
 
 app = FastAPI(title="Mylo AI Fitness", description="AI-powered workout generation API")
 app.add_middleware(
@@ -24,36 +56,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["Server-Timing"],
+)
+app.add_middleware(TimingMiddleware)
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    paths=("/speech/transcribe", "/speech/turn"),
 )
 
-orchestrator = WorkoutOrchestrator()
-
-
-def create_user_profile(state: ConversationState) -> UserProfile:
-    """Create a UserProfile from conversation state"""
-    return UserProfile(
-        user_id=state.session_id,
-        name=state.basics.name or "User",
-        physical_stats=PhysicalStats(
-            height=state.basics.height_cm,
-            weight=state.basics.weight_kg,
-            gender=state.basics.gender,
-            age=state.basics.age
-        ),
-        goals=[FitnessGoal(goal_type=goal) for goal in state.goals_block.goals],
-        preferences=UserPreferences(
-            preferred_workout_types=state.prefs.preferred_workout_types,
-            preferred_training_times=state.prefs.preferred_training_times
-        ),
-        activity_level=state.basics.activity_level,
-        restrictions=Restrictions(
-            injuries=state.prefs.injuries,
-            equipment=state.prefs.equipment,
-            not_preferred_exercises=state.prefs.not_preferred_exercises,
-            special_considerations=state.prefs.special_considerations
-        ),
-        created_at=None
-    )
+orchestrator = WorkoutOrchestrator(
+    ack_cache=create_response_cache(),
+    plan_cache=create_plan_cache(),
+    plan_engine=create_plan_engine(),
+    structured_plans=structured_plans_enabled(),
+)
+sessions = create_session_store()
+transcript_cache = create_transcript_cache()
+
+
+def store_job_workout(job: Dict) -> None:
+    """Copy a finished background plan into its session"""
+    state = sessions.get(job["session_id"])
+    if state is not None:
+        state.workout = job["workout"]
+        state.plan = orchestrator.structured_plan(job["workout"], create_user_profile(state))
+        sessions.put(state)
+
+
+# Shared by every /plans/bulk request so uploads together never take more than their share of the LLM pool
+BULK_SLOTS = bulk_slots(orchestrator)
+bulk_semaphore = asyncio.Semaphore(BULK_SLOTS)
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(20 * 1024 * 1024)))
+
+plan_jobs = create_plan_job_queue(orchestrator, on_success=store_job_workout)
+speculator = create_plan_speculator(orchestrator)
+
+
+def speculate_plan(state: ConversationState) -> None:
+    """Start the plan for predicted FINAL-stage answers while the user is still filling them in"""
+    if speculator is None:
+        return
+    try:
+        user_profile = create_user_profile(state.model_copy(update={"prefs": predicted_prefs()}))
+    except ValueError:
+        # Incomplete basics; the FINAL stage will fail validation anyway
+        return
+    speculator.start(state.session_id, user_profile)
 
 
 @app.get("/")
@@ -63,34 +112,109 @@ async def root():
 
 
 def get_or_create_state(session_id: str, stage: ChatStage) -> ConversationState:
-    """Get existing conversation state or create new one"""
-    if not hasattr(app, 'conversation_states'):
-        app.conversation_states = {}
-    
-    state = app.conversation_states.get(session_id)
+    """Get existing conversation state or create new one.
+
+    The state is a copy: changes persist only through ``sessions.put``,
+    and concurrent turns on one session are last-writer-wins.
+    """
+    state = sessions.get(session_id) if session_id else None
     if not state:
         state = ConversationState(
             session_id=session_id or str(uuid.uuid4()),
             stage=stage,
             missing=[]
         )
-        app.conversation_states[state.session_id] = state
     
     state.stage = stage
     return state
 
-@app.post("/chat/ingest")
-async def chat_ingest(chat_in: ChatIn) -> ChatOut:
-    """Handle the 3-step chat intake process"""
-    state = get_or_create_state(chat_in.session_id, chat_in.stage)
+
+@app.get("/ready")
+async def ready() -> Dict:
+    """Readiness probe: chat is served once the app has started; reports local transcription too"""
+    return {"chat": True, "transcription": await local_transcription_status()}
+
+
+@app.get("/ready/transcription")
+async def transcription_ready() -> JSONResponse:
+    """Readiness of local transcription: 503 until the Whisper workers (or the separate worker) can take clips"""
+    status = await local_transcription_status()
+    return JSONResponse(status, status_code=200 if status.get("ready") else 503)
+
+
+@app.get("/stats")
+async def stats() -> Dict:
+    """Session store and cache counters"""
+    return {
+        "sessions": sessions.stats(),
+        "ack_cache": orchestrator.ack_cache.stats() if orchestrator.ack_cache is not None else None,
+        "plan_cache": orchestrator.plan_cache.stats() if orchestrator.plan_cache is not None else None,
+        "plan_engine": orchestrator.plan_engine.stats() if orchestrator.plan_engine is not None else None,
+        "coalescing": orchestrator.llm.stats(),
+        "backends": get_backend_router().stats(),
+        "transcription": get_transcription_backend().stats(),
+        "transcript_cache": transcript_cache.stats() if transcript_cache is not None else None,
+        "vad": vad_stats.stats(),
+        "speech_streams": stream_limiter.stats(),
+        "extraction": extraction_stats.stats(),
+        "plan_jobs": plan_jobs.stats(),
+        "speculation": speculator.stats() if speculator is not None else None,
+    }
+
+
+@app.get("/metrics")
+async def prometheus_metrics() -> PlainTextResponse:
+    """Request and stage latency histograms, upstream token counters and the /stats counters, for Prometheus"""
+    return PlainTextResponse(
+        metrics.render(flatten_stats(await stats())),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+def require_previous_stages(state: ConversationState, stage: ChatStage) -> None:
+    """Raise 400 when a later stage arrives before the stages it builds on."""
+    if stage == ChatStage.GOALS and not state.basics:
+        raise HTTPException(status_code=400, detail="Basic information must be provided first")
+    if stage == ChatStage.FINAL and (not state.basics or not state.goals_block):
+        raise HTTPException(status_code=400, detail="Basic information and goals must be provided first")
+
+
+Selections = TypeVar("Selections", bound=BaseModel)
+
+
+def parse_selections(model: Type[Selections], selections: Dict) -> Selections:
+    """Build ``model`` from ``selections``, dropping fields that fail validation.
+
+    Extracted selections can hold values like ``{"age": "not sure"}``; those
+    fields fall back to their defaults (and so show up as missing) instead
+    of failing the request.
+    """
+    data = dict(selections)
+    while True:
+        try:
+            return model(**data)
+        except ValidationError as exc:
+            invalid = {str(error["loc"][0]) for error in exc.errors() if error["loc"]} & data.keys()
+            if not invalid:
+                raise
+            for field in invalid:
+                del data[field]
+
+
+async def run_stage(state: ConversationState, stage: ChatStage, selections: Dict, bypass_cache: bool = False) -> ChatOut:
+    """Apply one intake step to ``state`` in place and build the reply.
+
+    Shared by the typed and voice endpoints; callers persist the state.
+    """
     assistant_text = ""
-    next_stage = chat_in.stage
+    next_stage = stage
     controls = {}
+    require_previous_stages(state, stage)
 
-    if chat_in.stage == ChatStage.BASIC:
+    if stage == ChatStage.BASIC:
         # Handle basic information intake
-        if chat_in.selections:
-            state.basics = Basics(**chat_in.selections)
+        if selections:
+            state.basics = parse_selections(Basics, selections)
             missing = []
             for field in ["age", "gender", "height_cm", "weight_kg", "activity_level"]:
                 if not getattr(state.basics, field):
@@ -99,7 +223,7 @@ async def chat_ingest(chat_in: ChatIn) -> ChatOut:
 
             if not missing:
                 # Get personalized response from LLM
-                llm_response = orchestrator.analyze_basic_info(state.basics)
+                llm_response = await orchestrator.analyze_basic_info(state.basics)
                 if llm_response["status"] == "success":
                     assistant_text = llm_response["message"]
                 else:
@@ -119,19 +243,17 @@ async def chat_ingest(chat_in: ChatIn) -> ChatOut:
                 }
             }
 
-    elif chat_in.stage == ChatStage.GOALS:
+    elif stage == ChatStage.GOALS:
         # Handle goals intake
-        if not state.basics:
-            raise HTTPException(status_code=400, detail="Basic information must be provided first")
-        
-        if chat_in.selections:
-            state.goals_block = GoalBlock(**chat_in.selections)
+        if selections:
+            state.goals_block = parse_selections(GoalBlock, selections)
             if not state.goals_block.goals:
                 assistant_text = "I'd love to help you achieve your fitness goals! Please select at least one goal that resonates with you."
                 controls = {"available_goals": GOALS}
             else:
+                speculate_plan(state)
                 # Get personalized response from LLM
-                llm_response = orchestrator.analyze_goals(state.basics, state.goals_block)
+                llm_response = await orchestrator.analyze_goals(state.basics, state.goals_block)
                 if llm_response["status"] == "success":
                     assistant_text = llm_response["message"]
                 else:
@@ -147,22 +269,25 @@ async def chat_ingest(chat_in: ChatIn) -> ChatOut:
             assistant_text = "Now that I know a bit about you, I'd love to understand your fitness goals. What would you like to achieve? You can select multiple goals!"
             controls = {"available_goals": GOALS}
 
-    elif chat_in.stage == ChatStage.FINAL:
+    elif stage == ChatStage.FINAL:
         # Handle preferences and constraints
-        if not state.basics or not state.goals_block:
-            raise HTTPException(status_code=400, detail="Basic information and goals must be provided first")
-        
-        if chat_in.selections:
-            state.prefs = PrefsConstraints(**chat_in.selections)
+        if selections:
+            state.prefs = parse_selections(PrefsConstraints, selections)
             assistant_text = "Perfect! Now I have everything I need to create a personalized workout plan that's just right for you. Give me a moment while I design something special..."
             
             # Convert state to UserProfile for workout generation
             user_profile = create_user_profile(state)
             
-            # Generate workout using existing orchestrator
-            workout_result = orchestrator.generate_workout(user_profile)
+            # Use the plan speculated after GOALS if the preferences match, else generate one
+            workout_result = None
+            if speculator is not None and not bypass_cache:
+                workout_result = await speculator.claim(state.session_id, user_profile)
+            if workout_result is None:
+                workout_result = await orchestrator.generate_workout(user_profile, use_cache=not bypass_cache)
             if workout_result["status"] == "success":
-                controls = {"workout": workout_result["workout"]}
+                state.workout = workout_result["workout"]
+                state.plan = workout_result["plan"]
+                controls = plan_controls(state)
             else:
                 raise HTTPException(status_code=400, detail=workout_result["message"])
         else:
@@ -181,61 +306,392 @@ async def chat_ingest(chat_in: ChatIn) -> ChatOut:
     )
 
 
+def plan_controls(state: ConversationState) -> Dict:
+    """FINAL-stage controls: the markdown plan, plus the structured plan when there is one"""
+    controls = {"workout": state.workout}
+    if state.plan is not None:
+        controls["plan"] = state.plan.model_dump(mode="json", exclude_none=True)
+    return controls
+
+
+def chat_body(chat_out: ChatOut, compact_state: bool = False) -> Dict:
+    """JSON-ready ChatOut.
+
+    The plan is sent once, in ``controls``; the session's copies are left
+    out of ``state``. With ``compact_state`` the state is sent as base64 of
+    its binary encoding (see services/state_codec.py) and
+    ``state_encoding`` names it.
+    """
+    state = chat_out.state.model_copy(update={"workout": None, "plan": None})
+    body = chat_out.model_dump(mode="json", exclude={"state"})
+    if not compact_state:
+        body["state"] = state.model_dump(mode="json")
+        return body
+    body["state"] = base64.b64encode(encode_state(state)).decode("ascii")
+    body["state_encoding"] = STATE_ENCODING
+    return body
+
+
+def chat_response(chat_out: ChatOut, compact_state: bool = False) -> JSONResponse:
+    """Serialize a ChatOut ourselves so the cost shows up as the "serialize" span"""
+    with span("serialize"):
+        return JSONResponse(chat_body(chat_out, compact_state))
+
+
+@app.post("/chat/ingest")
+async def chat_ingest(chat_in: ChatIn) -> ChatOut:
+    """Handle the 3-step chat intake process"""
+    state = get_or_create_state(chat_in.session_id, chat_in.stage)
+    try:
+        chat_out = await run_stage(state, chat_in.stage, chat_in.selections, bypass_cache=chat_in.bypass_cache)
+    finally:
+        # Keep what the turn changed (e.g. preferences) even when it ends in an HTTPException
+        sessions.put(state)
+    return chat_response(chat_out, chat_in.compact_state)
+
+
+@app.post("/chat/ingest/jobs", status_code=202)
+async def chat_ingest_job(job_in: PlanJobIn) -> JSONResponse:
+    """Queue FINAL-stage plan generation instead of holding the request open.
+
+    Returns 202 with the job record; poll GET /jobs/{job_id} or pass a
+    ``callback_url`` on an allowed host to receive the finished job as a POST.
+    """
+    if job_in.stage != ChatStage.FINAL:
+        raise HTTPException(status_code=400, detail="Background jobs are only available for the final stage")
+    if job_in.callback_url:
+        try:
+            await plan_jobs.check_callback(job_in.callback_url)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    state = get_or_create_state(job_in.session_id, job_in.stage)
+    require_previous_stages(state, job_in.stage)
+    if not job_in.selections:
+        raise HTTPException(status_code=400, detail="Preferences are required to generate a workout")
+
+    state.prefs = parse_selections(PrefsConstraints, job_in.selections)
+    sessions.put(state)
+    job = plan_jobs.submit(
+        state.session_id,
+        create_user_profile(state),
+        priority=job_in.priority,
+        callback_url=job_in.callback_url,
+        use_cache=not job_in.bypass_cache,
+    )
+    job["status_url"] = f"/jobs/{job['job_id']}"
+    return JSONResponse(job, status_code=202, headers={"Location": job["status_url"]})
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> Dict:
+    """Status of a background plan job, with the workout once it has succeeded"""
+    job = plan_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@app.post("/chat/ingest/stream")
+async def chat_ingest_stream(chat_in: ChatIn) -> StreamingResponse:
+    """Streaming variant of the FINAL stage.
+
+    Emits NDJSON events: one ``start`` event with the assistant text, a
+    ``token`` event per upstream chunk of the plan, then ``done`` carrying the
+    full ChatOut (or ``error`` if generation failed mid-stream).
+    """
+    if chat_in.stage != ChatStage.FINAL:
+        raise HTTPException(status_code=400, detail="Streaming is only available for the final stage")
+    state = get_or_create_state(chat_in.session_id, chat_in.stage)
+    require_previous_stages(state, chat_in.stage)
+    if not chat_in.selections:
+        raise HTTPException(status_code=400, detail="Preferences are required to generate a workout")
+
+    state.prefs = parse_selections(PrefsConstraints, chat_in.selections)
+    sessions.put(state)
+    assistant_text = "Perfect! Now I have everything I need to create a personalized workout plan that's just right for you. Give me a moment while I design something special..."
+    user_profile = create_user_profile(state)
+
+    async def events() -> AsyncIterator[str]:
+        yield json.dumps({"type": "start", "assistant_text": assistant_text}) + "\n"
+        cached = None
+        if not chat_in.bypass_cache:
+            speculative = await speculator.claim(state.session_id, user_profile) if speculator is not None else None
+            cached = speculative["workout"] if speculative else orchestrator.cached_workout(user_profile)
+        if cached is not None:
+            state.workout = cached
+            yield json.dumps({"type": "token", "text": cached}) + "\n"
+        else:
+            chunks = []
+            try:
+                async for token in orchestrator.stream_workout(user_profile):
+                    chunks.append(token)
+                    yield json.dumps({"type": "token", "text": token}) + "\n"
+            except Exception as exc:
+                yield json.dumps({"type": "error", "message": f"Workout generation failed: {exc}"}) + "\n"
+                return
+            state.workout = "".join(chunks)
+            orchestrator.store_workout(user_profile, state.workout)
+        state.plan = orchestrator.structured_plan(state.workout, user_profile)
+
+        sessions.put(state)
+        chat_out = ChatOut(
+            assistant_text=assistant_text,
+            state=state,
+            next_stage=ChatStage.FINAL,
+            controls=plan_controls(state)
+        )
+        yield json.dumps({"type": "done", "chat": chat_body(chat_out, chat_in.compact_state)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/plans/bulk")
+async def bulk_plans(
+    request: Request, order: str = "input", format: Optional[str] = None, checkpoint: Optional[str] = None
+) -> StreamingResponse:
+    """Generate plans for a CSV or NDJSON body of profiles, streaming NDJSON results.
+
+    Emits one ``result`` event per input row (in input or completion
+    ``order``) and a final ``summary``. Rows are validated like the chat
+    flow and identical canonical profiles share one generation. Passing a
+    ``checkpoint`` name lets a retried upload skip rows that already succeeded;
+    a checkpoint already in use by another upload is a 409. Bodies over
+    BULK_MAX_BYTES are rejected with 413. All uploads share one limit of
+    concurrent generations (BULK_MAX_SHARE of the LLM connection pool).
+    """
+    if order not in ORDERS:
+        raise HTTPException(status_code=400, detail=f"order must be one of {', '.join(ORDERS)}")
+    if format not in (None, "csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    if checkpoint is not None and not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", checkpoint):
+        raise HTTPException(status_code=400, detail="checkpoint must be 1-64 letters, digits, '-' or '_'")
+
+    if int(request.headers.get("content-length") or 0) > BULK_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {BULK_MAX_BYTES} bytes")
+
+    # StreamingResponse consumes receive() to watch for disconnects, so the
+    # body has to be read before responding; spool it rather than hold it
+    body = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    async for chunk in request.stream():
+        if body.tell() + len(chunk) > BULK_MAX_BYTES:
+            body.close()
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {BULK_MAX_BYTES} bytes")
+        body.write(chunk)
+    body.seek(0)
+
+    fmt = format or detect_format("", request.headers.get("content-type", ""))
+    planner = BulkPlanner(orchestrator, concurrency=BULK_SLOTS, semaphore=bulk_semaphore)
+    progress = None
+    if checkpoint is not None:
+        directory = os.getenv("BULK_CHECKPOINT_DIR", "bulk_checkpoints")
+        os.makedirs(directory, exist_ok=True)
+        try:
+            progress = Checkpoint(os.path.join(directory, f"{checkpoint}.ndjson"))
+        except CheckpointBusy as exc:
+            body.close()
+            raise HTTPException(status_code=409, detail=str(exc))
+
+    async def chunks() -> AsyncIterator[bytes]:
+        while chunk := body.read(64 * 1024):
+            yield chunk
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for record in planner.run(parse_rows(iter_lines(chunks()), fmt), order, progress):
+                yield json.dumps(record) + "\n"
+        finally:
+            body.close()
+            if progress is not None:
+                progress.close()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+ALLOWED_AUDIO_TYPES = {
+    "audio/webm",
+    "audio/ogg", 
+    "audio/mpeg",
+    "audio/wav",
+    "audio/mp4",
+    "audio/aiff",
+    "audio/x-aiff",
+    "application/octet-stream",  # Many audio files get detected as this
+    "video/mp4",  # some browsers send m4a/mp4 container as video/mp4
+}
+
+
+def check_audio_upload(file: UploadFile) -> None:
+    """Basic content-type filtering - be more permissive for audio files"""
+    # Allow any content type that starts with "audio/" or common misdetections
+    if file.content_type not in ALLOWED_AUDIO_TYPES and not file.content_type.startswith("audio/"):
+        raise HTTPException(status_code=400, detail=f"Unsupported content-type: {file.content_type}")
+
+
+async def transcribe_and_extract(stage: ChatStage, file: UploadFile) -> tuple[str, Dict]:
+    """Decode, transcribe and extract stage selections from an uploaded clip.
+
+    The upload is hashed as it is read into ffmpeg. A re-uploaded recording
+    is then answered from the transcript cache: its transcript skips
+    Whisper, and selections already extracted for this stage skip
+    extraction too.
+    """
+    digest = hashlib.sha256() if transcript_cache is not None else None
+    with span("decode"):
+        samples, raw = await decode_upload(file, hasher=digest)
+    key = transcript_cache_key(digest.hexdigest()) if digest is not None else None
+    transcript, selections = transcript_cache.lookup(key, stage.value) if key else (None, None)
+    if selections is not None:
+        return transcript, selections
+
+    if transcript is None:
+        transcript = await transcribe_audio_to_text(samples, raw, file.filename or "audio")
+        if transcript and key:
+            transcript_cache.put(key, transcript)
+    if not transcript:
+        raise HTTPException(status_code=422, detail="No speech detected")
+
+    try:
+        selections = await extract_fields_from_transcript(stage.value, transcript)
+    except Exception:
+        # Fallback: return transcript and empty selections if extraction fails
+        return transcript, {}
+    if key:
+        transcript_cache.put(key, transcript, stage.value, selections)
+    return transcript, selections
+
+
 @app.post("/speech/transcribe")
 async def speech_transcribe(stage: ChatStage, session_id: str, file: UploadFile = File(...)) -> Dict:
     """Transcribe uploaded audio and extract stage-specific selections.
 
     Returns: { transcript, stage, selections, missing }
     """
-    # Basic content-type filtering - be more permissive for audio files
-    allowed_types = {
-        "audio/webm",
-        "audio/ogg", 
-        "audio/mpeg",
-        "audio/wav",
-        "audio/mp4",
-        "audio/aiff",
-        "audio/x-aiff",
-        "application/octet-stream",  # Many audio files get detected as this
-        "video/mp4",  # some browsers send m4a/mp4 container as video/mp4
+    check_audio_upload(file)
+    transcript, selections = await transcribe_and_extract(stage, file)
+    missing = compute_missing(stage.value, selections)
+
+    return {
+        "transcript": transcript,
+        "stage": stage.value,
+        "selections": selections,
+        "missing": missing,
+        "session_id": session_id,
     }
-    # Allow any content type that starts with "audio/" or common misdetections
-    if file.content_type not in allowed_types and not file.content_type.startswith("audio/"):
-        raise HTTPException(status_code=400, detail=f"Unsupported content-type: {file.content_type}")
 
-    tmp_path = save_upload_to_temp(file)
+
+@app.websocket("/speech/stream")
+async def speech_stream(websocket: WebSocket, stage: ChatStage, session_id: str, format: str = "auto") -> None:
+    """Transcribe audio while it is being recorded.
+
+    The client sends audio as binary messages while the user speaks: chunks
+    of one encoded stream (e.g. MediaRecorder webm), or raw 16 kHz mono
+    s16le with ``format=pcm16``. Then it sends the text message ``end``.
+    The server pushes ``{"type": "partial", transcript, selections,
+    missing}`` as the words come in, then one ``{"type": "final", ...}``
+    shaped like the /speech/transcribe response, or ``{"type": "error",
+    status, detail}``. Past STREAM_MAX_CONCURRENT open streams the
+    connection is closed with 1013 (try again later).
+    """
+    await websocket.accept()
+    stream = None
     try:
-        transcript = transcribe_audio_to_text(tmp_path)
-        if not transcript:
-            raise HTTPException(status_code=422, detail="No speech detected")
+        with stream_limiter.slot():
+            stream = create_streaming_transcriber(stage.value, websocket.send_json, fmt=format)
+            await stream.start()
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes"):
+                    await stream.feed(message["bytes"])
+                elif message.get("text", "").strip() in ("end", '{"type": "end"}', '{"type":"end"}'):
+                    break
+            transcript, selections = await stream.finish()
+            await websocket.send_json({
+                "type": "final",
+                "transcript": transcript,
+                "stage": stage.value,
+                "selections": selections,
+                "missing": compute_missing(stage.value, selections),
+                "session_id": session_id,
+                "finalize_ms": round(stream.finalize_seconds * 1000, 1),
+            })
+            await websocket.close()
+    except HTTPException as exc:
+        await websocket.send_json({"type": "error", "status": exc.status_code, "detail": exc.detail})
+        code = 1013 if exc.status_code == 503 else 1008 if exc.status_code < 500 else 1011
+        await websocket.close(code=code)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if stream is not None:
+            await stream.abort()
 
-        try:
-            selections = extract_fields_from_transcript(stage.value, transcript)
-        except Exception:
-            # Fallback: return transcript and empty selections if extraction fails
-            selections = {}
-        missing = compute_missing(stage.value, selections)
-
-        return {
-            "transcript": transcript,
-            "stage": stage.value,
-            "selections": selections,
-            "missing": missing,
-            "session_id": session_id,
-        }
+
+@app.post("/speech/turn")
+async def speech_turn(
+    stage: ChatStage,
+    session_id: str,
+    file: UploadFile = File(...),
+    bypass_cache: bool = False,
+    compact_state: bool = False,
+) -> ChatOut:
+    """Handle a whole voice turn in one request: transcribe, extract, then run the stage.
+
+    Equivalent to /speech/transcribe followed by /chat/ingest with the
+    extracted selections, without the second client round trip. Stage
+    prerequisites are checked before any audio work so out-of-order turns
+    fail fast.
+    """
+    check_audio_upload(file)
+    state = get_or_create_state(session_id, stage)
+    require_previous_stages(state, stage)
+
+    transcript, selections = await transcribe_and_extract(stage, file)
+    try:
+        chat_out = await run_stage(state, stage, selections, bypass_cache=bypass_cache)
     finally:
-        try:
-            tmp_path.unlink(missing_ok=True)  # type: ignore[arg-type]
-        except Exception:
-            pass
+        sessions.put(state)
+    chat_out.transcript = transcript
+    return chat_response(chat_out, compact_state)
+
+
+@app.on_event("startup")
+async def start_plan_jobs() -> None:
+    """Start the plan job workers; jobs queued before a restart resume here."""
+    plan_jobs.start()
 
 
 @app.on_event("startup")
 async def warm_whisper_model() -> None:
-    """Warm up the Whisper model at startup to avoid first-request latency."""
+    """Start the transcription workers so each loads Whisper before the first request.
+
+    Nothing is spawned in worker mode, when every clip goes to the remote
+    API, or when openai-whisper is not installed on this host.
+    """
+    if os.getenv("TRANSCRIBE_ROUTING", "auto").lower() == "remote":
+        return
+    if transcription_mode() == "pool" and importlib.util.find_spec("whisper") is None:
+        print("[startup] openai-whisper is not installed; not starting local transcription workers")
+        return
     try:
-        _get_whisper_model()
+        get_transcription_backend().start()
     except Exception as exc:
         # Do not crash app; log-only behavior
         print(f"[startup] Whisper warmup failed: {exc}")
 
+
+@app.on_event("shutdown")
+async def stop_plan_jobs() -> None:
+    await plan_jobs.stop()
+    if speculator is not None:
+        speculator.shutdown()
+
+
+@app.on_event("shutdown")
+async def close_http_pool() -> None:
+    """Release pooled upstream connections, stop transcription workers and persist warm caches."""
+    await close_llm_client()
+    get_transcription_backend().shutdown()
+    if orchestrator.ack_cache is not None:
+        orchestrator.ack_cache.save()
@@ -0,0 +1,34 @@
+"""Synthetic audio helpers for the transcription benchmarks (no bundled binaries)."""
+from __future__ import annotations
+
+import io
+import math
+import random
+import struct
+import wave
+
+SAMPLE_RATE = 16000
+
+
+def synth_clip(seconds: float = 3.0, lead_silence: float = 0.5, tail_silence: float = 0.5, seed: int = 0) -> list[float]:
+    """Speech-shaped test signal: silence, a syllable-rate modulated harmonic tone, silence."""
+    rng = random.Random(seed)
+    samples: list[float] = [0.0] * int(lead_silence * SAMPLE_RATE)
+    base = rng.uniform(110, 220)
+    for i in range(int(seconds * SAMPLE_RATE)):
+        t = i / SAMPLE_RATE
+        envelope = 0.5 * (1 + math.sin(2 * math.pi * 4 * t))
+        tone = sum(math.sin(2 * math.pi * base * k * t) / k for k in range(1, 5))
+        samples.append(0.2 * envelope * tone + rng.gauss(0, 0.005))
+    samples.extend(rng.gauss(0, 0.002) for _ in range(int(tail_silence * SAMPLE_RATE)))
+    return samples
+
+
+def to_wav_bytes(samples: list[float]) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(b"".join(struct.pack("<h", int(max(-1.0, min(1.0, s)) * 32767)) for s in samples))
+    return buf.getvalue()
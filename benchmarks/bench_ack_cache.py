@@ -0,0 +1,94 @@
+"""BASIC/GOALS stage latency with and without the acknowledgement cache.
+
+Sessions draw profiles from a skewed distribution (a few common age bands,
+activity levels and goal sets dominate), so most keys repeat after warm-up.
+
+    python -m benchmarks.bench_ack_cache --sessions 300 --latency 0.3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+
+import httpx  # noqa: E402
+
+from benchmarks.stub_server import run_stub_in_thread  # noqa: E402
+
+AGES = [22, 27, 31, 29, 38, 45, 52, 61]
+ACTIVITY = ["sedentary", "lightly_active", "moderately_active", "moderately_active", "very_active"]
+GOAL_SETS = [["weight_loss"], ["muscle_gain"], ["strength", "muscle_gain"], ["weight_loss", "endurance"], ["flexibility"]]
+
+
+def _profile(rng: random.Random) -> tuple[dict, dict]:
+    basics = {
+        "age": rng.choice(AGES),
+        "gender": rng.choice(["male", "female"]),
+        "height_cm": rng.randint(155, 195),
+        "weight_kg": rng.randint(50, 110),
+        "activity_level": rng.choice(ACTIVITY),
+    }
+    return basics, {"goals": rng.choice(GOAL_SETS)}
+
+
+async def _session(client: httpx.AsyncClient, rng: random.Random, timings: dict) -> None:
+    basics, goals = _profile(rng)
+    session_id = str(uuid.uuid4())
+    for stage, selections in (("basic", basics), ("goals", goals)):
+        start = time.perf_counter()
+        response = await client.post("/chat/ingest", json={"session_id": session_id, "stage": stage, "selections": selections})
+        response.raise_for_status()
+        timings[stage].append(time.perf_counter() - start)
+
+
+async def run(sessions: int, concurrency: int, cached: bool) -> None:
+    import app as app_module
+    from services.llm_client import close_llm_client
+    from services.response_cache import ResponseCache
+
+    app_module.orchestrator.ack_cache = ResponseCache() if cached else None
+    rng = random.Random(7)
+    timings: dict = {"basic": [], "goals": []}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await _session(client, rng, timings)
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await asyncio.gather(*[one() for _ in range(sessions)])
+    # The pooled client is bound to this event loop
+    await close_llm_client()
+
+    label = "cached" if cached else "uncached"
+    for stage, samples in timings.items():
+        samples.sort()
+        p50 = statistics.median(samples) * 1000
+        p95 = samples[int(len(samples) * 0.95) - 1] * 1000
+        print(f"{label:<9} {stage:<6} p50={p50:7.1f}ms p95={p95:7.1f}ms")
+    if cached:
+        for stage, counts in app_module.orchestrator.ack_cache.stats()["stages"].items():
+            print(f"{'':<9} {stage:<6} hit_rate={counts['hit_rate']:.3f} hits={counts['hits']} misses={counts['misses']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+    with run_stub_in_thread(STUB_PORT, latency=args.latency):
+        for cached in (False, True):
+            asyncio.run(run(args.sessions, args.concurrency, cached))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Per-request audio decode cost: temp file + ffmpeg-from-file versus streaming pipe.
+
+Encodes synthetic clips to the formats browsers upload (webm/opus and
+ogg/opus) and decodes each one both ways:
+
+- temp file: read the whole upload and write it to disk on the event loop
+  (save_upload_to_temp), then whisper.load_audio runs ffmpeg on the file
+  inside the Whisper worker
+- stream: decode_upload pipes chunks into an ffmpeg subprocess without
+  blocking the loop, and the worker receives ready-to-use samples
+
+The report splits the old cost into event-loop time and Whisper-worker
+time, since both are removed from those resources by the new path. The
+ffmpeg subprocess itself costs about the same either way.
+
+Requires ffmpeg on PATH.
+
+    python -m benchmarks.bench_audio_decode --seconds 4 --repeats 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+from benchmarks.audio import synth_clip, to_wav_bytes
+from services.transcription import _FFMPEG_ARGS, _FFMPEG_OUTPUT, _pcm_to_float32, decode_upload
+
+
+class _Upload:
+    """Minimal stand-in for starlette's UploadFile."""
+
+    def __init__(self, data: bytes, filename: str):
+        self.file = io.BytesIO(data)
+        self.filename = filename
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+
+def _encode(wav: bytes, fmt: str) -> bytes:
+    codec = ["-c:a", "libopus", "-b:a", "32k"]
+    return subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-i", "pipe:0", *codec, "-f", fmt, "pipe:1"],
+        input=wav, capture_output=True, check=True,
+    ).stdout
+
+
+def _temp_file_path(upload: _Upload, suffix: str):
+    """Returns (samples, event-loop seconds, worker decode seconds)."""
+    start = time.perf_counter()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(upload.file.read())
+    loop_time = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        pcm = subprocess.run(
+            ["ffmpeg", *_FFMPEG_ARGS, "-i", tmp.name, *_FFMPEG_OUTPUT],
+            capture_output=True, check=True,
+        ).stdout
+        return _pcm_to_float32(pcm), loop_time, time.perf_counter() - start
+    finally:
+        os.unlink(tmp.name)
+
+
+async def _stream_path(upload: _Upload):
+    samples, _ = await decode_upload(upload)
+    return samples
+
+
+async def run(seconds: float, repeats: int) -> None:
+    wav = to_wav_bytes(synth_clip(seconds=seconds))
+    print(
+        f"{'format':<6} {'bytes':>7} | {'old loop':>9} {'old worker':>11} {'old total':>10} | "
+        f"{'new total':>10} | {'loop+worker saved':>18}"
+    )
+    for fmt, suffix in (("webm", ".webm"), ("ogg", ".ogg")):
+        data = _encode(wav, fmt)
+        loop_times, worker_times, new = [], [], []
+        for _ in range(repeats):
+            a, loop_time, worker_time = _temp_file_path(_Upload(data, "clip" + suffix), suffix)
+            loop_times.append(loop_time)
+            worker_times.append(worker_time)
+            start = time.perf_counter()
+            b = await _stream_path(_Upload(data, "clip" + suffix))
+            new.append(time.perf_counter() - start)
+            assert b is not None and abs(len(a) - len(b)) < 1600, "decoders disagree"
+        lt, wt, n = (statistics.median(x) * 1000 for x in (loop_times, worker_times, new))
+        print(
+            f"{fmt:<6} {len(data):>7} | {lt:>7.2f}ms {wt:>9.1f}ms {lt + wt:>8.1f}ms | "
+            f"{n:>8.1f}ms | {lt + wt:>16.1f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=4.0)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.seconds, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
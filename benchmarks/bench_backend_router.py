@@ -0,0 +1,174 @@
+"""Fault-injection benchmark for the circuit breakers, hedging and failover.
+
+Points an LLMClient at the local stub and makes the stub slow, failing or
+rate-limited (429) for a share of requests, then reports what callers saw:
+
+- slow tail: p50/p99 with hedging off and on, and the extra upstream calls
+  hedging cost;
+- failing upstream: how many calls still reached it once the breaker
+  opened, how fast callers were failed, and recovery after the reset;
+- rate limited: whether the client stayed away for the Retry-After period;
+- local Whisper broken: how many clips were tried locally before the
+  transcription routing moved everything to the remote API.
+
+    python -m benchmarks.bench_backend_router --requests 500 --concurrency 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+os.environ.setdefault("BREAKER_RESET_SECONDS", "1")
+
+import httpx  # noqa: E402
+
+from benchmarks.audio import synth_clip  # noqa: E402
+from benchmarks.stub_server import run_stub_in_thread  # noqa: E402
+from services.backend_router import BackendRouter, CircuitOpenError  # noqa: E402
+from services.llm_client import LLMClient  # noqa: E402
+
+
+def _reset_faults(stub) -> None:
+    stub.state.error_rate = stub.state.rate_limit_rate = stub.state.slow_rate = 0.0
+    stub.state.calls = 0
+
+
+def _pct(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+
+
+async def _chat(llm: LLMClient, i: int) -> float:
+    start = time.perf_counter()
+    await llm.chat([{"role": "user", "content": f"message {i}"}], max_tokens=50)
+    return time.perf_counter() - start
+
+
+async def slow_tail(stub, requests: int, concurrency: int) -> None:
+    for hedge in (False, True):
+        _reset_faults(stub)
+        stub.state.slow_rate, stub.state.slow_latency = 0.03, 1.0
+        router = BackendRouter(hedge=hedge)
+        llm = LLMClient(coalesce=False, router=router)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int) -> float:
+            async with semaphore:
+                return await _chat(llm, i)
+
+        latencies = await asyncio.gather(*[one(i) for i in range(requests)])
+        await llm.aclose()
+        stats = router.backend("groq_chat").stats()
+        print(
+            f"slow tail   hedge={'on ' if hedge else 'off'} p50={_pct(latencies, 0.5):6.0f}ms "
+            f"p95={_pct(latencies, 0.95):6.0f}ms p99={_pct(latencies, 0.99):6.0f}ms "
+            f"upstream_calls={stub.state.calls} hedged={stats['hedged']} hedge_wins={stats['hedge_wins']}"
+        )
+
+
+async def failing(stub, requests: int, reset_seconds: float) -> None:
+    _reset_faults(stub)
+    stub.state.error_rate = 1.0
+    router = BackendRouter(failure_threshold=5, reset_seconds=reset_seconds)
+    llm = LLMClient(coalesce=False, router=router)
+    fast, slow = [], []
+    for i in range(requests):
+        start = time.perf_counter()
+        try:
+            await llm.chat([{"role": "user", "content": f"message {i}"}], max_tokens=50)
+        except CircuitOpenError:
+            fast.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            slow.append(time.perf_counter() - start)
+    print(
+        f"failing     requests={requests} reached_upstream={stub.state.calls} "
+        f"upstream_errors={len(slow)} (mean {statistics.mean(slow) * 1000:.0f}ms) "
+        f"failed_fast={len(fast)} (mean {statistics.mean(fast) * 1000:.2f}ms)"
+    )
+
+    stub.state.error_rate = 0.0
+    await asyncio.sleep(reset_seconds)
+    await llm.chat([{"role": "user", "content": "probe"}], max_tokens=50)
+    print(f"failing     after {reset_seconds:.1f}s reset the probe succeeded: {router.backend('groq_chat').stats()['state']}")
+    await llm.aclose()
+
+
+async def rate_limited(stub, retry_after: float) -> None:
+    _reset_faults(stub)
+    stub.state.rate_limit_rate, stub.state.retry_after = 1.0, retry_after
+    router = BackendRouter()
+    llm = LLMClient(coalesce=False, router=router)
+    short_circuited = 0
+    deadline = time.perf_counter() + retry_after * 0.8
+    i = 0
+    while time.perf_counter() < deadline:
+        i += 1
+        try:
+            await llm.chat([{"role": "user", "content": f"message {i}"}], max_tokens=50)
+        except CircuitOpenError:
+            short_circuited += 1
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.01)
+    print(
+        f"429         calls_in_{retry_after:.0f}s_window={i} reached_upstream={stub.state.calls} "
+        f"short_circuited={short_circuited}"
+    )
+    stub.state.rate_limit_rate = 0.0
+    await asyncio.sleep(retry_after * 0.3)
+    await llm.chat([{"role": "user", "content": "after"}], max_tokens=50)
+    print(f"429         after Retry-After the next call succeeded: {router.backend('groq_chat').stats()['state']}")
+    await llm.aclose()
+
+
+async def broken_local_whisper(stub, clips: int) -> None:
+    """Local Whisper failing (e.g. model missing): count clips still sent to it."""
+    import numpy as np
+
+    from services.backend_router import get_backend_router
+    from services.transcription import transcribe_audio_to_text
+
+    _reset_faults(stub)
+    samples = np.asarray(synth_clip(1.0, 0.2, 0.2), dtype=np.float32)
+    start = time.perf_counter()
+    for _ in range(clips):
+        await transcribe_audio_to_text(samples, raw=b"RIFF....WAVE", filename="clip.wav")
+    elapsed = time.perf_counter() - start
+    stats = get_backend_router().stats()
+    local = stats.get("local_whisper", {})
+    print(
+        f"local down  clips={clips} local_attempts={local.get('calls', 0)} local_state={local.get('state')} "
+        f"remote_calls={stub.state.calls} elapsed={elapsed:.2f}s"
+    )
+
+
+async def run(stub, args) -> None:
+    await slow_tail(stub, args.requests, args.concurrency)
+    await failing(stub, args.fail_requests, args.reset_seconds)
+    await rate_limited(stub, args.retry_after)
+    if args.whisper_clips:
+        await broken_local_whisper(stub, args.whisper_clips)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--fail-requests", type=int, default=50)
+    parser.add_argument("--reset-seconds", type=float, default=1.0)
+    parser.add_argument("--retry-after", type=float, default=2.0)
+    parser.add_argument("--whisper-clips", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub time to first token")
+    args = parser.parse_args()
+    with run_stub_in_thread(STUB_PORT, latency=args.latency) as stub:
+        asyncio.run(run(stub, args))
+
+
+if __name__ == "__main__":
+    main()
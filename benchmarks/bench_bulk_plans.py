@@ -0,0 +1,141 @@
+"""Bulk onboarding: a corporate cohort through POST /plans/bulk versus one chat flow per member.
+
+Generates a seeded cohort (members of a real cohort share many canonical
+profiles), streams it as NDJSON to /plans/bulk and reports wall time,
+upstream plan calls and time to first result. The baseline pushes every
+member through the three /chat/ingest stages one at a time. It then
+interrupts a checkpointed upload halfway and resumes it, to show how much
+work the retry redoes.
+
+    python -m benchmarks.bench_bulk_plans --members 1000 --latency 0.3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+APP_PORT = int(os.getenv("BENCH_APP_PORT", "8901"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+# Measure LLM-generated plans; the rule-based engine would make both paths nearly free
+os.environ.setdefault("PLAN_ENGINE", "off")
+os.environ.setdefault("SPECULATION_ENABLED", "0")
+SCRATCH = tempfile.mkdtemp(prefix="bench-bulk-")
+os.environ.setdefault("BULK_CHECKPOINT_DIR", SCRATCH)
+os.environ.setdefault("PLAN_JOB_PATH", os.path.join(SCRATCH, "plan_jobs.db"))
+os.environ.setdefault("PLAN_CACHE_ENABLED", "0")
+
+import httpx  # noqa: E402
+
+from benchmarks.stub_server import run_stub_in_thread, serve_in_thread  # noqa: E402
+from models.schemas import ACTIVITY, EQUIPMENT, GOALS  # noqa: E402
+
+
+def cohort(members: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(members):
+        rows.append({
+            "user_id": f"member-{i}",
+            "name": f"Member {i}",
+            "age": rng.randint(22, 60),
+            "gender": rng.choice(("male", "female")),
+            "height_cm": round(rng.gauss(172, 9), 1),
+            "weight_kg": round(rng.gauss(78, 12), 1),
+            "activity_level": rng.choice(ACTIVITY[:3]),
+            "goals": rng.sample(GOALS[:4], rng.choice((1, 2))),
+            "equipment": [rng.choice(EQUIPMENT)],
+            "injuries": [] if rng.random() < 0.85 else [rng.choice(("knee", "lower back"))],
+        })
+    return rows
+
+
+async def bulk(
+    client: httpx.AsyncClient, rows: list[dict], order: str = "input", checkpoint: str = None, stop_after: int = None,
+) -> dict:
+    body = "".join(json.dumps(row) + "\n" for row in rows).encode()
+    params = {"order": order, **({"checkpoint": checkpoint} if checkpoint else {})}
+    start = time.perf_counter()
+    first = None
+    results = 0
+    summary = {}
+    async with client.stream("POST", "/plans/bulk", content=body, params=params,
+                             headers={"content-type": "application/x-ndjson"}) as response:
+        async for line in response.aiter_lines():
+            record = json.loads(line)
+            if record["type"] == "summary":
+                summary = record
+                continue
+            results += 1
+            first = first or time.perf_counter() - start
+            if stop_after is not None and results >= stop_after:
+                break
+    return {"elapsed": time.perf_counter() - start, "first": first, "results": results, **summary}
+
+
+async def chat_flow(client: httpx.AsyncClient, row: dict) -> None:
+    session_id = str(uuid.uuid4())
+    basics = {k: row[k] for k in ("name", "age", "gender", "height_cm", "weight_kg", "activity_level")}
+    stages = [("basic", basics), ("goals", {"goals": row["goals"]}),
+              ("final", {"equipment": row["equipment"], "injuries": row["injuries"]})]
+    for stage, selections in stages:
+        response = await client.post("/chat/ingest", json={"session_id": session_id, "stage": stage, "selections": selections})
+        response.raise_for_status()
+
+
+async def run(stub, args) -> None:
+    rows = cohort(args.members, args.seed)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=600) as client:
+        baseline_rows = rows[: args.baseline_members]
+        stub.state.calls = 0
+        start = time.perf_counter()
+        for row in baseline_rows:
+            await chat_flow(client, row)
+        per_member = (time.perf_counter() - start) / len(baseline_rows)
+        print(f"chat flow, one member at a time: {per_member:.2f}s per member, {stub.state.calls / len(baseline_rows):.1f} upstream calls each "
+              f"-> ~{per_member * args.members / 60:.1f} min and {stub.state.calls / len(baseline_rows) * args.members:.0f} calls for {args.members}")
+
+        for order in ("input", "completion"):
+            stub.state.calls = 0
+            outcome = await bulk(client, rows, order=order)
+            print(f"/plans/bulk order={order:<10} {args.members} members in {outcome['elapsed']:.1f}s, "
+                  f"first result after {outcome['first']:.2f}s, upstream plan calls={stub.state.calls}, "
+                  f"deduplicated={outcome['deduplicated']}")
+
+        stub.state.calls = 0
+        half = await bulk(client, rows, checkpoint="bench", stop_after=args.members // 2)
+        await asyncio.sleep(0.5)
+        interrupted_calls = stub.state.calls
+        stub.state.calls = 0
+        resumed = await bulk(client, rows, checkpoint="bench")
+        print(f"interrupted after {half['results']} results ({interrupted_calls} upstream calls); "
+              f"resume: {resumed['resumed']} rows reused, {resumed['generated']} generated, "
+              f"{stub.state.calls} upstream calls, {resumed['elapsed']:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--baseline-members", type=int, default=10, help="members timed through the chat flow")
+    parser.add_argument("--latency", type=float, default=0.3, help="stub upstream latency in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from app import app
+
+    try:
+        with run_stub_in_thread(STUB_PORT, latency=args.latency) as stub, serve_in_thread(app, APP_PORT):
+            asyncio.run(run(stub, args))
+    finally:
+        shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
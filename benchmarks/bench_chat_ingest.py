@@ -0,0 +1,63 @@
+"""Concurrent /chat/ingest throughput against a local LLM stub.
+
+Each simulated client submits the BASIC stage (one upstream LLM call) in a
+loop. With a non-blocking upstream client, throughput should grow with the
+number of clients until the connection pool is saturated.
+
+    python -m benchmarks.bench_chat_ingest --latency 0.2 --clients 1 4 16 64
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+# Every request must reach the upstream for this measurement
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+
+import httpx  # noqa: E402
+
+from benchmarks.stub_server import run_stub_in_thread  # noqa: E402
+
+BASICS = {"age": 30, "gender": "male", "height_cm": 180, "weight_kg": 80, "activity_level": "moderately_active"}
+
+
+async def _client_loop(client: httpx.AsyncClient, deadline: float) -> int:
+    done = 0
+    while time.perf_counter() < deadline:
+        payload = {"session_id": str(uuid.uuid4()), "stage": "basic", "selections": BASICS}
+        response = await client.post("/chat/ingest", json=payload)
+        response.raise_for_status()
+        done += 1
+    return done
+
+
+async def run(clients: list[int], duration: float) -> None:
+    from app import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        print(f"{'clients':>8} {'requests':>9} {'req/s':>8}")
+        for n in clients:
+            deadline = time.perf_counter() + duration
+            counts = await asyncio.gather(*[_client_loop(client, deadline) for _ in range(n)])
+            total = sum(counts)
+            print(f"{n:>8} {total:>9} {total / duration:>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub upstream latency in seconds")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+    with run_stub_in_thread(STUB_PORT, latency=args.latency):
+        asyncio.run(run(args.clients, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Cold start and memory of a web process with TRANSCRIBE_MODE=pool versus worker.
+
+For each mode, launches uvicorn as a subprocess. In worker mode it also
+launches ``python -m services.transcription_worker``. It reports:
+
+- how long ``import app`` takes;
+- time until the first /chat/ingest answer;
+- time until /ready/transcription turns ready (or reports a warmup error);
+- RSS of the web process, its children and the separate worker;
+- whether torch ended up mapped into the web process.
+
+The worker's pool is shared by every web process, while each pool-mode
+web process carries its own.
+
+    python -m benchmarks.bench_cold_start --transcribe-workers 2
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.stub_server import run_stub_in_thread
+
+ROOT = Path(__file__).resolve().parent.parent
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+APP_PORT = int(os.getenv("BENCH_APP_PORT", "8901"))
+
+IMPORT_PROBE = (
+    "import sys, time; start = time.perf_counter(); import app; "
+    "print(time.perf_counter() - start, 'torch' in sys.modules, 'whisper' in sys.modules)"
+)
+
+
+def rss_mb(pid: int) -> float:
+    """Resident set size of ``pid`` in MiB (Linux /proc)."""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def descendants(pid: int) -> List[int]:
+    children: Dict[int, List[int]] = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+    found, frontier = [], [pid]
+    while frontier:
+        found.extend(frontier := [c for p in frontier for c in children.get(p, [])])
+    return found
+
+
+def maps_torch(pid: int) -> bool:
+    try:
+        return "libtorch" in Path(f"/proc/{pid}/maps").read_text()
+    except OSError:
+        return False
+
+
+def wait_for(url: str, timeout: float, ok=lambda response: response.status_code < 500) -> Optional[httpx.Response]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = httpx.get(url, timeout=2)
+            if ok(response):
+                return response
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    return None
+
+
+def measure(mode: str, args: argparse.Namespace, scratch: str) -> Dict:
+    socket = f"{scratch}/transcribe.sock"
+    env = {
+        **os.environ,
+        "GROQ_BASE_URL": f"http://127.0.0.1:{STUB_PORT}",
+        "PLAN_CACHE_PATH": f"{scratch}/plan_cache_{mode}.db",
+        "PLAN_JOB_PATH": f"{scratch}/plan_jobs_{mode}.db",
+        "SESSION_DB_PATH": f"{scratch}/sessions_{mode}.db",
+        "TRANSCRIBE_MODE": mode,
+        "TRANSCRIBE_WORKER_SOCKET": socket,
+        "TRANSCRIBE_WORKERS": str(args.transcribe_workers),
+    }
+    probe = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    import_seconds, torch_imported, whisper_imported = probe.stdout.split()
+
+    worker = None
+    if mode == "worker":
+        worker = subprocess.Popen([sys.executable, "-m", "services.transcription_worker", "--socket", socket], cwd=ROOT, env=env)
+    start = time.perf_counter()
+    web = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(APP_PORT), "--log-level", "warning"], cwd=ROOT, env=env,
+    )
+    base = f"http://127.0.0.1:{APP_PORT}"
+    try:
+        if wait_for(f"{base}/", 60) is None:
+            raise SystemExit(f"app did not start in {mode} mode")
+        response = httpx.post(f"{base}/chat/ingest", timeout=30, json={
+            "session_id": "cold-start", "stage": "basic",
+            "selections": {"name": "Ana", "age": 30, "gender": "female", "height_cm": 165, "weight_kg": 60, "activity_level": "moderately_active"},
+        })
+        response.raise_for_status()
+        first_chat = time.perf_counter() - start
+
+        def settled(r: httpx.Response) -> bool:
+            return r.status_code == 200 or bool(r.json().get("warmup_error") or r.json().get("error"))
+
+        ready = wait_for(f"{base}/ready/transcription", args.ready_timeout, settled)
+        ready_seconds = time.perf_counter() - start
+        status = ready.json() if ready is not None else {}
+        web_rss = rss_mb(web.pid)
+        children_rss = sum(rss_mb(pid) for pid in descendants(web.pid))
+        worker_rss = rss_mb(worker.pid) + sum(rss_mb(pid) for pid in descendants(worker.pid)) if worker else 0.0
+        return {
+            "mode": mode,
+            "import_seconds": float(import_seconds),
+            "torch_imported": torch_imported == "True" or whisper_imported == "True" or maps_torch(web.pid),
+            "first_chat_seconds": first_chat,
+            "transcription_ready": bool(status.get("ready")),
+            "transcription_settled_seconds": ready_seconds if ready is not None else None,
+            "warmup_error": status.get("warmup_error") or status.get("error"),
+            "web_rss_mb": web_rss,
+            "web_children_rss_mb": children_rss,
+            "worker_rss_mb": worker_rss,
+        }
+    finally:
+        for process in (web, worker):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcribe-workers", type=int, default=2)
+    parser.add_argument("--ready-timeout", type=float, default=120.0, help="seconds to wait for Whisper to load")
+    parser.add_argument("--web-processes", type=int, default=4, help="web processes to extrapolate total memory for")
+    args = parser.parse_args()
+
+    with run_stub_in_thread(STUB_PORT, latency=0.0), tempfile.TemporaryDirectory() as scratch:
+        results = [measure(mode, args, scratch) for mode in ("pool", "worker")]
+
+    for r in results:
+        settled = f"{r['transcription_settled_seconds']:.2f}s" if r["transcription_settled_seconds"] is not None else "timed out"
+        total = args.web_processes * (r["web_rss_mb"] + r["web_children_rss_mb"]) + r["worker_rss_mb"]
+        print(
+            f"{r['mode']:<6} import app {r['import_seconds'] * 1000:6.0f}ms  first chat {r['first_chat_seconds']:5.2f}s  "
+            f"transcription {'ready' if r['transcription_ready'] else 'not ready'} after {settled}  torch in web process: {r['torch_imported']}"
+        )
+        print(
+            f"       RSS web {r['web_rss_mb']:.0f} MiB + children {r['web_children_rss_mb']:.0f} MiB + worker {r['worker_rss_mb']:.0f} MiB"
+            f"  -> {total:.0f} MiB for {args.web_processes} web processes"
+        )
+        if r["warmup_error"]:
+            print(f"       warmup error: {r['warmup_error']}")
+
+
+if __name__ == "__main__":
+    main()
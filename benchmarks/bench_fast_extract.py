@@ -0,0 +1,110 @@
+"""Share of voice turns the rule-based extractor resolves without the LLM.
+
+Runs a corpus of short transcripts through extract_fields_locally, checks
+resolved turns against the expected selections and estimates the Groq
+round-trips saved at ``--llm-latency`` seconds each.
+
+    python -m benchmarks.bench_fast_extract --llm-latency 0.4
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from services.fast_extract import DEFAULT_MIN_CONFIDENCE, extract_fields_locally
+from services.transcription import compute_missing
+
+CORPUS = [
+    ("basic", "I'm 30, male, 5 foot 10, 80 kilos, moderately active",
+     {"age": 30, "gender": "male", "height_cm": 177.8, "weight_kg": 80.0, "activity_level": "moderately_active"}),
+    ("basic", "I am a 42 year old woman, 165 centimeters and 150 pounds, I sit all day at a desk job",
+     {"age": 42, "gender": "female", "height_cm": 165.0, "weight_kg": 68.0, "activity_level": "sedentary"}),
+    ("basic", "twenty five, guy, six feet, eleven stone, very active",
+     {"age": 25, "gender": "male", "height_cm": 182.9, "weight_kg": 69.9, "activity_level": "very_active"}),
+    ("basic", "I'm 58 years old, female, 1.62 meters, 70 kg, lightly active",
+     {"age": 58, "gender": "female", "height_cm": 162.0, "weight_kg": 70.0, "activity_level": "lightly_active"}),
+    ("basic", "35 and I'd rather not say, 5'6\", 140 lbs, pretty active",
+     {"age": 35, "gender": "prefer_not_to_say", "height_cm": 167.6, "weight_kg": 63.5, "activity_level": "very_active"}),
+    ("basic", "I'm a man in my thirties, fairly tall, and I train a bit",
+     None),
+    ("goals", "I want to lose weight and build muscle", {"goals": ["weight_loss", "muscle_gain"]}),
+    ("goals", "mostly stamina for a marathon", {"goals": ["endurance"]}),
+    ("goals", "get stronger and more flexible", {"goals": ["strength", "flexibility"]}),
+    ("goals", "just stay in shape", {"goals": ["maintenance"]}),
+    ("goals", "honestly I'm not sure yet, something for my health and mood", None),
+    ("final", "I have dumbbells and resistance bands, I like strength training and yoga, mornings work best, bad knee",
+     None),
+    ("final", "I have dumbbells and resistance bands, I like strength training and yoga, mornings work best",
+     {"equipment": ["dumbbells", "resistance_bands"], "preferred_workout_types": ["strength_training", "yoga"],
+      "preferred_training_times": ["morning"], "injuries": []}),
+    ("final", "I go to the gym, mostly cardio, in the evening, no injuries",
+     {"equipment": ["gym_access"], "preferred_workout_types": ["cardio"],
+      "preferred_training_times": ["evening"], "injuries": []}),
+    ("final", "no equipment, hiit in the afternoon",
+     {"equipment": ["bodyweight"], "preferred_workout_types": ["HIIT"], "preferred_training_times": ["afternoon"]}),
+    ("final", "whatever is around, I guess the stuff in my garage", None),
+    ("goals", "I do not want to bulk, I want to lose weight", {"goals": ["weight_loss"]}),
+    ("goals", "not really about strength, more flexibility and mobility", {"goals": ["flexibility"]}),
+    ("final", "I don't have a gym, just bodyweight, cardio in the morning",
+     {"equipment": ["bodyweight"], "preferred_workout_types": ["cardio"], "preferred_training_times": ["morning"]}),
+    ("final", "I have no dumbbells, only resistance bands, yoga after work",
+     {"equipment": ["resistance_bands"], "preferred_workout_types": ["yoga"], "preferred_training_times": ["evening"]}),
+    ("final", "never been to a gym, no equipment at home, I like hiit at night",
+     {"equipment": ["bodyweight"], "preferred_workout_types": ["HIIT"], "preferred_training_times": ["evening"]}),
+]
+
+
+def _matches(expected: dict, actual: dict) -> bool:
+    for field, value in expected.items():
+        got = actual.get(field)
+        if isinstance(value, float):
+            if got is None or abs(float(got) - value) > 1.0:
+                return False
+        elif isinstance(value, list):
+            if sorted(got or []) != sorted(value):
+                return False
+        elif got != value:
+            return False
+    return True
+
+
+def run(rounds: int, llm_latency: float, min_confidence: float) -> None:
+    local_turns = 0
+    correct = 0
+    timings = []
+    for stage, transcript, expected in CORPUS:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            selections, confidence = extract_fields_locally(stage, transcript)
+            timings.append(time.perf_counter() - start)
+        resolved = not compute_missing(stage, selections) and confidence >= min_confidence
+        ok = resolved and expected is not None and _matches(expected, selections)
+        local_turns += resolved
+        correct += ok
+        status = "local" if resolved else "llm"
+        mark = "" if not resolved else ("ok" if ok else "MISMATCH")
+        print(f"{stage:<5} {status:<5} conf={confidence:4.2f} {mark:<8} {transcript[:60]}")
+
+    turns = len(CORPUS)
+    print()
+    print(f"turns={turns} resolved locally={local_turns} ({local_turns / turns:.0%}) "
+          f"correct={correct}/{local_turns}")
+    print(f"local extraction p50={statistics.median(timings) * 1e6:.0f}us "
+          f"max={max(timings) * 1e6:.0f}us")
+    saved = local_turns * llm_latency
+    print(f"LLM time saved: {saved:.2f}s over {turns} turns "
+          f"(avg {saved / turns * 1000:.0f}ms per turn at {llm_latency * 1000:.0f}ms per call)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE)
+    args = parser.parse_args()
+    run(args.rounds, args.llm_latency, args.min_confidence)
+
+
+if __name__ == "__main__":
+    main()
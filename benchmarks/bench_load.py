@@ -0,0 +1,292 @@
+"""Load test: realistic three-stage sessions against the app with a replayed upstream.
+
+The app runs as its own uvicorn process (so its memory can be measured on
+its own) pointed at the replay stub, which answers chat completions and
+transcriptions from ``benchmarks/recordings`` with the configured latency
+distributions. Each simulated user walks BASIC -> GOALS -> FINAL; with
+probability ``--voice-share`` a stage is spoken, i.e. preceded by a
+/speech/transcribe upload whose extracted selections are used (typed values
+fill anything the extraction missed, as the user would in the UI).
+
+Reports throughput, p50/p95/p99 per stage and the app's RSS growth, and
+writes everything to ``--out`` as JSON for benchmarks.compare_results:
+
+    python -m benchmarks.bench_load --sessions 300 --concurrency 30 --out results.json
+    python -m benchmarks.bench_load --env PLAN_ENGINE=off --plan-latency lognormal:4,0.3 --out llm-plans.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.audio import synth_clip, to_wav_bytes
+from benchmarks.replay_stub import DEFAULT_RECORDINGS, run_replay_in_thread
+from models.schemas import ACTIVITY, EQUIPMENT, GENDER, GOALS, TIMES, WORKOUT_TYPES
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+APP_PORT = int(os.getenv("BENCH_APP_PORT", "8901"))
+ROOT = Path(__file__).resolve().parent.parent
+STAGES = ("basic", "goals", "final")
+
+
+def typed_selections(rng: random.Random) -> Dict[str, Dict]:
+    """What one simulated user would pick in the typed UI, per stage."""
+    return {
+        "basic": {
+            "age": rng.randint(18, 70),
+            "gender": rng.choice(GENDER[:2]) if rng.random() < 0.95 else rng.choice(GENDER[2:]),
+            "height_cm": round(rng.gauss(172, 9), 1),
+            "weight_kg": round(rng.gauss(76, 13), 1),
+            "activity_level": rng.choice(ACTIVITY),
+        },
+        "goals": {"goals": rng.sample(GOALS, rng.choice((1, 1, 2, 2, 3)))},
+        "final": {
+            "equipment": ["bodyweight"] if rng.random() < 0.5 else rng.sample(EQUIPMENT, rng.randint(1, 2)),
+            "injuries": [] if rng.random() < 0.8 else [rng.choice(("knee", "lower back", "shoulder"))],
+            "preferred_workout_types": [] if rng.random() < 0.4 else rng.sample(WORKOUT_TYPES, rng.randint(1, 2)),
+            "preferred_training_times": [] if rng.random() < 0.5 else [rng.choice(TIMES)],
+        },
+    }
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+def rss_mb(pid: int) -> float:
+    """Resident set size of ``pid`` in MiB (Linux /proc)."""
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class LoadRun:
+    """Drives simulated sessions and collects per-stage latencies and errors."""
+
+    def __init__(self, client: httpx.AsyncClient, clips: List[bytes], voice_share: float, seed: int):
+        self.client = client
+        self.clips = clips
+        self.voice_share = voice_share
+        self.seed = seed
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.requests = 0
+
+    async def _timed(self, name: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        self.requests += 1
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+        return response
+
+    async def session(self, index: int) -> None:
+        rng = random.Random(self.seed * 1_000_003 + index)
+        session_id = str(uuid.uuid4())
+        typed = typed_selections(rng)
+        start = time.perf_counter()
+        for stage in STAGES:
+            selections = typed[stage]
+            if rng.random() < self.voice_share:
+                transcribed = await self._timed(
+                    f"transcribe_{stage}", "POST", "/speech/transcribe",
+                    params={"stage": stage, "session_id": session_id},
+                    files={"file": (f"{stage}-{index}.wav", rng.choice(self.clips), "audio/wav")},
+                )
+                if transcribed is not None:
+                    extracted = {k: v for k, v in transcribed.json()["selections"].items() if v not in (None, "", [])}
+                    selections = {**selections, **extracted}
+            response = await self._timed(
+                f"ingest_{stage}", "POST", "/chat/ingest",
+                json={"session_id": session_id, "stage": stage, "selections": selections},
+            )
+            if response is None:
+                return
+        self.latencies.setdefault("session", []).append(time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Dict]:
+        def order(name: str):
+            stage = name.split("_")[-1]
+            return (STAGES.index(stage) if stage in STAGES else len(STAGES), name)
+
+        names = sorted(set(self.latencies) | set(self.errors), key=order)
+        return {
+            name: {
+                "count": len(self.latencies.get(name, [])),
+                "errors": self.errors.get(name, 0),
+                "p50_ms": round(percentile(self.latencies.get(name, []), 0.50) * 1000, 1),
+                "p95_ms": round(percentile(self.latencies.get(name, []), 0.95) * 1000, 1),
+                "p99_ms": round(percentile(self.latencies.get(name, []), 0.99) * 1000, 1),
+            }
+            for name in names
+        }
+
+
+async def drive(args, pid: int) -> Dict:
+    clips = [to_wav_bytes(synth_clip(seconds, seed=i)) for i, seconds in enumerate((1.5, 2.5, 4.0))]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=300, limits=limits) as client:
+        warmup = LoadRun(client, clips, args.voice_share, seed=args.seed + 1)
+        await asyncio.gather(*[warmup.session(i) for i in range(min(args.concurrency, args.sessions))])
+
+        run = LoadRun(client, clips, args.voice_share, seed=args.seed)
+        samples: List[float] = [rss_mb(pid)]
+        done = asyncio.Event()
+
+        async def sample_memory() -> None:
+            while not done.is_set():
+                samples.append(rss_mb(pid))
+                try:
+                    await asyncio.wait_for(done.wait(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    pass
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(args.sessions):
+            queue.put_nowait(i)
+
+        async def worker() -> None:
+            while not queue.empty():
+                await run.session(queue.get_nowait())
+
+        sampler = asyncio.create_task(sample_memory())
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await sampler
+        samples.append(rss_mb(pid))
+        app_stats = (await client.get("/stats")).json()
+
+    sessions_ok = len(run.latencies.get("session", []))
+    return {
+        "schema": 1,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {
+            "sessions": args.sessions,
+            "concurrency": args.concurrency,
+            "voice_share": args.voice_share,
+            "seed": args.seed,
+            "chat_latency": args.chat_latency,
+            "plan_latency": args.plan_latency,
+            "transcribe_latency": args.transcribe_latency,
+            "recordings": str(args.recordings),
+            "env": dict(args.env),
+        },
+        "throughput": {
+            "elapsed_s": round(elapsed, 2),
+            "sessions_per_s": round(sessions_ok / elapsed, 2),
+            "requests_per_s": round(run.requests / elapsed, 2),
+            "sessions_completed": sessions_ok,
+            "errors": sum(run.errors.values()),
+        },
+        "stages": run.summary(),
+        "memory": {
+            "rss_start_mb": round(samples[0], 1),
+            "rss_peak_mb": round(max(samples), 1),
+            "rss_end_mb": round(samples[-1], 1),
+            "growth_mb": round(samples[-1] - samples[0], 1),
+            "growth_kb_per_session": round((samples[-1] - samples[0]) * 1024 / max(1, sessions_ok), 2),
+        },
+        "app_stats": app_stats,
+    }
+
+
+def print_report(results: Dict) -> None:
+    throughput, memory = results["throughput"], results["memory"]
+    print(f"{throughput['sessions_completed']} sessions in {throughput['elapsed_s']}s: "
+          f"{throughput['sessions_per_s']} sessions/s, {throughput['requests_per_s']} req/s, {throughput['errors']} errors")
+    print(f"{'stage':<18}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stage in results["stages"].items():
+        print(f"{name:<18}{stage['count']:>6}{stage['errors']:>5}{stage['p50_ms']:>10.1f}{stage['p95_ms']:>10.1f}{stage['p99_ms']:>10.1f}")
+    print(f"app RSS {memory['rss_start_mb']} -> {memory['rss_end_mb']} MiB (peak {memory['rss_peak_mb']}), "
+          f"{memory['growth_kb_per_session']} KiB per session")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--voice-share", type=float, default=0.5, help="probability that a stage is spoken")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recordings", type=Path, default=DEFAULT_RECORDINGS)
+    parser.add_argument("--chat-latency", default="lognormal:0.25,0.4")
+    parser.add_argument("--plan-latency", default="lognormal:2.0,0.3")
+    parser.add_argument("--transcribe-latency", default="lognormal:0.4,0.3")
+    parser.add_argument("--local-whisper", action="store_true", help="transcribe with local Whisper instead of the replayed API")
+    parser.add_argument("--env", action="append", default=[], type=lambda kv: tuple(kv.split("=", 1)),
+                        help="extra KEY=VALUE setting for the app process (repeatable)")
+    parser.add_argument("--out", type=Path, help="write the results as JSON here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        env = {
+            **os.environ,
+            "GROQ_BASE_URL": f"http://127.0.0.1:{STUB_PORT}",
+            "PLAN_CACHE_PATH": f"{scratch}/plan_cache.db",
+            "PLAN_JOB_PATH": f"{scratch}/plan_jobs.db",
+            "SESSION_DB_PATH": f"{scratch}/sessions.db",
+            "TRANSCRIBE_ROUTING": "local" if args.local_whisper else "remote",
+            **dict(args.env),
+        }
+        with run_replay_in_thread(
+            STUB_PORT, args.recordings, args.chat_latency, args.plan_latency, args.transcribe_latency, seed=args.seed
+        ) as stub:
+            app = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app:app", "--port", str(APP_PORT), "--log-level", "warning"],
+                cwd=ROOT, env=env,
+            )
+            try:
+                deadline = time.monotonic() + 60
+                while True:
+                    try:
+                        httpx.get(f"http://127.0.0.1:{APP_PORT}/", timeout=1).raise_for_status()
+                        break
+                    except httpx.HTTPError:
+                        if app.poll() is not None or time.monotonic() > deadline:
+                            raise SystemExit("app did not start")
+                        time.sleep(0.2)
+                results = asyncio.run(drive(args, app.pid))
+                results["replay"] = {"calls": stub.state.calls, "unmatched": stub.state.unmatched}
+            finally:
+                app.terminate()
+                app.wait(timeout=30)
+
+    print_report(results)
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2))
+        print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""FINAL-stage latency for plan-cache misses, hits and bypassed requests.
+
+Sessions cycle through a small set of canonical profiles whose surface
+details vary (ages inside one band, list order, injury phrasing), so after
+the first pass every request should be a cache hit.
+
+    python -m benchmarks.bench_plan_cache --latency 0.3 --token-delay 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+# Plans must come from the (stub) LLM for this measurement
+os.environ.setdefault("PLAN_ENGINE", "off")
+os.environ.setdefault("PLAN_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "plan_cache.db"))
+
+import httpx  # noqa: E402
+
+from benchmarks.stub_server import run_stub_in_thread  # noqa: E402
+
+VARIANTS = [
+    ({"age": 31, "gender": "female"}, ["strength", "weight_loss"], ["dumbbells", "bodyweight"], ["Bad knee"]),
+    ({"age": 33, "gender": "female"}, ["weight_loss", "strength"], ["bodyweight", "dumbbells"], ["knee pain"]),
+    ({"age": 47, "gender": "male"}, ["muscle_gain"], ["gym_access"], ["none"]),
+    ({"age": 49, "gender": "male"}, ["muscle_gain"], ["gym_access"], []),
+]
+
+
+async def _final_stage(client: httpx.AsyncClient, variant: tuple, bypass: bool) -> float:
+    person, goals, equipment, injuries = variant
+    basics = {**person, "height_cm": 170, "weight_kg": 70, "activity_level": "lightly_active"}
+    session_id = str(uuid.uuid4())
+    for stage, selections in (("basic", basics), ("goals", {"goals": goals})):
+        (await client.post("/chat/ingest", json={"session_id": session_id, "stage": stage, "selections": selections})).raise_for_status()
+    payload = {
+        "session_id": session_id,
+        "stage": "final",
+        "selections": {"equipment": equipment, "injuries": injuries},
+        "bypass_cache": bypass,
+    }
+    start = time.perf_counter()
+    (await client.post("/chat/ingest", json=payload)).raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(rounds: int) -> None:
+    import app as app_module
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        results = {"first pass": [], "repeat": [], "bypass": []}
+        for variant in VARIANTS:
+            results["first pass"].append(await _final_stage(client, variant, bypass=False))
+        for _ in range(rounds):
+            for variant in VARIANTS:
+                results["repeat"].append(await _final_stage(client, variant, bypass=False))
+        results["bypass"].append(await _final_stage(client, VARIANTS[0], bypass=True))
+
+    for label, samples in results.items():
+        print(f"{label:<11} n={len(samples):<3} p50={statistics.median(samples) * 1000:8.1f}ms")
+    print("plan cache:", app_module.orchestrator.plan_cache.stats())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    with run_stub_in_thread(STUB_PORT, latency=args.latency, token_delay=args.token_delay):
+        asyncio.run(run(args.rounds))
+
+
+if __name__ == "__main__":
+    main()
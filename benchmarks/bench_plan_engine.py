@@ -0,0 +1,96 @@
+"""Plan engine coverage and latency against LLM generation.
+
+Builds a grid of profiles over the GOALS, EQUIPMENT, WORKOUT_TYPES and
+ACTIVITY enums plus a few injury phrasings, some of them free text. Each
+profile goes through WorkoutOrchestrator.generate_workout twice: once
+with the engine (route mode) and once with it off, against the LLM stub.
+Engine plans are checked for the structure the LLM prompt asks for.
+
+    python -m benchmarks.bench_plan_engine --latency 0.3 --token-delay 0.002
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import os
+import re
+import statistics
+import time
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+
+from benchmarks.stub_server import run_stub_in_thread  # noqa: E402
+from models.schemas import ACTIVITY, EQUIPMENT, GOALS, WORKOUT_TYPES  # noqa: E402
+from models.user import FitnessGoal, PhysicalStats, Restrictions, UserPreferences, UserProfile  # noqa: E402
+from services.llm_client import LLMClient  # noqa: E402
+from services.orchestrator import WorkoutOrchestrator  # noqa: E402
+from services.plan_engine import PlanEngine  # noqa: E402
+
+INJURIES = [[], ["bad knee"], ["lower back pain"], ["left shoulder"], ["torn ACL last year"], ["mild asthma"]]
+REQUIRED = [r"^# Weekly Workout Plan", r"^## Overview", r"^- Days per week: \d", r"^- Split type: ",
+            r"^- Equipment: ", r"^## Day 1 – ", r"^- Warm-Up:", r"^- Main Workout:", r"^- Cool-Down:", r"^## Tips"]
+
+
+def _profiles(limit: int) -> list[UserProfile]:
+    grid = itertools.product(GOALS, EQUIPMENT, [[]] + [[t] for t in WORKOUT_TYPES], ACTIVITY, INJURIES)
+    profiles = []
+    for i, (goal, equipment, types, activity, injuries) in enumerate(grid):
+        if i % 7:
+            continue  # sample the grid evenly
+        profiles.append(UserProfile(
+            user_id=f"bench-{i}", name="User",
+            physical_stats=PhysicalStats(height=175, weight=75, gender="female", age=35),
+            goals=[FitnessGoal(goal_type=goal)],
+            preferences=UserPreferences(preferred_workout_types=types, preferred_training_times=[]),
+            activity_level=activity,
+            restrictions=Restrictions(injuries=injuries, equipment=[equipment], not_preferred_exercises=[], special_considerations=[]),
+            created_at=None,
+        ))
+    return profiles[:limit]
+
+
+async def run(limit: int) -> None:
+    profiles = _profiles(limit)
+    llm = LLMClient(base_url=f"http://127.0.0.1:{STUB_PORT}", api_key="bench", max_connections=64)
+    engine = PlanEngine()
+    with_engine = WorkoutOrchestrator(llm=llm, plan_engine=engine)
+    llm_only = WorkoutOrchestrator(llm=llm)
+
+    async def timed(orchestrator: WorkoutOrchestrator, profile: UserProfile) -> tuple[float, dict]:
+        start = time.perf_counter()
+        result = await orchestrator.generate_workout(profile, use_cache=False)
+        return time.perf_counter() - start, result
+
+    routed = await asyncio.gather(*[timed(with_engine, p) for p in profiles])
+    baseline = await asyncio.gather(*[timed(llm_only, p) for p in profiles])
+    await llm.aclose()
+
+    engine_times = [t for t, r in routed if r["engine"]]
+    fallback_times = [t for t, r in routed if not r["engine"]]
+    malformed = [r for _, r in routed if r["engine"]
+                 and not all(re.search(p, r["workout"], re.M) for p in REQUIRED)]
+    deterministic = all(engine.build(p) == engine.build(p) for p in profiles if engine.covers(p))
+
+    print(f"profiles={len(profiles)} engine={len(engine_times)} ({len(engine_times) / len(profiles):.0%}) "
+          f"llm fallback={len(fallback_times)} malformed={len(malformed)} deterministic={deterministic}")
+    print(f"engine plans   p50={statistics.median(engine_times) * 1000:8.2f}ms max={max(engine_times) * 1000:8.2f}ms")
+    if fallback_times:
+        print(f"llm fallback   p50={statistics.median(fallback_times) * 1000:8.2f}ms")
+    print(f"llm only       p50={statistics.median([t for t, _ in baseline]) * 1000:8.2f}ms")
+    print(f"upstream plan calls: {len(fallback_times)} with engine vs {len(baseline)} without")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--profiles", type=int, default=200)
+    args = parser.parse_args()
+    with run_stub_in_thread(STUB_PORT, latency=args.latency, token_delay=args.token_delay):
+        asyncio.run(run(args.profiles))
+
+
+if __name__ == "__main__":
+    main()
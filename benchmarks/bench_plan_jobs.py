@@ -0,0 +1,135 @@
+"""FINAL stage held open (/chat/ingest) versus queued (/chat/ingest/jobs).
+
+Each of ``--clients`` sessions submits its preferences at once. The report
+shows how long a client's HTTP request stays open in each mode and when the
+plan becomes available (response for the blocking path, callback delivery
+for jobs). A resubmission of every session checks deduplication, and a
+second queue opened on the same file after a simulated crash checks that
+queued jobs are resumed.
+
+    python -m benchmarks.bench_plan_jobs --latency 0.3 --token-delay 0.002 --clients 32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+CALLBACK_PORT = int(os.getenv("BENCH_CALLBACK_PORT", "8902"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+# Plans must come from the (stub) LLM for this measurement
+os.environ.setdefault("PLAN_ENGINE", "off")
+os.environ.setdefault("PLAN_CACHE_ENABLED", "0")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+os.environ.setdefault("PLAN_JOB_PATH", os.path.join(tempfile.mkdtemp(), "plan_jobs.db"))
+os.environ.setdefault("PLAN_JOB_CALLBACK_HOSTS", "127.0.0.1")
+os.environ.setdefault("PLAN_JOB_CALLBACK_ALLOW_PRIVATE", "1")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+
+from benchmarks.stub_server import run_stub_in_thread, serve_in_thread  # noqa: E402
+
+BASICS = {"age": 30, "gender": "male", "height_cm": 180, "weight_kg": 80, "activity_level": "moderately_active"}
+GOALS = {"goals": ["strength"]}
+PREFS = {"equipment": ["bodyweight"], "preferred_workout_types": ["strength_training"]}
+
+
+def make_callback_app() -> FastAPI:
+    receiver = FastAPI()
+    receiver.state.delivered = {}
+
+    @receiver.post("/done")
+    async def done(request: Request):
+        job = await request.json()
+        receiver.state.delivered[job["job_id"]] = time.perf_counter()
+        return {"ok": True}
+
+    return receiver
+
+
+async def _prepare_session(client: httpx.AsyncClient) -> str:
+    session_id = str(uuid.uuid4())
+    for stage, selections in (("basic", BASICS), ("goals", GOALS)):
+        (await client.post("/chat/ingest", json={"session_id": session_id, "stage": stage, "selections": selections})).raise_for_status()
+    return session_id
+
+
+async def _blocking(client: httpx.AsyncClient, session_id: str) -> float:
+    start = time.perf_counter()
+    payload = {"session_id": session_id, "stage": "final", "selections": PREFS}
+    (await client.post("/chat/ingest", json=payload)).raise_for_status()
+    return time.perf_counter() - start
+
+
+async def _submit(client: httpx.AsyncClient, session_id: str, callback: bool) -> tuple[str, float, bool]:
+    payload = {"session_id": session_id, "stage": "final", "selections": PREFS}
+    if callback:
+        payload["callback_url"] = f"http://127.0.0.1:{CALLBACK_PORT}/done"
+    start = time.perf_counter()
+    response = await client.post("/chat/ingest/jobs", json=payload)
+    response.raise_for_status()
+    body = response.json()
+    return body["job_id"], time.perf_counter() - start, body["deduplicated"]
+
+
+def _p(samples: list[float], pct: float) -> float:
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * pct))] * 1000
+
+
+async def run(n: int, receiver: FastAPI) -> None:
+    import app as app_module
+    from services.plan_jobs import create_plan_job_queue
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        sessions = [await _prepare_session(client) for _ in range(n)]
+        blocking = await asyncio.gather(*[_blocking(client, s) for s in sessions])
+
+        app_module.plan_jobs.start()
+        start = time.perf_counter()
+        submitted = await asyncio.gather(*[_submit(client, s, callback=True) for s in sessions])
+        job_ids = [job_id for job_id, _, _ in submitted]
+        while len(receiver.state.delivered) < n:
+            await asyncio.sleep(0.02)
+        ready = [receiver.state.delivered[j] - start for j in job_ids]
+        resubmitted = await asyncio.gather(*[_submit(client, s, callback=False) for s in sessions])
+        await app_module.plan_jobs.stop()
+
+        print(f"{'mode':<10} {'held p50':>10} {'held p95':>10} {'ready p50':>10} {'ready max':>10}")
+        print(f"{'blocking':<10} {_p(blocking, 0.5):>8.1f}ms {_p(blocking, 0.95):>8.1f}ms "
+              f"{_p(blocking, 0.5):>8.1f}ms {max(blocking) * 1000:>8.1f}ms")
+        held = [t for _, t, _ in submitted]
+        print(f"{'jobs':<10} {_p(held, 0.5):>8.1f}ms {_p(held, 0.95):>8.1f}ms "
+              f"{_p(ready, 0.5):>8.1f}ms {max(ready) * 1000:>8.1f}ms")
+        print(f"resubmissions deduplicated: {sum(d for _, _, d in resubmitted)}/{n}")
+
+        # Simulated crash: queue work with no workers running, then open a fresh queue on the same file
+        pending = [(await _submit(client, s, callback=False))[0] for s in [await _prepare_session(client) for _ in range(4)]]
+        revived = create_plan_job_queue(app_module.orchestrator)
+        revived.start()
+        while any(revived.get(j)["status"] != "succeeded" for j in pending):
+            await asyncio.sleep(0.02)
+        await revived.stop()
+        print(f"jobs resumed after restart: {len(pending)}/{len(pending)}")
+        print("plan_jobs:", app_module.plan_jobs.stats())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--clients", type=int, default=32)
+    args = parser.parse_args()
+    receiver = make_callback_app()
+    with run_stub_in_thread(STUB_PORT, latency=args.latency, token_delay=args.token_delay), \
+            serve_in_thread(receiver, CALLBACK_PORT):
+        asyncio.run(run(args.clients, receiver))
+
+
+if __name__ == "__main__":
+    main()
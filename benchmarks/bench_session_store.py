@@ -0,0 +1,73 @@
+"""Soak test for the session stores: churn many sessions and watch memory.
+
+Reports RSS, live entries and store counters at regular checkpoints. With a
+bounded store, RSS should level off once the caps are reached.
+
+    python -m benchmarks.bench_session_store --backend memory --sessions 200000
+    python -m benchmarks.bench_session_store --backend sqlite --db /tmp/sessions.db
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import resource
+import time
+import uuid
+
+from models.schemas import Basics, ChatStage, ConversationState, GoalBlock, PrefsConstraints
+from services.session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+def _rss_mb() -> float:
+    """Current resident set size, read from /proc on Linux."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * resource.getpagesize() / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _state() -> ConversationState:
+    return ConversationState(
+        session_id=str(uuid.uuid4()),
+        stage=ChatStage.FINAL,
+        basics=Basics(age=random.randint(18, 70), gender="female", height_cm=165, weight_kg=60, activity_level="lightly_active"),
+        goals_block=GoalBlock(goals=["strength", "flexibility"]),
+        prefs=PrefsConstraints(equipment=["dumbbells"], preferred_workout_types=["yoga"]),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--db", default="/tmp/bench_sessions.db")
+    parser.add_argument("--sessions", type=int, default=200_000)
+    parser.add_argument("--max-entries", type=int, default=10_000)
+    parser.add_argument("--checkpoints", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.backend == "memory":
+        store = InMemorySessionStore(ttl_seconds=3600, max_entries=args.max_entries)
+    else:
+        store = SQLiteSessionStore(args.db, ttl_seconds=3600, max_entries=args.max_entries)
+
+    recent: list[str] = []
+    step = max(1, args.sessions // args.checkpoints)
+    start = time.perf_counter()
+    print(f"{'sessions':>9} {'entries':>8} {'rss_mb':>7} {'hit_rate':>8} {'evictions':>9} {'ops/s':>8}")
+    for i in range(1, args.sessions + 1):
+        state = _state()
+        store.put(state)
+        recent.append(state.session_id)
+        # Revisit a recent session the way a user moves through the three stages
+        store.get(random.choice(recent[-1000:]))
+        if len(recent) > 2000:
+            del recent[:1000]
+        if i % step == 0:
+            s = store.stats()
+            rate = 2 * i / (time.perf_counter() - start)
+            print(f"{i:>9} {s['entries']:>8} {_rss_mb():>7.1f} {s['hit_rate']:>8.3f} {s['evictions']:>9} {rate:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
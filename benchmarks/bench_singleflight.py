@@ -0,0 +1,71 @@
+"""Burst load test for request coalescing.
+
+Fires bursts of concurrent BASIC-stage requests for identical profiles (the
+shape of traffic right after a marketing push) and counts how many upstream
+calls the stub actually received, with coalescing on and off. The
+acknowledgement cache is disabled so every request would otherwise reach
+the upstream.
+
+    python -m benchmarks.bench_singleflight --bursts 5 --burst-size 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+
+import httpx  # noqa: E402
+
+from benchmarks.stub_server import run_stub_in_thread  # noqa: E402
+
+PROFILES = [
+    {"age": 30, "gender": "male", "height_cm": 180, "weight_kg": 80, "activity_level": "moderately_active"},
+    {"age": 25, "gender": "female", "height_cm": 165, "weight_kg": 60, "activity_level": "lightly_active"},
+]
+
+
+async def run(stub, bursts: int, burst_size: int, coalesce: bool) -> None:
+    import app as app_module
+    from services.llm_client import LLMClient
+
+    llm = LLMClient(coalesce=coalesce)
+    app_module.orchestrator._llm = llm
+    stub.state.calls = 0
+    transport = httpx.ASGITransport(app=app_module.app)
+    start = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for _ in range(bursts):
+            await asyncio.gather(*[
+                client.post("/chat/ingest", json={
+                    "session_id": str(uuid.uuid4()),
+                    "stage": "basic",
+                    "selections": PROFILES[i % len(PROFILES)],
+                })
+                for i in range(burst_size)
+            ])
+    elapsed = time.perf_counter() - start
+    await llm.aclose()
+    requests = bursts * burst_size
+    label = "on" if coalesce else "off"
+    print(f"coalescing {label:<3} requests={requests:<5} upstream_calls={stub.state.calls:<5} elapsed={elapsed:6.2f}s {llm.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--burst-size", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+    with run_stub_in_thread(STUB_PORT, latency=args.latency) as stub:
+        for coalesce in (False, True):
+            asyncio.run(run(stub, args.bursts, args.burst_size, coalesce))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""FINAL-stage latency with and without speculative plan generation.
+
+Each simulated user completes BASIC and GOALS, "fills in" the FINAL form
+for ``--think`` seconds, then submits either the predicted defaults
+(bodyweight, no injuries) or custom preferences, with ``--default-share``
+of users choosing the defaults. Users arrive every ``--interval`` seconds. The plan cache is off so every hit comes
+from speculation. Upstream calls are counted to show the cost of
+cancelled speculation.
+
+    python -m benchmarks.bench_speculation --latency 0.3 --token-delay 0.002 --think 1.0
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+# Plans must come from the (stub) LLM for this measurement
+os.environ.setdefault("PLAN_ENGINE", "off")
+os.environ.setdefault("PLAN_CACHE_ENABLED", "0")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+
+import httpx  # noqa: E402
+
+from benchmarks.stub_server import run_stub_in_thread  # noqa: E402
+
+BASICS = {"age": 30, "gender": "male", "height_cm": 180, "weight_kg": 80, "activity_level": "moderately_active"}
+DEFAULT_PREFS = {"equipment": ["bodyweight"], "injuries": []}
+CUSTOM_PREFS = {"equipment": ["dumbbells"], "preferred_workout_types": ["strength_training"], "injuries": ["knee"]}
+
+
+async def _user(client: httpx.AsyncClient, goal: str, defaults: bool, think: float, delay: float) -> float:
+    await asyncio.sleep(delay)
+    session_id = str(uuid.uuid4())
+    for stage, selections in (("basic", BASICS), ("goals", {"goals": [goal]})):
+        (await client.post("/chat/ingest", json={"session_id": session_id, "stage": stage, "selections": selections})).raise_for_status()
+    await asyncio.sleep(think)
+    payload = {"session_id": session_id, "stage": "final", "selections": DEFAULT_PREFS if defaults else CUSTOM_PREFS}
+    start = time.perf_counter()
+    (await client.post("/chat/ingest", json=payload)).raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(users: int, default_share: float, think: float, interval: float, stub) -> None:
+    import app as app_module
+
+    speculator = app_module.speculator
+    transport = httpx.ASGITransport(app=app_module.app)
+    rng = random.Random(7)
+    # Distinct goals keep users from sharing one upstream call through coalescing
+    plan = [(f"goal-{i}", rng.random() < default_share) for i in range(users)]
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for label, enabled in (("off", None), ("on", speculator)):
+            app_module.speculator = enabled
+            calls_before = stub.state.calls
+            latencies = await asyncio.gather(*[_user(client, goal, d, think, i * interval) for i, (goal, d) in enumerate(plan)])
+            defaults = [t for t, (_, d) in zip(latencies, plan) if d]
+            custom = [t for t, (_, d) in zip(latencies, plan) if not d]
+            print(f"speculation {label:<3} final p50={statistics.median(latencies) * 1000:7.1f}ms "
+                  f"defaults p50={statistics.median(defaults) * 1000:7.1f}ms "
+                  f"custom p50={statistics.median(custom) * 1000:7.1f}ms "
+                  f"upstream calls={stub.state.calls - calls_before}")
+    print("speculation:", speculator.stats())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--think", type=float, default=1.0)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--default-share", type=float, default=0.6)
+    parser.add_argument("--interval", type=float, default=0.25, help="seconds between user arrivals")
+    args = parser.parse_args()
+    with run_stub_in_thread(STUB_PORT, latency=args.latency, token_delay=args.token_delay) as stub:
+        asyncio.run(run(args.users, args.default_share, args.think, args.interval, stub))
+
+
+if __name__ == "__main__":
+    main()
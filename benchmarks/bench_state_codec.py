@@ -0,0 +1,118 @@
+"""Size and speed of the compact ConversationState codec against the JSON it replaces.
+
+Sessions are a mix of intake stages: some stopped after BASIC, some after
+GOALS, and the rest finished FINAL with a workout plan from the rule-based
+plan engine. A few carry free-text injuries and values outside the
+allowlists. Every state is encoded both ways and checked to round-trip.
+Reports bytes per session and the total for ``--sessions`` stored
+sessions (the SQLite row or in-memory entry), the size of ``state`` in a
+ChatOut on the wire, and encode/decode throughput.
+
+    python -m benchmarks.bench_state_codec --sessions 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import random
+import time
+import uuid
+
+from models.schemas import ACTIVITY, EQUIPMENT, GENDER, GOALS, TIMES, WORKOUT_TYPES, Basics, ChatStage, ConversationState, GoalBlock, PrefsConstraints
+from services.plan_engine import PlanEngine
+from services.profiles import create_user_profile
+from services.state_codec import decode_state, encode_state
+
+
+def _sample(rng: random.Random, values: list[str], most: int) -> list[str]:
+    """Up to ``most`` values in allowlist order, as the extractor returns them."""
+    chosen = set(rng.sample(values, rng.randint(1, most)))
+    return [v for v in values if v in chosen]
+
+
+def make_states(count: int, seed: int, plans: int) -> list[ConversationState]:
+    """``count`` sessions; FINAL sessions reuse one of ``plans`` distinct plans, as the plan cache would."""
+    rng = random.Random(seed)
+    engine = PlanEngine()
+    workouts: list[str] = []
+    states = []
+    for _ in range(count):
+        stage = rng.choices(list(ChatStage), weights=(2, 3, 5))[0]
+        state = ConversationState(
+            session_id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            stage=stage,
+            basics=Basics(
+                name=rng.choice([None, None, "Sam", "Priya", "Jordan"]),
+                age=rng.randint(18, 70),
+                gender=rng.choice(GENDER),
+                height_cm=rng.choice([rng.randint(150, 200), round(rng.uniform(150, 200), 1)]),
+                weight_kg=round(rng.uniform(45, 120), 1),
+                activity_level=rng.choice(ACTIVITY),
+            ),
+            missing=rng.choice([[], [], [], ["weight_kg"], ["age", "gender"]]),
+        )
+        if stage != ChatStage.BASIC:
+            state.goals_block = GoalBlock(goals=_sample(rng, GOALS, 3))
+        if stage == ChatStage.FINAL:
+            state.prefs = PrefsConstraints(
+                injuries=rng.choice([[], [], [], ["bad knee"], ["lower back pain"]]),
+                equipment=_sample(rng, EQUIPMENT, 2) + rng.choice([[], [], [], [], ["kettlebell"]]),
+                preferred_workout_types=_sample(rng, WORKOUT_TYPES, 2),
+                preferred_training_times=_sample(rng, TIMES, 1),
+                not_preferred_exercises=rng.choice([[], [], ["burpees"]]),
+            )
+            if len(workouts) < plans:
+                workouts.append(engine.build(create_user_profile(state)))
+            state.workout = rng.choice(workouts)
+        states.append(state)
+    return states
+
+
+def rate(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=20_000, help="distinct states generated; the rest repeat them with new ids")
+    parser.add_argument("--plans", type=int, default=200, help="distinct workout plans among FINAL sessions")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    states = make_states(args.distinct, args.seed, args.plans)
+    encoded = [encode_state(state) for state in states]
+    payloads = [state.model_dump_json() for state in states]
+    for state, data in zip(states, encoded):
+        assert decode_state(data) == state, state.session_id
+
+    by_stage: dict[ChatStage, list[tuple[int, int]]] = {}
+    for state, data, payload in zip(states, encoded, payloads):
+        by_stage.setdefault(state.stage, []).append((len(payload), len(data)))
+    print(f"{'stage':<7} {'share':>6} {'json B':>8} {'compact B':>10} {'ratio':>6}")
+    for stage, sizes in sorted(by_stage.items(), key=lambda item: list(ChatStage).index(item[0])):
+        json_bytes, compact_bytes = (sum(column) / len(sizes) for column in zip(*sizes))
+        print(f"{stage.value:<7} {len(sizes) / len(states):>6.0%} {json_bytes:>8.0f} {compact_bytes:>10.0f} {json_bytes / compact_bytes:>5.1f}x")
+
+    # Sessions past --distinct repeat a state under a new id; size does not depend on which id
+    scale = args.sessions / len(states)
+    json_total = sum(len(payload) for payload in payloads) * scale
+    compact_total = sum(len(data) for data in encoded) * scale
+    print(f"{args.sessions:,} sessions: json {json_total / 1e6:,.0f} MB, compact {compact_total / 1e6:,.0f} MB "
+          f"({json_total / compact_total:.1f}x smaller)")
+
+    wire_json = sum(len(json.dumps(state.model_dump(mode="json"))) for state in states) / len(states)
+    wire_compact = sum(len(json.dumps(base64.b64encode(data).decode("ascii"))) for data in encoded) / len(states)
+    print(f"ChatOut.state on the wire: json {wire_json:.0f} B, compact base64 {wire_compact:.0f} B ({wire_json / wire_compact:.1f}x smaller)")
+
+    print(f"{'':<8} {'encode/s':>10} {'decode/s':>10}")
+    print(f"{'json':<8} {rate(ConversationState.model_dump_json, states):>10,.0f} {rate(ConversationState.model_validate_json, payloads):>10,.0f}")
+    print(f"{'compact':<8} {rate(encode_state, states):>10,.0f} {rate(decode_state, encoded):>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Perceived voice latency: /speech/stream versus recording then uploading to /speech/transcribe.
+
+A clip is "spoken" in real time. The streaming client sends it in
+``--chunk-ms`` pieces while it plays. The upload client waits for the
+recording to end and then posts the whole file. Both report the time from
+end of speech to final selections, which is all the user actually waits
+for.
+
+Partials need local Whisper (openai-whisper installed, the default
+TRANSCRIBE_ROUTING). With ``--remote`` both paths transcribe the whole
+recording through the stub API after speech ends, so only decoding
+overlaps with speaking.
+
+    python -m benchmarks.bench_stream_transcription --rounds 5 --seconds 6
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+APP_PORT = int(os.getenv("BENCH_APP_PORT", "8901"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+# Every round re-sends the same recording
+os.environ.setdefault("TRANSCRIPT_CACHE_ENABLED", "0")
+
+import httpx  # noqa: E402
+import websockets  # noqa: E402
+
+from benchmarks.audio import synth_clip, to_wav_bytes  # noqa: E402
+from benchmarks.stub_server import run_stub_in_thread, serve_in_thread  # noqa: E402
+
+
+def encode_webm(wav: bytes) -> bytes:
+    with tempfile.TemporaryDirectory() as scratch:
+        Path(scratch, "clip.wav").write_bytes(wav)
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-i", f"{scratch}/clip.wav", "-c:a", "libopus", f"{scratch}/clip.webm"],
+            check=True,
+        )
+        return Path(scratch, "clip.webm").read_bytes()
+
+
+async def upload(clip: bytes, seconds: float) -> float:
+    await asyncio.sleep(seconds)  # the user is still speaking
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=120) as client:
+        start = time.perf_counter()
+        response = await client.post(
+            "/speech/transcribe",
+            params={"stage": "basic", "session_id": "bench"},
+            files={"file": ("basic-1.webm", clip, "audio/webm")},
+        )
+        elapsed = time.perf_counter() - start
+    if response.status_code not in (200, 422):
+        response.raise_for_status()
+    return elapsed
+
+
+async def stream(clip: bytes, seconds: float, chunk_ms: int) -> tuple[float, int, float]:
+    chunks = max(1, int(seconds * 1000 / chunk_ms))
+    size = -(-len(clip) // chunks)
+    url = f"ws://127.0.0.1:{APP_PORT}/speech/stream?stage=basic&session_id=bench"
+    partials = 0
+    async with websockets.connect(url) as ws:
+
+        async def speak() -> float:
+            for i in range(chunks):
+                await ws.send(clip[i * size : (i + 1) * size])
+                await asyncio.sleep(chunk_ms / 1000)
+            await ws.send("end")
+            return time.perf_counter()
+
+        speaking = asyncio.create_task(speak())
+        async for message in ws:
+            event = json.loads(message)
+            if event["type"] == "partial":
+                partials += 1
+                continue
+            ended = await speaking
+            return time.perf_counter() - ended, partials, event.get("finalize_ms", 0.0)
+    raise RuntimeError("stream closed without a final message")
+
+
+async def run(args, clip: bytes) -> None:
+    upload_times, stream_times, partial_counts, finalize = [], [], [], []
+    for _ in range(args.rounds):
+        upload_times.append(await upload(clip, args.seconds))
+        elapsed, partials, finalize_ms = await stream(clip, args.seconds, args.chunk_ms)
+        stream_times.append(elapsed)
+        partial_counts.append(partials)
+        finalize.append(finalize_ms)
+    print(f"upload after recording  end of speech -> selections p50={statistics.median(upload_times) * 1000:7.1f}ms")
+    print(f"websocket stream        end of speech -> selections p50={statistics.median(stream_times) * 1000:7.1f}ms "
+          f"(server finalize p50={statistics.median(finalize):.1f}ms, {statistics.mean(partial_counts):.1f} partials per answer)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=6.0, help="length of the spoken answer")
+    parser.add_argument("--chunk-ms", type=int, default=250, help="MediaRecorder timeslice")
+    parser.add_argument("--latency", type=float, default=0.3, help="stub upstream latency in seconds")
+    parser.add_argument("--clip", type=Path, help="webm recording to use instead of a synthetic clip")
+    parser.add_argument("--remote", action="store_true", help="transcribe through the stub API instead of local Whisper")
+    args = parser.parse_args()
+    if args.remote:
+        os.environ["TRANSCRIBE_ROUTING"] = "remote"
+
+    clip = args.clip.read_bytes() if args.clip else encode_webm(to_wav_bytes(synth_clip(args.seconds)))
+    from app import app
+
+    with run_stub_in_thread(STUB_PORT, latency=args.latency), serve_in_thread(app, APP_PORT):
+        asyncio.run(run(args, clip))
+
+
+if __name__ == "__main__":
+    main()
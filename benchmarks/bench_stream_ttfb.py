@@ -0,0 +1,84 @@
+"""Time-to-first-byte of the FINAL stage: /chat/ingest vs /chat/ingest/stream.
+
+The stub replays SAMPLE_PLAN with a fixed time to first token plus a
+per-token delay, so the blocking endpoint pays the full generation time
+before responding while the streaming endpoint forwards the first chunk
+almost immediately.
+
+    python -m benchmarks.bench_stream_ttfb --latency 0.3 --token-delay 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+APP_PORT = int(os.getenv("BENCH_APP_PORT", "8901"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+# Plans must come from the (stub) LLM for this measurement
+os.environ.setdefault("PLAN_ENGINE", "off")
+os.environ.setdefault("PLAN_CACHE_ENABLED", "0")
+
+import httpx  # noqa: E402
+
+from benchmarks.stub_server import run_stub_in_thread, serve_in_thread  # noqa: E402
+
+BASICS = {"age": 30, "gender": "male", "height_cm": 180, "weight_kg": 80, "activity_level": "moderately_active"}
+GOALS = {"goals": ["strength"]}
+PREFS = {"equipment": ["bodyweight"], "preferred_workout_types": ["strength_training"]}
+
+
+async def _prepare_session(client: httpx.AsyncClient) -> str:
+    session_id = str(uuid.uuid4())
+    for stage, selections in (("basic", BASICS), ("goals", GOALS)):
+        response = await client.post("/chat/ingest", json={"session_id": session_id, "stage": stage, "selections": selections})
+        response.raise_for_status()
+    return session_id
+
+
+async def _measure(client: httpx.AsyncClient, path: str) -> tuple[float, float, float]:
+    """Return (first byte, first plan text, complete) in seconds."""
+    session_id = await _prepare_session(client)
+    payload = {"session_id": session_id, "stage": "final", "selections": PREFS}
+    start = time.perf_counter()
+    first_byte = first_text = None
+    async with client.stream("POST", path, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            if first_text is None and ('"token"' in line or '"workout"' in line):
+                first_text = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return first_byte or total, first_text or total, total
+
+
+async def run(rounds: int) -> None:
+    # A real server is needed here: httpx.ASGITransport buffers whole bodies.
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=120) as client:
+        print(f"{'endpoint':<22} {'ttfb p50 (ms)':>14} {'first plan text (ms)':>21} {'total p50 (ms)':>15}")
+        for path in ("/chat/ingest", "/chat/ingest/stream"):
+            samples = [await _measure(client, path) for _ in range(rounds)]
+            ttfb, first_text, total = (statistics.median(s[i] for s in samples) * 1000 for i in range(3))
+            print(f"{path:<22} {ttfb:>14.0f} {first_text:>21.0f} {total:>15.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="stub delay per output token (s)")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    from app import app
+
+    with run_stub_in_thread(STUB_PORT, latency=args.latency, token_delay=args.token_delay):
+        with serve_in_thread(app, APP_PORT):
+            asyncio.run(run(args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Output tokens and generation latency of structured plans against markdown plans.
+
+Uses the plan engine's profile grid. Each covered profile's engine plan
+stands in for an LLM plan. It is recovered as a StructuredPlan, and
+modifications and tips are dropped when they equal the defaults that
+render_plan fills in. The result is the terse JSON the
+PLAN_FORMAT=structured prompt asks for. Each plan is checked to render
+back to the exact markdown. Token counts use tiktoken's cl100k_base when
+it is installed. Otherwise they use a regex approximation of its
+pre-tokenizer, which undercounts long words for both formats alike.
+
+For latency, ``--latency-profiles`` of those plans go through
+WorkoutOrchestrator.generate_workout twice against the LLM stub. The first
+run uses the markdown prompt and the second the structured prompt. The stub
+answers with that profile's markdown or JSON and charges ``--token-delay``
+per token of the same tokenizer.
+
+    python -m benchmarks.bench_structured_plan --latency 0.3 --token-delay 0.004
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+
+from benchmarks.bench_plan_engine import _profiles  # noqa: E402
+from benchmarks.stub_server import run_stub_in_thread  # noqa: E402
+from services.llm_client import LLMClient  # noqa: E402
+from services.orchestrator import WorkoutOrchestrator  # noqa: E402
+from services.plan_engine import PlanEngine, default_modifications, default_tips  # noqa: E402
+from services.structured_plan import plan_from_markdown, render_plan  # noqa: E402
+
+_PRETOKEN = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|_+|\s+")
+
+
+def tokenizer():
+    """(name, split) for the token counts: tiktoken cl100k_base, or the regex approximation."""
+    try:
+        import tiktoken  # type: ignore
+    except ImportError:
+        return "regex approximation of cl100k_base", _PRETOKEN.findall
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return "tiktoken cl100k_base", lambda text: [encoding.decode([t]) for t in encoding.encode(text)]
+
+
+def make_pairs(limit: int) -> list[tuple]:
+    """(profile, markdown, terse JSON) for every engine-covered profile in the grid."""
+    engine = PlanEngine()
+    pairs = []
+    for profile in _profiles(limit):
+        if not engine.covers(profile):
+            continue
+        markdown = engine.build(profile)
+        plan = plan_from_markdown(markdown, profile)
+        assert plan is not None, profile.user_id
+        plan = plan.model_copy(update={
+            "modifications": None if plan.modifications == default_modifications(profile) else plan.modifications,
+            "tips": None if plan.tips == default_tips(profile) else plan.tips,
+        })
+        assert render_plan(plan, profile) == markdown, profile.user_id
+        pairs.append((profile, markdown, plan.model_dump_json(exclude_none=True)))
+    return pairs
+
+
+async def run(pairs: list[tuple], stub, split) -> None:
+    llm = LLMClient(base_url=f"http://127.0.0.1:{STUB_PORT}", api_key="bench", max_connections=8)
+    markdown_orchestrator = WorkoutOrchestrator(llm=llm)
+    structured_orchestrator = WorkoutOrchestrator(llm=llm, structured_plans=True)
+    stub.state.tokenize = split
+    times: dict[str, list[float]] = {"markdown": [], "structured": []}
+    for profile, markdown, plan_json in pairs:
+        stub.state.plan, stub.state.plan_json = markdown, plan_json
+        for label, orchestrator in (("markdown", markdown_orchestrator), ("structured", structured_orchestrator)):
+            start = time.perf_counter()
+            result = await orchestrator.generate_workout(profile, use_cache=False)
+            times[label].append(time.perf_counter() - start)
+            assert result["workout"] == markdown, (label, profile.user_id)
+    await llm.aclose()
+
+    print(f"{'generate_workout':<17} {'p50 ms':>8} {'p95 ms':>8}   ({len(pairs)} profiles)")
+    for label, values in times.items():
+        ordered = sorted(values)
+        print(f"{label:<17} {statistics.median(values) * 1000:>8.0f} {ordered[int(len(ordered) * 0.95)] * 1000:>8.0f}")
+    saved = 1 - statistics.median(times["structured"]) / statistics.median(times["markdown"])
+    print(f"structured plans cut p50 latency by {saved:.0%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=2000, help="profiles taken from the plan engine grid")
+    parser.add_argument("--latency-profiles", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub time to first token")
+    parser.add_argument("--token-delay", type=float, default=0.004, help="stub seconds per output token")
+    args = parser.parse_args()
+
+    name, split = tokenizer()
+    pairs = make_pairs(args.profiles)
+    markdown_tokens = [len(split(markdown)) for _, markdown, _ in pairs]
+    json_tokens = [len(split(plan_json)) for _, _, plan_json in pairs]
+    print(f"{len(pairs)} engine-covered plans, tokens by {name}")
+    print(f"{'output tokens':<17} {'mean':>8} {'p50':>8} {'max':>8}")
+    for label, counts in (("markdown", markdown_tokens), ("structured json", json_tokens)):
+        print(f"{label:<17} {statistics.mean(counts):>8.0f} {statistics.median(counts):>8.0f} {max(counts):>8}")
+    print(f"structured plans cut output tokens by {1 - sum(json_tokens) / sum(markdown_tokens):.0%}")
+
+    step = max(1, len(pairs) // args.latency_profiles)
+    with run_stub_in_thread(STUB_PORT, args.latency, args.token_delay) as stub:
+        asyncio.run(run(pairs[::step][: args.latency_profiles], stub, split))
+
+
+if __name__ == "__main__":
+    main()
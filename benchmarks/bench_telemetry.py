@@ -0,0 +1,71 @@
+"""Overhead of the request tracing: span() cost and TimingMiddleware per request.
+
+Times a bare span() in a tight loop, then drives a minimal endpoint that
+records a handful of spans through the ASGI stack with and without
+TimingMiddleware, so the difference is the tracing cost alone.
+
+    python -m benchmarks.bench_telemetry --requests 5000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from services.telemetry import TimingMiddleware, span
+
+SPANS = ("decode", "whisper", "extract_local", "llm", "serialize")
+
+
+def make_app(traced: bool) -> FastAPI:
+    bench = FastAPI()
+    if traced:
+        bench.add_middleware(TimingMiddleware)
+
+    @bench.get("/turn")
+    async def turn():
+        for name in SPANS:
+            with span(name):
+                pass
+        return {"ok": True}
+
+    return bench
+
+
+async def per_request(traced: bool, requests: int) -> float:
+    transport = httpx.ASGITransport(app=make_app(traced))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get("/turn")
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/turn")
+        elapsed = time.perf_counter() - start
+    if traced:
+        assert "server-timing" in response.headers
+    return elapsed / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--spans", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.spans):
+        with span("bench"):
+            pass
+    print(f"span()            {(time.perf_counter() - start) / args.spans * 1e6:.2f}us per span")
+
+    plain = asyncio.run(per_request(False, args.requests))
+    traced = asyncio.run(per_request(True, args.requests))
+    print(f"request untraced  {plain * 1e6:7.1f}us")
+    print(f"request traced    {traced * 1e6:7.1f}us  (+{(traced - plain) * 1e6:.1f}us with {len(SPANS)} spans)")
+
+
+if __name__ == "__main__":
+    main()
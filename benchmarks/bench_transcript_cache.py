@@ -0,0 +1,103 @@
+"""Retried and re-uploaded recordings through /speech/transcribe, with and without the transcript cache.
+
+Each simulated session uploads one distinct clip per stage. With
+probability ``--retry-rate`` the client sends the identical recording
+again, as a mobile client does after a dropped response. Transcription and
+extraction are answered by the replay stub. Local extraction is off by
+default so every miss pays an extraction LLM call, as a low-confidence
+transcript would. Reports upstream calls, latency of first uploads versus
+retries, and the cache's hit rates.
+
+    python -m benchmarks.bench_transcript_cache --sessions 100 --retry-rate 0.3
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+APP_PORT = int(os.getenv("BENCH_APP_PORT", "8901"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+os.environ.setdefault("TRANSCRIBE_ROUTING", "remote")
+os.environ.setdefault("FAST_EXTRACT_ENABLED", "0")
+
+import httpx  # noqa: E402
+
+from benchmarks.audio import synth_clip, to_wav_bytes  # noqa: E402
+from benchmarks.replay_stub import run_replay_in_thread  # noqa: E402
+from benchmarks.stub_server import serve_in_thread  # noqa: E402
+
+STAGES = ("basic", "goals", "final")
+
+
+async def upload(client: httpx.AsyncClient, stage: str, session_id: str, name: str, clip: bytes) -> float:
+    start = time.perf_counter()
+    response = await client.post(
+        "/speech/transcribe",
+        params={"stage": stage, "session_id": session_id},
+        files={"file": (name, clip, "audio/wav")},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(stub, args, clips) -> dict:
+    rng = random.Random(args.seed)
+    first, retries = [], []
+    stub.state.calls = 0
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=120) as client:
+
+        async def session(i: int) -> None:
+            session_id = str(uuid.uuid4())
+            for stage in STAGES:
+                name, clip = f"{stage}-{i}.wav", clips[(i, stage)]
+                first.append(await upload(client, stage, session_id, name, clip))
+                while rng.random() < args.retry_rate:
+                    retries.append(await upload(client, stage, session_id, name, clip))
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(i: int) -> None:
+            async with semaphore:
+                await session(i)
+
+        await asyncio.gather(*[bounded(i) for i in range(args.sessions)])
+    return {"first": first, "retries": retries, "calls": stub.state.calls}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--retry-rate", type=float, default=0.3, help="chance of re-sending the same clip, repeatedly")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import app as app_module
+    from services.transcript_cache import TranscriptCache
+
+    clips = {(i, stage): to_wav_bytes(synth_clip(1.5, seed=i * len(STAGES) + n)) for i in range(args.sessions) for n, stage in enumerate(STAGES)}
+    with run_replay_in_thread(STUB_PORT, chat_latency="fixed:0.25", transcribe_latency="fixed:0.4") as stub, \
+            serve_in_thread(app_module.app, APP_PORT):
+        for label, cache in (("no cache", None), ("transcript cache", TranscriptCache())):
+            app_module.transcript_cache = cache
+            result = asyncio.run(run(stub, args, clips))
+            uploads = len(result["first"]) + len(result["retries"])
+            print(
+                f"{label:<17} uploads={uploads:<4} upstream calls={result['calls']:<4} "
+                f"first p50={statistics.median(result['first']) * 1000:6.1f}ms "
+                f"retry p50={statistics.median(result['retries']) * 1000 if result['retries'] else 0:6.1f}ms"
+            )
+            if cache is not None:
+                stats = cache.stats()
+                print(f"{'':<17} transcript hit rate={stats['transcript_hit_rate']:.3f} "
+                      f"selection hit rate={stats['selection_hit_rate']:.3f} entries={stats['entries']} bytes={stats['bytes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Micro-batched versus unbatched Whisper decoding under bursty arrivals.
+
+Clips arrive as a Poisson process at ``--rate`` per second. The same arrival
+schedule is replayed through the plain executor and through
+TranscriptionBatcher, and the script reports throughput and p50/p99 latency
+for each. Requires openai-whisper (and ffmpeg) to be installed.
+
+    python -m benchmarks.bench_transcription_batching --clips 64 --rate 20 --window-ms 25 --max-batch 8
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.audio import synth_clip, to_wav_bytes
+from services.transcription import TranscriptionBatcher
+from services.transcription_executor import TranscriptionExecutor
+
+
+def _pct(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+
+
+async def run(label: str, paths: list[str], gaps: list[float], workers: int, window_ms: float, max_batch: int) -> None:
+    executor = TranscriptionExecutor(workers=workers, max_queue=len(paths))
+    executor.start()
+    await asyncio.gather(*[executor.transcribe(paths[0]) for _ in range(workers)])
+    transcriber = TranscriptionBatcher(executor, window_ms, max_batch) if window_ms > 0 else executor
+
+    latencies: list[float] = []
+
+    async def one(path: str) -> None:
+        start = time.perf_counter()
+        await transcriber.transcribe(path)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    tasks = []
+    for path, gap in zip(paths, gaps):
+        await asyncio.sleep(gap)
+        tasks.append(asyncio.create_task(one(path)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    stats = executor.stats()
+    executor.shutdown()
+    print(
+        f"{label:<10} clips/s={len(paths) / elapsed:6.2f} p50={_pct(latencies, 0.5):7.0f}ms "
+        f"p99={_pct(latencies, 0.99):7.0f}ms avg_batch={stats['avg_batch_size']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=64)
+    parser.add_argument("--rate", type=float, default=20.0, help="mean arrivals per second")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--window-ms", type=float, default=25.0)
+    parser.add_argument("--max-batch", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    tmpdir = tempfile.mkdtemp()
+    paths = []
+    for i in range(4):
+        path = os.path.join(tmpdir, f"clip{i}.wav")
+        with open(path, "wb") as fh:
+            fh.write(to_wav_bytes(synth_clip(seconds=rng.uniform(1.5, 4.0), seed=i)))
+        paths.append(path)
+    clips = [paths[i % len(paths)] for i in range(args.clips)]
+    gaps = [rng.expovariate(args.rate) for _ in clips]
+
+    asyncio.run(run("unbatched", clips, gaps, args.workers, 0, 1))
+    asyncio.run(run("batched", clips, gaps, args.workers, args.window_ms, args.max_batch))
+
+
+if __name__ == "__main__":
+    main()
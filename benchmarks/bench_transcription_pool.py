@@ -0,0 +1,65 @@
+"""Transcription throughput versus pool size on a CPU-only box.
+
+Submits clips concurrently through TranscriptionExecutor with 1..N worker
+processes and reports requests/s, service time and how many requests were
+shed. Requires openai-whisper (and ffmpeg) to be installed.
+
+    python -m benchmarks.bench_transcription_pool --workers 1 2 4 --clips 32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from fastapi import HTTPException
+
+from benchmarks.audio import synth_clip, to_wav_bytes
+from services.transcription_executor import TranscriptionExecutor
+
+
+async def run(workers: int, clips: int, path: str, max_queue: int) -> None:
+    executor = TranscriptionExecutor(workers=workers, max_queue=max_queue)
+    executor.start()
+    # Wait for every worker to load its model before timing
+    await asyncio.gather(*[executor.transcribe(path) for _ in range(workers)])
+
+    async def one() -> bool:
+        try:
+            await executor.transcribe(path)
+            return True
+        except HTTPException:
+            return False
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[one() for _ in range(clips)])
+    elapsed = time.perf_counter() - start
+    stats = executor.stats()
+    executor.shutdown()
+    served = sum(results)
+    print(
+        f"workers={workers:<3} served={served:<4} shed={clips - served:<4} "
+        f"rps={served / elapsed:6.2f} service_p50={stats['service_time_p50_ms']}ms "
+        f"queue_wait_p95={stats['queue_wait_p95_ms']}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument("--clips", type=int, default=32)
+    parser.add_argument("--max-queue", type=int, default=1000, help="set low to exercise load shedding")
+    args = parser.parse_args()
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+        tmp.write(to_wav_bytes(synth_clip(seconds=3.0)))
+    try:
+        for workers in args.workers:
+            asyncio.run(run(workers, args.clips, tmp.name, args.max_queue))
+    finally:
+        os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
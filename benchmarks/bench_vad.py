@@ -0,0 +1,134 @@
+"""CPU seconds per transcription request with and without the voice activity gate.
+
+The clip mix is shaped like real intake traffic. Answers have 0.3-3 s of
+lead-in before the user speaks and trail off into 0.5-4 s of room noise
+before they tap stop. There are one-word answers ("yes", "gym") and
+accidental taps that record only noise or silence. Every clip gets
+low-level background noise. ``--audio-dir`` adds real 16 kHz mono WAV
+recordings to the mix.
+
+The VAD is always measured: its cost per clip, how many clips it rejects
+and how much audio it trims. With openai-whisper installed, the same clips
+are also transcribed twice: the baseline is ``model.transcribe`` on the
+full clip; the gated path is VAD, then trim, then ``transcribe_clip``
+(single-pass decode for short clips). CPU time is ``time.process_time``,
+which counts every torch thread.
+
+    python -m benchmarks.bench_vad --clips 60 --threads 1
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import time
+import wave
+from pathlib import Path
+
+from benchmarks.audio import SAMPLE_RATE, synth_clip
+
+
+def noise(rng: random.Random, seconds: float, dbfs: float) -> list[float]:
+    sigma = 10 ** (dbfs / 20)
+    return [rng.gauss(0, sigma) for _ in range(int(seconds * SAMPLE_RATE))]
+
+
+def make_mix(count: int, seed: int) -> list[tuple[str, list[float]]]:
+    """(kind, samples) pairs: 70% answers, 15% one-word answers, 15% empty recordings."""
+    rng = random.Random(seed)
+    clips = []
+    for i in range(count):
+        roll = rng.random()
+        floor = rng.uniform(-65, -45)
+        if roll < 0.70:
+            kind, speech = "answer", synth_clip(rng.uniform(2, 12), rng.uniform(0.3, 3.0), rng.uniform(0.5, 4.0), seed=i)
+        elif roll < 0.85:
+            kind, speech = "short", synth_clip(rng.uniform(0.4, 1.2), rng.uniform(0.3, 1.5), rng.uniform(0.5, 2.0), seed=i)
+        else:
+            kind, speech = "empty", [0.0] * int(rng.uniform(0.5, 4.0) * SAMPLE_RATE)
+        background = noise(rng, len(speech) / SAMPLE_RATE + 1, floor)
+        clips.append((kind, [s + n for s, n in zip(speech, background)]))
+    return clips
+
+
+def load_wavs(directory: Path) -> list[tuple[str, list[float]]]:
+    clips = []
+    for path in sorted(directory.glob("*.wav")):
+        with wave.open(str(path)) as wav:
+            if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                print(f"skipping {path.name}: not 16 kHz mono s16le")
+                continue
+            frames = wav.readframes(wav.getnframes())
+        clips.append(("recording", [int.from_bytes(frames[i : i + 2], "little", signed=True) / 32768 for i in range(0, len(frames), 2)]))
+    return clips
+
+
+def cpu(fn) -> tuple[float, object]:
+    start = time.process_time()
+    result = fn()
+    return time.process_time() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--audio-dir", type=Path, help="extra 16 kHz mono WAV recordings")
+    parser.add_argument("--threads", type=int, default=1, help="torch threads for the Whisper comparison")
+    args = parser.parse_args()
+
+    import numpy as np
+
+    from services.vad import find_speech, trim_silence, vad_stats
+
+    clips = make_mix(args.clips, args.seed) + (load_wavs(args.audio_dir) if args.audio_dir else [])
+    arrays = [(kind, np.asarray(samples, dtype=np.float32)) for kind, samples in clips]
+    total_seconds = sum(len(a) for _, a in arrays) / SAMPLE_RATE
+
+    vad_times = []
+    for _, audio in arrays:
+        start = time.perf_counter()
+        for _ in range(20):
+            find_speech(audio)
+        vad_times.append((time.perf_counter() - start) / 20)
+    gated = [(kind, audio, trim_silence(audio)) for kind, audio in arrays]
+    stats = vad_stats.stats()
+    by_kind: dict[str, list[int]] = {}
+    for kind, _, trimmed in gated:
+        by_kind.setdefault(kind, [0, 0])
+        by_kind[kind][0] += 1
+        by_kind[kind][1] += trimmed is None
+    print(f"{len(arrays)} clips, {total_seconds:.0f}s of audio")
+    print(f"vad cost          p50={statistics.median(vad_times) * 1e6:7.1f}us max={max(vad_times) * 1e6:7.1f}us per clip")
+    print(f"vad trimmed       {stats['trimmed_seconds']:.1f}s of {stats['input_seconds']:.1f}s ({stats['trimmed_rate']:.1%})")
+    print("vad rejected      " + "  ".join(f"{kind}={rejected}/{count}" for kind, (count, rejected) in sorted(by_kind.items())))
+
+    try:
+        import torch  # type: ignore
+    except ImportError:
+        print("openai-whisper is not installed; skipping the Whisper CPU comparison")
+        return
+
+    from services.transcription import _get_whisper_model, transcribe_clip, transcribe_options
+
+    torch.set_num_threads(args.threads)
+    model = _get_whisper_model()
+    options = transcribe_options(model)
+    model.transcribe(arrays[0][1], **options)  # warm-up
+    baseline, gated_cpu = [], []
+    for _, audio in arrays:
+        baseline.append(cpu(lambda: model.transcribe(audio, **options))[0])
+        start = time.process_time()
+        trimmed = trim_silence(audio)
+        if trimmed is not None:
+            transcribe_clip(model, trimmed)
+        gated_cpu.append(time.process_time() - start)
+    print(f"{'':<17} {'CPU s/request':>14} {'p50':>8} {'p95':>8}   (WHISPER_MODEL_SIZE={os.getenv('WHISPER_MODEL_SIZE', 'tiny.en')})")
+    for label, times in (("baseline", baseline), ("vad + short path", gated_cpu)):
+        ordered = sorted(times)
+        print(f"{label:<17} {statistics.mean(times):>14.3f} {ordered[len(ordered) // 2]:>8.3f} {ordered[int(len(ordered) * 0.95)]:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""BASIC-stage voice turn: /speech/transcribe + /chat/ingest versus /speech/turn.
+
+The app runs under uvicorn against the LLM stub, which also answers the
+Groq transcription fallback with a BASIC-stage sentence the local
+extractor resolves. ``--rtt`` adds a simulated client network round trip
+to every request, so the two-request flow pays it twice.
+
+    python -m benchmarks.bench_voice_turn --latency 0.1 --rtt 0.08
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+STUB_PORT = int(os.getenv("BENCH_STUB_PORT", "8900"))
+APP_PORT = int(os.getenv("BENCH_APP_PORT", "8901"))
+os.environ.setdefault("GROQ_BASE_URL", f"http://127.0.0.1:{STUB_PORT}")
+# Every turn must reach the upstream for this measurement
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+os.environ.setdefault("TRANSCRIBE_WORKERS", "1")
+
+import httpx  # noqa: E402
+
+from benchmarks.audio import synth_clip, to_wav_bytes  # noqa: E402
+from benchmarks.stub_server import run_stub_in_thread, serve_in_thread  # noqa: E402
+
+CLIP = to_wav_bytes(synth_clip(2.0))
+
+
+async def _post(client: httpx.AsyncClient, rtt: float, path: str, **kwargs) -> httpx.Response:
+    await asyncio.sleep(rtt)
+    response = await client.post(path, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+async def _two_requests(client: httpx.AsyncClient, rtt: float) -> float:
+    session_id = str(uuid.uuid4())
+    start = time.perf_counter()
+    transcribed = await _post(
+        client, rtt, "/speech/transcribe",
+        params={"stage": "basic", "session_id": session_id},
+        files={"file": ("turn.wav", CLIP, "audio/wav")},
+    )
+    payload = {"session_id": session_id, "stage": "basic", "selections": transcribed.json()["selections"]}
+    await _post(client, rtt, "/chat/ingest", json=payload)
+    return time.perf_counter() - start
+
+
+async def _one_request(client: httpx.AsyncClient, rtt: float) -> float:
+    start = time.perf_counter()
+    response = await _post(
+        client, rtt, "/speech/turn",
+        params={"stage": "basic", "session_id": str(uuid.uuid4())},
+        files={"file": ("turn.wav", CLIP, "audio/wav")},
+    )
+    assert response.json()["next_stage"] == "goals", response.text
+    return time.perf_counter() - start
+
+
+async def run(rounds: int, rtt: float) -> None:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=120) as client:
+        await _one_request(client, 0.0)  # warm up the pools
+        results = {"transcribe + ingest": [], "speech/turn": []}
+        for _ in range(rounds):
+            results["transcribe + ingest"].append(await _two_requests(client, rtt))
+            results["speech/turn"].append(await _one_request(client, rtt))
+
+    for label, samples in results.items():
+        print(f"{label:<20} n={len(samples):<3} p50={statistics.median(samples) * 1000:8.1f}ms "
+              f"p95={sorted(samples)[int(len(samples) * 0.95) - 1] * 1000:8.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub upstream latency in seconds")
+    parser.add_argument("--rtt", type=float, default=0.08, help="simulated client round trip in seconds")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    from app import app
+
+    with run_stub_in_thread(STUB_PORT, latency=args.latency), serve_in_thread(app, APP_PORT):
+        asyncio.run(run(args.rounds, args.rtt))
+
+
+if __name__ == "__main__":
+    main()
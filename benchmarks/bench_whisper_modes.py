@@ -0,0 +1,104 @@
+"""Accuracy versus latency for Whisper model sizes in fp32 and fast (int8, greedy) mode.
+
+The corpus is a set of short intake answers, rendered to 16 kHz WAV with
+espeak-ng when it is available, or read from ``--audio-dir`` as
+``<name>.wav`` + ``<name>.txt`` pairs (for real recordings). Word error rate
+is computed against the reference text. Requires openai-whisper and ffmpeg.
+
+    python -m benchmarks.bench_whisper_modes --configs tiny.en:fp32 base.en:fast tiny.en:fast
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from services.transcription import quantize_whisper_model, transcribe_options
+
+CORPUS = [
+    "I'm thirty years old, male, five foot ten and about eighty kilos.",
+    "I'm a twenty five year old woman, one sixty five centimeters, sixty kilograms.",
+    "I'd say I'm moderately active, I walk to work most days.",
+    "I want to lose weight and build some strength.",
+    "Mostly muscle gain, maybe a bit of endurance too.",
+    "I only have dumbbells and resistance bands at home.",
+    "I prefer yoga and HIIT in the morning.",
+    "I have a bad knee, so no jumping please.",
+    "I'm pretty sedentary, I sit at a desk all day.",
+    "I have gym access and like strength training in the evening.",
+]
+
+
+def _words(text: str) -> list[str]:
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = _words(reference), _words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def load_corpus(audio_dir: str | None) -> list[tuple[str, str]]:
+    if audio_dir:
+        return [(str(wav), wav.with_suffix(".txt").read_text().strip()) for wav in sorted(Path(audio_dir).glob("*.wav"))]
+    espeak = shutil.which("espeak-ng") or shutil.which("espeak")
+    if not espeak:
+        raise SystemExit("espeak-ng not found; install it or pass --audio-dir with wav/txt pairs")
+    tmpdir = tempfile.mkdtemp()
+    pairs = []
+    for i, text in enumerate(CORPUS):
+        path = os.path.join(tmpdir, f"utt{i}.wav")
+        subprocess.run([espeak, "-v", "en-us", "-s", "150", "-w", path, text], check=True)
+        pairs.append((path, text))
+    return pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--configs", nargs="+", default=["tiny.en:fp32", "tiny.en:fast", "base.en:fp32", "base.en:fast"])
+    parser.add_argument("--audio-dir", default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    import torch  # type: ignore
+    import whisper  # type: ignore
+
+    torch.set_num_threads(1)
+    corpus = load_corpus(args.audio_dir)
+    audios = [(whisper.load_audio(path), text) for path, text in corpus]
+    print(f"{'config':<14} {'WER':>6} {'p50 ms':>8} {'mean ms':>8}")
+    for config in args.configs:
+        size, mode = config.split(":")
+        fast = mode == "fast"
+        model = whisper.load_model(size, device="cpu")
+        if fast:
+            model = quantize_whisper_model(model)
+        options = transcribe_options(model, fast=fast)
+        model.transcribe(audios[0][0], **options)  # warm-up
+        latencies, errors = [], []
+        for audio, reference in audios:
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                text = model.transcribe(audio, **options)["text"]
+                latencies.append(time.perf_counter() - start)
+            errors.append(word_error_rate(reference, text))
+        print(
+            f"{config:<14} {statistics.mean(errors):>6.3f} "
+            f"{statistics.median(latencies) * 1000:>8.0f} {statistics.mean(latencies) * 1000:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
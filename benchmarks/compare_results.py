@@ -0,0 +1,72 @@
+"""Compare two bench_load result files and flag regressions.
+
+Prints per-stage p50/p95/p99, throughput and memory growth side by side
+with the relative change, and exits non-zero when any stage's p95 (or
+throughput) is worse than ``--threshold`` percent, so it can gate a
+commit on an offline box:
+
+    python -m benchmarks.compare_results baseline.json candidate.json --threshold 10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List
+
+
+def _change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(baseline: Dict, candidate: Dict, threshold: float) -> List[str]:
+    """Print the comparison and return the regressions found."""
+    regressions: List[str] = []
+    print(f"baseline  {baseline.get('commit')} {baseline.get('timestamp')}")
+    print(f"candidate {candidate.get('commit')} {candidate.get('timestamp')}")
+    if baseline["config"] != candidate["config"]:
+        print("warning: the runs used different settings; deltas may not be meaningful")
+
+    print(f"\n{'stage':<18}{'metric':<8}{'baseline':>10}{'candidate':>11}{'change':>9}")
+    for name, old in baseline["stages"].items():
+        new = candidate["stages"].get(name)
+        if new is None:
+            print(f"{name:<18}missing from candidate")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            delta = _change(old[metric], new[metric])
+            print(f"{name:<18}{metric[:3]:<8}{old[metric]:>10.1f}{new[metric]:>11.1f}{delta:>+8.1f}%")
+            if metric == "p95_ms" and delta > threshold:
+                regressions.append(f"{name} p95 {old[metric]:.1f} -> {new[metric]:.1f}ms ({delta:+.1f}%)")
+        if new["errors"] > old["errors"]:
+            regressions.append(f"{name} errors {old['errors']} -> {new['errors']}")
+
+    old_rate = baseline["throughput"]["sessions_per_s"]
+    new_rate = candidate["throughput"]["sessions_per_s"]
+    delta = _change(old_rate, new_rate)
+    print(f"\n{'sessions/s':<26}{old_rate:>10.2f}{new_rate:>11.2f}{delta:>+8.1f}%")
+    if -delta > threshold:
+        regressions.append(f"throughput {old_rate} -> {new_rate} sessions/s ({delta:+.1f}%)")
+    old_growth = baseline["memory"]["growth_kb_per_session"]
+    new_growth = candidate["memory"]["growth_kb_per_session"]
+    print(f"{'RSS KiB/session':<26}{old_growth:>10.2f}{new_growth:>11.2f}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95/throughput regression in percent")
+    args = parser.parse_args()
+    regressions = compare(json.loads(args.baseline.read_text()), json.loads(args.candidate.read_text()), args.threshold)
+    if regressions:
+        print("\nregressions:")
+        for line in regressions:
+            print(f"  {line}")
+        raise SystemExit(1)
+    print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Replays recorded Groq responses with configurable latency distributions.
+
+Chat-completion requests are matched to a recording by an exact hash of the
+request first, then by category (stage acknowledgement, plan or per-stage
+extraction), cycling through that category's recordings. Transcriptions
+are matched by the upload's filename prefix (``basic-1.wav`` -> "basic").
+
+Latency specs: ``fixed:0.2``, ``uniform:0.1,0.4``, ``lognormal:0.3,0.5``
+(median seconds, sigma) or ``recorded`` (the latency captured with each
+response, falling back to 0.2s).
+
+Record new responses from the live API by pointing the app at
+
+    python -m benchmarks.replay_stub --record --upstream https://api.groq.com/openai/v1
+
+which forwards every request, saves what came back to ``--recordings`` and
+replays it from then on. Without ``--record`` it runs offline:
+
+    python -m benchmarks.replay_stub --port 8900 --chat-latency lognormal:0.25,0.4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import math
+import random
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from benchmarks.stub_server import _tokens, serve_in_thread
+from services.singleflight import request_key
+
+DEFAULT_RECORDINGS = Path(__file__).parent / "recordings" / "default.json"
+
+
+class LatencyModel:
+    """A latency distribution parsed from a spec string (see the module docstring)."""
+
+    def __init__(self, spec: str, seed: int = 0):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in ("fixed", "uniform", "lognormal", "recorded"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self._rng = random.Random(seed)
+
+    def sample(self, recorded: Optional[float] = None) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self._rng.uniform(*self.params)
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return self._rng.lognormvariate(math.log(median), sigma)
+        return recorded if recorded is not None else 0.2
+
+
+def classify(body: Dict) -> str:
+    """Category of a chat-completions request made by the app."""
+    messages = body.get("messages", [])
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+    if "extract structured fields" in system:
+        if '"age"' in user:
+            return "extract_basic"
+        if '"goals"' in user:
+            return "extract_goals"
+        return "extract_final"
+    if body.get("max_tokens", 0) >= 1000:
+        return "plan"
+    return "ack_goals" if "Goals:" in user else "ack_basic"
+
+
+def chat_key(body: Dict) -> str:
+    return request_key(
+        model=body.get("model"),
+        messages=body.get("messages"),
+        max_tokens=body.get("max_tokens"),
+        temperature=body.get("temperature"),
+    )
+
+
+class Recordings:
+    """Recorded chat completions and transcriptions, loaded from (and saved to) a JSON file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        data = json.loads(path.read_text()) if path.exists() else {}
+        self.chat: List[Dict] = data.get("chat", [])
+        self.transcriptions: List[Dict] = data.get("transcriptions", [])
+        self._by_key = {entry["key"]: entry for entry in self.chat if entry.get("key")}
+        self._cycles: Dict[str, Iterator[Dict]] = {}
+        self.exact = 0
+        self.by_category = 0
+
+    def _cycle(self, category: str, entries: List[Dict]) -> Optional[Dict]:
+        matching = [entry for entry in entries if entry["category"] == category]
+        if not matching:
+            return None
+        if category not in self._cycles:
+            self._cycles[category] = itertools.cycle(matching)
+        return next(self._cycles[category])
+
+    def lookup(self, body: Dict) -> Optional[Dict]:
+        """The recording of exactly this request, if any."""
+        return self._by_key.get(chat_key(body))
+
+    def match_chat(self, body: Dict) -> Optional[Dict]:
+        entry = self.lookup(body)
+        if entry is not None:
+            self.exact += 1
+            return entry
+        entry = self._cycle(classify(body), self.chat)
+        if entry is not None:
+            self.by_category += 1
+        return entry
+
+    def match_transcription(self, filename: str) -> Optional[Dict]:
+        return self._cycle(filename.split("-")[0].split(".")[0], self.transcriptions)
+
+    def add_chat(self, body: Dict, content: str, usage: Optional[Dict], latency: float) -> None:
+        entry = {"category": classify(body), "key": chat_key(body), "content": content, "usage": usage, "latency": latency}
+        self.chat.append(entry)
+        self._by_key[entry["key"]] = entry
+        self._cycles.pop(entry["category"], None)
+        self.save()
+
+    def add_transcription(self, filename: str, text: str, latency: float) -> None:
+        category = filename.split("-")[0].split(".")[0]
+        self.transcriptions.append({"category": category, "text": text, "latency": latency})
+        self._cycles.pop(category, None)
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"chat": self.chat, "transcriptions": self.transcriptions}, indent=1))
+
+
+def make_replay_app(
+    recordings: Recordings,
+    chat_latency: LatencyModel,
+    plan_latency: LatencyModel,
+    transcribe_latency: LatencyModel,
+    token_delay: float = 0.0,
+    upstream: Optional[str] = None,
+) -> FastAPI:
+    """Build the replay app; with ``upstream`` set, unmatched requests are recorded from it."""
+    stub = FastAPI()
+    stub.state.calls = 0
+    stub.state.unmatched = 0
+    forward = httpx.AsyncClient(base_url=upstream, timeout=120) if upstream else None
+
+    @stub.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stub.state.calls += 1
+        category = classify(body)
+        entry = recordings.lookup(body) if forward else recordings.match_chat(body)
+        if entry is None and forward is not None:
+            start = time.perf_counter()
+            response = await forward.post(
+                "/chat/completions",
+                json={**body, "stream": False},
+                headers={"Authorization": request.headers.get("authorization", "")},
+            )
+            response.raise_for_status()
+            data = response.json()
+            recordings.add_chat(body, data["choices"][0]["message"]["content"], data.get("usage"), time.perf_counter() - start)
+            entry = recordings.lookup(body)
+        elif entry is None:
+            stub.state.unmatched += 1
+            entry = {"content": "{}" if category.startswith("extract") else "OK.", "usage": None}
+
+        # Record mode is for capturing responses, not timing; the upstream already took its time
+        latency = 0.0 if forward is not None else (plan_latency if category == "plan" else chat_latency).sample(entry.get("latency"))
+        content = entry["content"]
+        if body.get("stream"):
+            async def events() -> AsyncIterator[str]:
+                await asyncio.sleep(latency)
+                for token in _tokens(content):
+                    yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': token}}]})}\n\n"
+                    if token_delay:
+                        await asyncio.sleep(token_delay)
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(latency + token_delay * len(_tokens(content)))
+        reply = {"choices": [{"message": {"role": "assistant", "content": content}}]}
+        if entry.get("usage"):
+            reply["usage"] = entry["usage"]
+        return reply
+
+    @stub.post("/audio/transcriptions")
+    async def audio_transcriptions(request: Request):
+        form = await request.form()
+        upload = form["file"]
+        filename = getattr(upload, "filename", None) or "audio"
+        stub.state.calls += 1
+        # Audio has no stable key, so in record mode every clip is forwarded
+        entry = None if forward is not None else recordings.match_transcription(filename)
+        if forward is not None:
+            start = time.perf_counter()
+            response = await forward.post(
+                "/audio/transcriptions",
+                files={"file": (filename, await upload.read())},
+                data={"model": form.get("model", "whisper-large-v3")},
+                headers={"Authorization": request.headers.get("authorization", "")},
+            )
+            response.raise_for_status()
+            recordings.add_transcription(filename, response.json().get("text", ""), time.perf_counter() - start)
+            entry = recordings.transcriptions[-1]
+        elif entry is None:
+            stub.state.unmatched += 1
+            entry = {"text": ""}
+        if forward is None:
+            await asyncio.sleep(transcribe_latency.sample(entry.get("latency")))
+        return {"text": entry["text"]}
+
+    return stub
+
+
+@contextlib.contextmanager
+def run_replay_in_thread(
+    port: int,
+    recordings: Path = DEFAULT_RECORDINGS,
+    chat_latency: str = "lognormal:0.25,0.4",
+    plan_latency: str = "lognormal:2.0,0.3",
+    transcribe_latency: str = "lognormal:0.4,0.3",
+    token_delay: float = 0.0,
+    seed: int = 0,
+) -> Iterator[FastAPI]:
+    """Serve the replay stub on 127.0.0.1:port for the duration of the block."""
+    stub = make_replay_app(
+        Recordings(recordings),
+        LatencyModel(chat_latency, seed),
+        LatencyModel(plan_latency, seed + 1),
+        LatencyModel(transcribe_latency, seed + 2),
+        token_delay,
+    )
+    with serve_in_thread(stub, port):
+        yield stub
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--recordings", type=Path, default=DEFAULT_RECORDINGS)
+    parser.add_argument("--chat-latency", default="lognormal:0.25,0.4")
+    parser.add_argument("--plan-latency", default="lognormal:2.0,0.3")
+    parser.add_argument("--transcribe-latency", default="lognormal:0.4,0.3")
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", action="store_true", help="forward unmatched requests upstream and save them")
+    parser.add_argument("--upstream", default="https://api.groq.com/openai/v1")
+    args = parser.parse_args()
+    stub = make_replay_app(
+        Recordings(args.recordings),
+        LatencyModel(args.chat_latency, args.seed),
+        LatencyModel(args.plan_latency, args.seed + 1),
+        LatencyModel(args.transcribe_latency, args.seed + 2),
+        args.token_delay,
+        upstream=args.upstream if args.record else None,
+    )
+    uvicorn.run(stub, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
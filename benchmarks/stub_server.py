@@ -0,0 +1,218 @@
+"""Local stand-in for the Groq OpenAI-compatible API used by the benchmarks.
+
+Run standalone with ``python -m benchmarks.stub_server --port 8900 --latency 0.2``
+or start it in-process with :func:`run_stub_in_thread`.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import re
+import threading
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+SHORT_REPLY = "Sounds great, let's talk goals next."
+
+SAMPLE_PLAN = """# Weekly Workout Plan
+## Overview
+- Days per week: 3
+- Split type: 3-day full body
+- Equipment: bodyweight
+
+## Day 1 – Full Body Strength
+- Warm-Up:
+- 5 min brisk walk, 10 arm circles, 10 leg swings per side
+- Main Workout:
+- Squats 3x12, rest 60s – sit back and keep your chest up
+- Push-ups 3x10, rest 60s – brace your core
+- Glute bridges 3x15, rest 45s – squeeze at the top
+- Plank 3x30s, rest 30s
+- Cool-Down:
+- Hamstring and quad stretch, 30s each
+
+## Day 2 – Active Recovery
+- 20–30 min easy walk or mobility flow
+
+## Day 3 – Full Body Conditioning
+- Warm-Up:
+- Jumping jacks 2x30s, hip circles
+- Main Workout:
+- Reverse lunges 3x10 per leg, rest 60s
+- Pike push-ups 3x8, rest 60s
+- Mountain climbers 3x30s, rest 30s
+- Cool-Down:
+- Child's pose and chest opener, 60s each
+
+## Day 4 – Rest
+
+## Day 5 – Full Body Strength
+- Warm-Up:
+- 5 min light cardio
+- Main Workout:
+- Split squats 3x10 per leg, rest 60s
+- Incline push-ups 3x12, rest 60s
+- Superman holds 3x20s, rest 30s
+- Cool-Down:
+- Full body stretch, 5 min
+
+## Tips
+- Add 1–2 reps per set each week before making exercises harder.
+- Sleep well and keep at least one full rest day between hard sessions.
+"""
+
+# SAMPLE_PLAN as the StructuredPlan JSON the PLAN_FORMAT=structured prompt asks for
+SAMPLE_PLAN_JSON = json.dumps({
+    "days_per_week": 3,
+    "split": "3-day full body",
+    "warm_up": ["5 min brisk walk, 10 arm circles, 10 leg swings per side"],
+    "days": [
+        {"title": "Full Body Strength", "main": ["Squats 3x12, rest 60s – chest up", "Push-ups 3x10, rest 60s – brace your core", "Glute bridges 3x15, rest 45s – squeeze at the top", "Plank 3x30s, rest 30s"], "cool_down": ["Hamstring and quad stretch, 30s each"]},
+        {"title": "Active Recovery", "note": "20–30 min easy walk or mobility flow"},
+        {"title": "Full Body Conditioning", "warm_up": ["Jumping jacks 2x30s, hip circles"], "main": ["Reverse lunges 3x10 per leg, rest 60s", "Pike push-ups 3x8, rest 60s", "Mountain climbers 3x30s, rest 30s"], "cool_down": ["Child's pose and chest opener, 60s each"]},
+        {"title": "Rest"},
+        {"title": "Full Body Strength", "main": ["Split squats 3x10 per leg, rest 60s", "Incline push-ups 3x12, rest 60s", "Superman holds 3x20s, rest 30s"], "cool_down": ["Full body stretch, 5 min"]},
+    ],
+}, ensure_ascii=False, separators=(",", ":"))
+
+
+def _tokens(text: str) -> list[str]:
+    """Split text into word-ish chunks that roughly resemble LLM tokens."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def make_stub_app(latency: float = 0.2, token_delay: float = 0.0) -> FastAPI:
+    """Build the stub app.
+
+    ``latency`` is the time to first token; ``token_delay`` is added per
+    output token, so long plans take proportionally longer just like the
+    real API. Requests with ``max_tokens >= 1000`` are answered with
+    ``stub.state.plan`` (SAMPLE_PLAN), or ``stub.state.plan_json``
+    (SAMPLE_PLAN_JSON) when the system prompt asks for a StructuredPlan;
+    everything else gets a short acknowledgement. ``stub.state.tokenize``
+    splits replies into the tokens that ``token_delay`` is charged for.
+
+    Faults can be injected at any time by setting ``stub.state`` fields:
+    ``error_rate`` (fraction answered 500), ``rate_limit_rate`` (fraction
+    answered 429 with ``Retry-After: retry_after``) and ``slow_rate``
+    (fraction delayed by an extra ``slow_latency`` seconds).
+    """
+    stub = FastAPI()
+    stub.state.calls = 0
+    stub.state.error_rate = 0.0
+    stub.state.rate_limit_rate = 0.0
+    stub.state.retry_after = 1.0
+    stub.state.slow_rate = 0.0
+    stub.state.slow_latency = 1.0
+    stub.state.plan = SAMPLE_PLAN
+    stub.state.plan_json = SAMPLE_PLAN_JSON
+    stub.state.tokenize = _tokens
+    rng = random.Random(7)
+
+    async def fault() -> Optional[JSONResponse]:
+        """Apply the configured faults to one request; returns the error response to send, if any."""
+        roll = rng.random()
+        if roll < stub.state.error_rate:
+            await asyncio.sleep(latency)
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+        if roll < stub.state.error_rate + stub.state.rate_limit_rate:
+            return JSONResponse(
+                {"error": {"message": "rate limited"}},
+                status_code=429,
+                headers={"Retry-After": str(stub.state.retry_after)},
+            )
+        if rng.random() < stub.state.slow_rate:
+            await asyncio.sleep(stub.state.slow_latency)
+        return None
+
+    @stub.post("/chat/completions")
+    async def chat_completions(request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            # A hedged duplicate the client already cancelled
+            return Response(status_code=499)
+        stub.state.calls += 1
+        error = await fault()
+        if error is not None:
+            return error
+        if body.get("max_tokens", 0) < 1000:
+            content = SHORT_REPLY
+        elif any('"days_per_week"' in message.get("content", "") for message in body.get("messages", []) if message.get("role") == "system"):
+            content = stub.state.plan_json
+        else:
+            content = stub.state.plan
+        tokens = stub.state.tokenize(content)
+
+        if body.get("stream"):
+            async def events() -> AsyncIterator[str]:
+                await asyncio.sleep(latency)
+                for token in tokens:
+                    chunk = {"choices": [{"index": 0, "delta": {"content": token}}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if token_delay:
+                        await asyncio.sleep(token_delay)
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(latency + token_delay * len(tokens))
+        prompt_tokens = sum(len(_tokens(message.get("content", ""))) for message in body.get("messages", []))
+        return {
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens)},
+        }
+
+    @stub.post("/audio/transcriptions")
+    async def audio_transcriptions(request: Request):
+        await request.body()
+        stub.state.calls += 1
+        error = await fault()
+        if error is not None:
+            return error
+        await asyncio.sleep(latency)
+        return {"text": "I'm 30, male, 180 centimeters, 80 kilos, moderately active"}
+
+    return stub
+
+
+@contextlib.contextmanager
+def serve_in_thread(asgi_app, port: int) -> Iterator[None]:
+    """Serve an ASGI app on 127.0.0.1:port from a daemon thread for the duration of the block."""
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Could not start server on 127.0.0.1:{port}")
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+@contextlib.contextmanager
+def run_stub_in_thread(port: int, latency: float = 0.2, token_delay: float = 0.0) -> Iterator[FastAPI]:
+    """Serve the stub on 127.0.0.1:port for the duration of the block."""
+    stub = make_stub_app(latency, token_delay)
+    with serve_in_thread(stub, port):
+        yield stub
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(make_stub_app(args.latency, args.token_delay), host="127.0.0.1", port=args.port, log_level="warning")
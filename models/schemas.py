@@ -3,6 +3,7 @@ from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 # Enums and Allowlists
+# services/state_codec.py stores values as positions in these lists: append new values, never reorder or remove
 GENDER = ["male", "female", "other", "prefer_not_to_say"]
 ACTIVITY = ["sedentary", "lightly_active", "moderately_active", "very_active", "extremely_active"]
 GOALS = ["weight_loss", "muscle_gain", "endurance", "strength", "flexibility", "maintenance"]
@@ -35,6 +36,24 @@ class PrefsConstraints(BaseModel):
     not_preferred_exercises: List[str] = Field(default_factory=list)
     special_considerations: List[str] = Field(default_factory=list)
 
+class PlanDay(BaseModel):
+    title: str
+    # None: the plan's shared warm-up on training days, nothing on rest days
+    warm_up: Optional[List[str]] = None
+    main: List[str] = Field(default_factory=list)
+    cool_down: List[str] = Field(default_factory=list)
+    note: Optional[str] = None
+
+class StructuredPlan(BaseModel):
+    """Weekly plan as returned by the LLM in structured mode; services/structured_plan.py renders it to markdown."""
+    days_per_week: int = Field(ge=1, le=7)
+    split: str
+    warm_up: List[str] = Field(default_factory=list)
+    days: List[PlanDay] = Field(min_length=1, max_length=7)
+    # None: the defaults for the profile are rendered
+    modifications: Optional[List[str]] = None
+    tips: Optional[List[str]] = None
+
 class ConversationState(BaseModel):
     session_id: str
     stage: ChatStage
@@ -42,6 +61,8 @@ class ConversationState(BaseModel):
     goals_block: Optional[GoalBlock] = None
     prefs: Optional[PrefsConstraints] = None
     missing: List[str] = Field(default_factory=list)
+    workout: Optional[str] = None
+    plan: Optional[StructuredPlan] = None
 
 # Removed unused response models - using simplified ChatOut instead
 
@@ -50,6 +71,14 @@ class ChatIn(BaseModel):
     stage: ChatStage
     message: str = ""
     selections: Dict = Field(default_factory=dict)
+    bypass_cache: bool = False
+    # Return ChatOut.state as base64 of the compact binary encoding instead of JSON
+    compact_state: bool = False
+
+class PlanJobIn(ChatIn):
+    callback_url: Optional[str] = None
+    # Clamped to a small range by the job queue
+    priority: int = 0
 
 class ChatOut(BaseModel):
     assistant_text: str
@@ -57,3 +86,4 @@ class ChatOut(BaseModel):
     next_stage: ChatStage
     controls: Dict = Field(default_factory=dict)
     followup: Optional[str] = None
+    transcript: Optional[str] = None
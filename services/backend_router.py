@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+
+    def __init__(self, backend: str, retry_in: float):
+        super().__init__(f"{backend} is unavailable (circuit open, retry in {retry_in:.1f}s)")
+        self.backend = backend
+        self.retry_in = retry_in
+
+
+class LatencyHistogram:
+    """Sliding window of recent successful call latencies, in seconds."""
+
+    def __init__(self, window: int = 512):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def stats(self) -> Dict:
+        return {
+            "samples": len(self._samples),
+            "p50_ms": round(self.percentile(0.5) * 1000, 1),
+            "p95_ms": round(self.percentile(0.95) * 1000, 1),
+            "p99_ms": round(self.percentile(0.99) * 1000, 1),
+        }
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures -> half-open after ``reset_seconds``.
+
+    While open every call fails fast. Half-open lets one probe call through;
+    its outcome closes or re-opens the circuit. A 429 opens the circuit for
+    the upstream's Retry-After instead of counting towards the threshold.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened = 0
+        self._open_until = 0.0
+        self._probing = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == "open" and self.retry_in() == 0:
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """Give up a half-open probe that was cancelled before it could report."""
+        self._probing = False
+
+    def record_failure(self, open_for: Optional[float] = None) -> None:
+        self._probing = False
+        self.consecutive_failures += 1
+        if open_for is not None or self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened += 1
+            self._open_until = time.monotonic() + (open_for if open_for is not None else self.reset_seconds)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds to back off for a 429 response (default 1s), else None."""
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+        try:
+            return float(exc.response.headers.get("Retry-After", "1"))
+        except ValueError:
+            return 1.0
+    return None
+
+
+def _is_client_error(exc: BaseException) -> bool:
+    """4xx other than 429 mean a bad request, not an unhealthy backend."""
+    return (
+        isinstance(exc, httpx.HTTPStatusError)
+        and 400 <= exc.response.status_code < 500
+        and exc.response.status_code != 429
+    )
+
+
+class Backend:
+    """Health and latency bookkeeping for one upstream (a remote API or the local Whisper pool)."""
+
+    def __init__(self, name: str, breaker: CircuitBreaker, window: int = 512):
+        self.name = name
+        self.breaker = breaker
+        self.latency = LatencyHistogram(window)
+        self.latency_by_class: Dict[str, LatencyHistogram] = {}
+        self._window = window
+        self.calls = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.short_circuited = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @property
+    def available(self) -> bool:
+        """Whether a call would be let through right now (does not claim a half-open probe)."""
+        return self.breaker.state == "closed" or self.breaker.retry_in() == 0
+
+    def class_latency(self, latency_class: str) -> LatencyHistogram:
+        """Latency histogram for one class of calls (e.g. short replies vs. long plans) on this backend."""
+        if latency_class not in self.latency_by_class:
+            self.latency_by_class[latency_class] = LatencyHistogram(self._window)
+        return self.latency_by_class[latency_class]
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.breaker.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "short_circuited": self.short_circuited,
+            "circuit_opened": self.breaker.opened,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            **self.latency.stats(),
+            **{f"class_{name}": histogram.stats() for name, histogram in self.latency_by_class.items()},
+        }
+
+
+class BackendRouter:
+    """Runs upstream calls through per-backend circuit breakers, latency histograms and hedging.
+
+    A hedged call starts a second identical attempt once the first has
+    outlived the backend's p95 latency (after ``hedge_min_samples`` samples)
+    and returns whichever finishes first; the loser is cancelled. Calls
+    with a ``latency_class`` are hedged against the p95 of their own class,
+    so long generations are not measured against short replies.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        hedge: bool = True,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 0.05,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.backends: Dict[str, Backend] = {}
+
+    def backend(self, name: str) -> Backend:
+        if name not in self.backends:
+            self.backends[name] = Backend(name, CircuitBreaker(self.failure_threshold, self.reset_seconds))
+        return self.backends[name]
+
+    def hedge_delay(self, name: str, latency_class: Optional[str] = None) -> Optional[float]:
+        backend = self.backend(name)
+        latency = backend.latency if latency_class is None else backend.class_latency(latency_class)
+        if not self.hedge or len(latency) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, latency.percentile(0.95))
+
+    @contextlib.asynccontextmanager
+    async def track(
+        self, name: str, check: bool = True, ignore: Tuple[type, ...] = (), latency_class: Optional[str] = None,
+    ) -> AsyncIterator[Backend]:
+        """Account for one call to backend ``name`` made inside the block.
+
+        With ``check`` the circuit is consulted first and CircuitOpenError
+        raised when it is open. Successes record latency and close the
+        circuit; failures other than 4xx client errors and ``ignore`` types
+        count against it.
+        """
+        backend = self.backend(name)
+        if check and not backend.breaker.allow():
+            backend.short_circuited += 1
+            raise CircuitOpenError(name, backend.breaker.retry_in())
+        start = time.perf_counter()
+        backend.calls += 1
+        try:
+            yield backend
+        except (asyncio.CancelledError, GeneratorExit):
+            backend.breaker.release_probe()
+            raise
+        except Exception as exc:
+            if _is_client_error(exc) or isinstance(exc, ignore):
+                backend.breaker.release_probe()
+            else:
+                backend.failures += 1
+                retry_after = _retry_after(exc)
+                if retry_after is not None:
+                    backend.rate_limited += 1
+                backend.breaker.record_failure(retry_after)
+            raise
+        elapsed = time.perf_counter() - start
+        backend.latency.record(elapsed)
+        if latency_class is not None:
+            backend.class_latency(latency_class).record(elapsed)
+        backend.breaker.record_success()
+
+    async def _attempt(
+        self, name: str, fn: Callable[[], Awaitable[T]], check: bool, ignore: Tuple[type, ...], latency_class: Optional[str],
+    ) -> T:
+        async with self.track(name, check=check, ignore=ignore, latency_class=latency_class):
+            return await fn()
+
+    async def call(
+        self,
+        name: str,
+        fn: Callable[[], Awaitable[T]],
+        hedge: bool = False,
+        ignore: Tuple[type, ...] = (),
+        latency_class: Optional[str] = None,
+    ) -> T:
+        """Call ``fn`` against backend ``name``.
+
+        Raises CircuitOpenError without calling when the circuit is open;
+        otherwise propagates ``fn``'s own exceptions. Exceptions of the
+        ``ignore`` types are not held against the backend.
+        """
+        delay = self.hedge_delay(name, latency_class) if hedge else None
+        if delay is None:
+            return await self._attempt(name, fn, True, ignore, latency_class)
+
+        backend = self.backend(name)
+        tasks = []
+        try:
+            first = asyncio.ensure_future(self._attempt(name, fn, True, ignore, latency_class))
+            tasks.append(first)
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done:
+                return first.result()
+            backend.hedged += 1
+            second = asyncio.ensure_future(self._attempt(name, fn, False, ignore, latency_class))
+            tasks.append(second)
+            pending = {first, second}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            backend.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict:
+        return {name: backend.stats() for name, backend in self.backends.items()}
+
+
+_router: Optional[BackendRouter] = None
+
+
+def get_backend_router() -> BackendRouter:
+    """Return the process-wide router, configured from BREAKER_* and HEDGE_* settings."""
+    global _router
+    if _router is None:
+        _router = BackendRouter(
+            failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+            reset_seconds=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+            hedge=os.getenv("HEDGE_ENABLED", "1").lower() not in ("0", "false", "no"),
+            hedge_min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+            hedge_min_delay=float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.05")),
+        )
+    return _router
@@ -0,0 +1,343 @@
+"""Bulk plan generation for batch onboarding.
+
+Also usable from the command line:
+
+    python -m services.bulk_plans cohort.csv --out plans.ndjson --checkpoint cohort.ckpt
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import fcntl
+import json
+import math
+import os
+import sys
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from models.schemas import Basics, ChatStage, ConversationState, GoalBlock, PrefsConstraints
+from models.user import UserProfile
+from services.orchestrator import LLM_FALLBACK_MESSAGE, WorkoutOrchestrator
+from services.plan_cache import personalize_plan, profile_cache_key
+from services.profiles import create_user_profile
+from services.singleflight import request_key
+
+BASIC_FIELDS = ("name", "age", "gender", "height_cm", "weight_kg", "activity_level")
+LIST_FIELDS = (
+    "goals", "injuries", "equipment", "preferred_workout_types", "preferred_training_times",
+    "not_preferred_exercises", "special_considerations",
+)
+ORDERS = ("input", "completion")
+
+Row = Tuple[int, Dict]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines as it arrives."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+async def parse_rows(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Row]:
+    """Yield ``(index, row)`` for each NDJSON object or CSV record (after the header line).
+
+    In CSV, list columns such as ``goals`` hold ``;``-separated values.
+    Quoted fields spanning several lines are not supported. A line that
+    cannot be parsed yields ``{"_error": ...}`` so it is reported in place.
+    """
+    header: Optional[List[str]] = None
+    index = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row: Dict = {name: value.strip() for name, value in zip(header, values)}
+            for name in LIST_FIELDS:
+                if name in row:
+                    row[name] = [v.strip() for v in row[name].split(";") if v.strip()]
+        else:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                row = {"_error": f"Invalid JSON: {exc}"}
+            if not isinstance(row, dict):
+                row = {"_error": "Each line must be a JSON object"}
+        yield index, row
+        index += 1
+
+
+def row_to_profile(index: int, row: Dict) -> UserProfile:
+    """Validate one input row into a UserProfile, through the same models and mapping as the chat flow.
+
+    Raises ValueError with a readable message when the row is incomplete or invalid.
+    """
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    if not row.get("goals"):
+        raise ValueError("At least one goal is required")
+    try:
+        return create_user_profile(ConversationState(
+            session_id=str(row.get("user_id") or f"row-{index}"),
+            stage=ChatStage.FINAL,
+            basics=Basics(**{f: row.get(f) if row.get(f) != "" else None for f in BASIC_FIELDS}),
+            goals_block=GoalBlock(goals=row["goals"]),
+            prefs=PrefsConstraints(**{f: row.get(f) or [] for f in LIST_FIELDS if f != "goals"}),
+        ))
+    except ValidationError as exc:
+        invalid = sorted({str(error["loc"][-1]) for error in exc.errors()})
+        raise ValueError(f"Missing or invalid fields: {', '.join(invalid)}") from None
+
+
+class CheckpointBusy(RuntimeError):
+    """Raised when another run is already writing to the same checkpoint file."""
+
+
+class Checkpoint:
+    """Append-only NDJSON file of finished rows, so an interrupted run can resume.
+
+    A row is only reused when its input is unchanged (same ``row_hash``).
+    Failed rows are not recorded and are retried on resume. The file is
+    locked while open, so two runs never interleave lines in it; the second
+    gets CheckpointBusy.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.done: Dict[int, Dict] = {}
+        self._file = self.path.open("a+")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._file.close()
+            raise CheckpointBusy(f"checkpoint {self.path.name} is in use by another run") from None
+        self._file.seek(0)
+        for line in self._file.read().splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted write
+            self.done[record["index"]] = record
+
+    def get(self, index: int, row_hash: str) -> Optional[Dict]:
+        record = self.done.get(index)
+        return record if record is not None and record.get("row_hash") == row_hash else None
+
+    def add(self, record: Dict) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class BulkPlanner:
+    """Generates plans for a stream of profile rows with bounded concurrency.
+
+    Rows whose canonical profile matches an earlier row share its plan
+    (personalized per user), so a repeated profile is generated once while
+    it is in flight or among the ``max_plans`` most recently used plans.
+    At most ``concurrency`` plans are generated at a time and at most
+    ``window`` rows are held in memory ahead of the output. Planners that
+    pass the same ``semaphore`` share one concurrency limit. A row whose
+    generation raises is reported as failed; the run carries on.
+    """
+
+    def __init__(
+        self,
+        orchestrator: WorkoutOrchestrator,
+        concurrency: int = 8,
+        window: Optional[int] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        max_plans: int = 1024,
+    ):
+        self.orchestrator = orchestrator
+        self.concurrency = concurrency
+        self.window = window or concurrency * 4
+        self.max_plans = max_plans
+        self._semaphore = semaphore or asyncio.Semaphore(concurrency)
+        # profile key -> generation still running; at most one per row in the window
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # profile key -> (workout, cached), least recently used first
+        self._plans: "OrderedDict[str, Tuple[str, bool]]" = OrderedDict()
+        self.counts = {"rows": 0, "succeeded": 0, "failed": 0, "deduplicated": 0, "resumed": 0, "generated": 0}
+
+    async def _generate(self, user_profile: UserProfile) -> Dict:
+        async with self._semaphore:
+            self.counts["generated"] += 1
+            # Plans do not depend on the name; it is added per row afterwards
+            return await self.orchestrator.generate_workout(user_profile.model_copy(update={"name": "User"}))
+
+    def _generated(self, key: str, task: asyncio.Task) -> None:
+        """Move a finished generation out of the in-flight map, keeping only a successful plan's text."""
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if result["status"] == "success" and result["workout"] != LLM_FALLBACK_MESSAGE:
+            self._plans[key] = (result["workout"], result["cached"])
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+
+    async def _plan(self, key: str, user_profile: UserProfile) -> Tuple[Dict, bool]:
+        """generate_workout's result for this profile and whether it was shared with an earlier row."""
+        if key in self._plans:
+            self._plans.move_to_end(key)
+            workout, cached = self._plans[key]
+            return {"status": "success", "workout": workout, "cached": cached}, True
+        deduplicated = key in self._in_flight
+        if not deduplicated:
+            task = asyncio.ensure_future(self._generate(user_profile))
+            task.add_done_callback(lambda done: self._generated(key, done))
+            self._in_flight[key] = task
+        return await asyncio.shield(self._in_flight[key]), deduplicated
+
+    def _personalize(self, plan: str, user_profile: UserProfile) -> str:
+        plan_cache = self.orchestrator.plan_cache
+        return personalize_plan(plan, user_profile) if plan_cache is not None and plan_cache.personalize else plan
+
+    async def _plan_row(self, index: int, row: Dict, checkpoint: Optional[Checkpoint]) -> Dict:
+        row_hash = request_key(**row)
+        record: Dict = {"type": "result", "index": index, "user_id": str(row.get("user_id") or f"row-{index}")}
+        resumed = checkpoint.get(index, row_hash) if checkpoint is not None else None
+        if resumed is not None:
+            self.counts["resumed"] += 1
+            return {**resumed, "resumed": True}
+        try:
+            user_profile = row_to_profile(index, row)
+        except ValueError as exc:
+            return {**record, "status": "failed", "error": str(exc)}
+
+        key = profile_cache_key(user_profile)
+        try:
+            result, deduplicated = await self._plan(key, user_profile)
+        except Exception as exc:
+            return {**record, "status": "failed", "error": f"Plan generation failed: {exc}"}
+        if deduplicated:
+            self.counts["deduplicated"] += 1
+        if result["status"] != "success" or result["workout"] == LLM_FALLBACK_MESSAGE:
+            # Failures are not kept, so a later duplicate (or a resumed run) tries again
+            return {**record, "status": "failed", "error": result.get("message") or "Upstream model unavailable"}
+
+        record.update(
+            status="succeeded",
+            profile_key=key,
+            deduplicated=deduplicated,
+            cached=result["cached"],
+            workout=self._personalize(result["workout"], user_profile),
+            row_hash=row_hash,
+        )
+        if checkpoint is not None:
+            checkpoint.add(record)
+        return record
+
+    async def run(
+        self, rows: AsyncIterator[Row], order: str = "input", checkpoint: Optional[Checkpoint] = None,
+    ) -> AsyncIterator[Dict]:
+        """Yield one result record per row, in input or completion ``order``, then a summary record."""
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {ORDERS}")
+        queued: Deque[asyncio.Task] = deque()
+        running: Set[asyncio.Task] = set()
+
+        def finished(record: Dict) -> Dict:
+            self.counts["succeeded" if record["status"] == "succeeded" else "failed"] += 1
+            return record
+
+        try:
+            async for index, row in rows:
+                self.counts["rows"] += 1
+                task = asyncio.ensure_future(self._plan_row(index, row, checkpoint))
+                if order == "input":
+                    queued.append(task)
+                    while len(queued) >= self.window or (queued and queued[0].done()):
+                        yield finished(await queued.popleft())
+                else:
+                    running.add(task)
+                    while len(running) >= self.window or any(t.done() for t in running):
+                        done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                        for finished_task in done:
+                            yield finished(finished_task.result())
+            while queued:
+                yield finished(await queued.popleft())
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for finished_task in done:
+                    yield finished(finished_task.result())
+        finally:
+            for task in (*queued, *running, *self._in_flight.values()):
+                task.cancel()
+        yield {"type": "summary", **self.counts}
+
+
+def bulk_slots(orchestrator: WorkoutOrchestrator) -> int:
+    """Plans all bulk uploads together may generate at once: BULK_MAX_SHARE (0.4) of the LLM connection pool."""
+    return max(1, math.floor(float(os.getenv("BULK_MAX_SHARE", "0.4")) * orchestrator.llm.max_connections))
+
+
+def detect_format(name: str, content_type: str = "") -> str:
+    return "csv" if name.lower().endswith(".csv") or "csv" in content_type else "ndjson"
+
+
+async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+    with (sys.stdin.buffer if path == "-" else open(path, "rb")) as handle:
+        while chunk := handle.read(64 * 1024):
+            yield chunk
+
+
+async def _main(args: argparse.Namespace) -> int:
+    from services.llm_client import close_llm_client
+    from services.plan_cache import create_plan_cache
+    from services.plan_engine import create_plan_engine
+
+    orchestrator = WorkoutOrchestrator(plan_cache=create_plan_cache(), plan_engine=create_plan_engine())
+    planner = BulkPlanner(orchestrator, concurrency=args.concurrency)
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    fmt = args.format or detect_format(args.input)
+    out = open(args.out, "w") if args.out else sys.stdout
+    summary: Dict = {}
+    try:
+        async for record in planner.run(parse_rows(iter_lines(_file_chunks(args.input)), fmt), args.order, checkpoint):
+            if record["type"] == "summary":
+                summary = record
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if out is not sys.stdout:
+            out.close()
+        await close_llm_client()
+    print(json.dumps(summary), file=sys.stderr)
+    return 1 if summary.get("failed") else 0
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate workout plans for a CSV or NDJSON file of profiles.")
+    parser.add_argument("input", help="profiles file, or - for stdin")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+    parser.add_argument("--out", help="NDJSON results file (default: stdout)")
+    parser.add_argument("--order", choices=ORDERS, default="input")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BULK_CONCURRENCY", "8")))
+    parser.add_argument("--checkpoint", help="resume from / record progress to this file")
+    args = parser.parse_args(list(argv) if argv is not None else None)
+    raise SystemExit(asyncio.run(_main(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+from models.schemas import EQUIPMENT
+
+# Movement patterns the split templates are built from
+PATTERNS = [
+    "squat", "hinge", "lunge", "push_horizontal", "push_vertical", "pull_horizontal", "pull_vertical",
+    "core", "cardio", "conditioning", "mobility",
+]
+
+# Body regions an injury can be mapped to; exercises list the regions they load
+REGIONS = ["knee", "back", "shoulder", "wrist", "hip", "ankle", "neck", "elbow"]
+
+
+class Exercise(BaseModel):
+    name: str
+    equipment: str  # one of EQUIPMENT; "bodyweight" needs nothing
+    pattern: str
+    muscles: List[str] = Field(default_factory=list)
+    workout_types: List[str] = Field(default_factory=list)
+    contraindications: List[str] = Field(default_factory=list)
+    cue: str = ""
+
+
+def _ex(name, equipment, pattern, muscles, workout_types, contraindications, cue) -> Exercise:
+    return Exercise(
+        name=name, equipment=equipment, pattern=pattern, muscles=muscles,
+        workout_types=workout_types, contraindications=contraindications, cue=cue,
+    )
+
+
+S, C, H, Y, P = "strength_training", "cardio", "HIIT", "yoga", "pilates"
+
+EXERCISES: List[Exercise] = [
+    # Squat
+    _ex("Barbell back squat", "gym_access", "squat", ["quads", "glutes"], [S], ["knee", "back"], "brace and sit between your hips"),
+    _ex("Goblet squat", "dumbbells", "squat", ["quads", "glutes"], [S], ["knee"], "hold the bell at your chest, elbows inside knees"),
+    _ex("Banded squat", "resistance_bands", "squat", ["quads", "glutes"], [S], ["knee"], "push the knees out against the band"),
+    _ex("Bodyweight squat", "bodyweight", "squat", ["quads", "glutes"], [S], ["knee"], "heels down, chest tall"),
+    _ex("Leg press", "gym_access", "squat", ["quads", "glutes"], [S], ["knee"], "keep your lower back flat on the pad"),
+    # Hinge
+    _ex("Romanian deadlift", "gym_access", "hinge", ["hamstrings", "glutes"], [S], ["back"], "push the hips back, bar close to the legs"),
+    _ex("Dumbbell Romanian deadlift", "dumbbells", "hinge", ["hamstrings", "glutes"], [S], ["back"], "soft knees, flat back"),
+    _ex("Banded good morning", "resistance_bands", "hinge", ["hamstrings", "glutes"], [S], ["back"], "hinge until you feel the hamstrings stretch"),
+    _ex("Glute bridge", "bodyweight", "hinge", ["glutes", "hamstrings"], [S, P], [], "squeeze the glutes at the top for a second"),
+    _ex("Single-leg glute bridge", "bodyweight", "hinge", ["glutes", "hamstrings"], [S], [], "keep the hips level"),
+    _ex("Hip thrust", "gym_access", "hinge", ["glutes"], [S], [], "chin tucked, ribs down"),
+    # Lunge
+    _ex("Reverse lunge", "bodyweight", "lunge", ["quads", "glutes"], [S], ["knee"], "step back and drop the back knee straight down"),
+    _ex("Dumbbell split squat", "dumbbells", "lunge", ["quads", "glutes"], [S], ["knee"], "front shin stays close to vertical"),
+    _ex("Step-up", "bodyweight", "lunge", ["quads", "glutes"], [S], ["knee", "ankle"], "drive through the whole front foot"),
+    _ex("Banded lateral walk", "resistance_bands", "lunge", ["glutes"], [S, P], [], "stay low and keep tension on the band"),
+    _ex("Walking lunge", "gym_access", "lunge", ["quads", "glutes"], [S], ["knee"], "long steps, upright torso"),
+    # Horizontal push
+    _ex("Push-up", "bodyweight", "push_horizontal", ["chest", "triceps"], [S], ["wrist", "shoulder"], "body in one straight line"),
+    _ex("Incline push-up", "bodyweight", "push_horizontal", ["chest", "triceps"], [S], ["wrist"], "hands on a bench or counter"),
+    _ex("Dumbbell floor press", "dumbbells", "push_horizontal", ["chest", "triceps"], [S], [], "pause with the elbows on the floor"),
+    _ex("Banded chest press", "resistance_bands", "push_horizontal", ["chest", "triceps"], [S], [], "anchor the band behind you at chest height"),
+    _ex("Bench press", "gym_access", "push_horizontal", ["chest", "triceps"], [S], ["shoulder"], "shoulder blades pinned back"),
+    _ex("Machine chest press", "gym_access", "push_horizontal", ["chest", "triceps"], [S], [], "control the return"),
+    # Vertical push
+    _ex("Dumbbell overhead press", "dumbbells", "push_vertical", ["shoulders", "triceps"], [S], ["shoulder", "back"], "ribs down, press straight up"),
+    _ex("Banded overhead press", "resistance_bands", "push_vertical", ["shoulders", "triceps"], [S], ["shoulder"], "stand on the band, press overhead"),
+    _ex("Pike push-up", "bodyweight", "push_vertical", ["shoulders", "triceps"], [S], ["shoulder", "wrist"], "hips high, head goes between the hands"),
+    _ex("Landmine press", "gym_access", "push_vertical", ["shoulders", "chest"], [S], [], "press up and slightly forward"),
+    _ex("Wall slide", "bodyweight", "push_vertical", ["shoulders", "upper back"], [S, P], [], "keep forearms on the wall"),
+    # Horizontal pull
+    _ex("One-arm dumbbell row", "dumbbells", "pull_horizontal", ["back", "biceps"], [S], [], "pull the elbow toward the hip"),
+    _ex("Banded row", "resistance_bands", "pull_horizontal", ["back", "biceps"], [S], [], "squeeze the shoulder blades together"),
+    _ex("Doorway row", "bodyweight", "pull_horizontal", ["back", "biceps"], [S], ["elbow"], "hold the door frame and lean back"),
+    _ex("Seated cable row", "gym_access", "pull_horizontal", ["back", "biceps"], [S], [], "tall chest, no rocking"),
+    _ex("Prone Y-T raise", "bodyweight", "pull_horizontal", ["upper back"], [S, P], [], "thumbs up, lift from the shoulder blades"),
+    # Vertical pull
+    _ex("Lat pulldown", "gym_access", "pull_vertical", ["lats", "biceps"], [S], ["shoulder"], "pull the bar to the top of the chest"),
+    _ex("Assisted pull-up", "gym_access", "pull_vertical", ["lats", "biceps"], [S], ["shoulder", "elbow"], "start every rep from a dead hang"),
+    _ex("Banded lat pulldown", "resistance_bands", "pull_vertical", ["lats", "biceps"], [S], [], "anchor high, pull elbows to ribs"),
+    _ex("Dumbbell pullover", "dumbbells", "pull_vertical", ["lats", "chest"], [S], ["shoulder"], "slight bend in the elbows throughout"),
+    _ex("Superman pull", "bodyweight", "pull_vertical", ["lats", "upper back"], [S, P], [], "lie face down and pull elbows to ribs"),
+    # Core
+    _ex("Dead bug", "bodyweight", "core", ["core"], [S, P], [], "lower back stays pressed into the floor"),
+    _ex("Forearm plank", "bodyweight", "core", ["core"], [S, P], [], "squeeze glutes and brace"),
+    _ex("Bird dog", "bodyweight", "core", ["core", "lower back"], [S, P, Y], [], "reach long, hips stay square"),
+    _ex("Side plank", "bodyweight", "core", ["obliques"], [S, P], ["shoulder"], "stack the hips"),
+    _ex("Pallof press", "resistance_bands", "core", ["obliques", "core"], [S], [], "resist the band pulling you round"),
+    _ex("Suitcase carry", "dumbbells", "core", ["obliques", "grip"], [S], [], "walk tall without leaning"),
+    _ex("Hanging knee raise", "gym_access", "core", ["core"], [S], ["shoulder"], "no swinging"),
+    # Steady cardio
+    _ex("Brisk walk", "bodyweight", "cardio", ["legs"], [C], [], "pace where you can talk but not sing"),
+    _ex("Easy jog", "bodyweight", "cardio", ["legs"], [C], ["knee", "ankle"], "short, quick strides"),
+    _ex("Stationary bike", "gym_access", "cardio", ["legs"], [C], [], "steady cadence around 80-90 rpm"),
+    _ex("Rowing machine", "gym_access", "cardio", ["back", "legs"], [C], ["back"], "legs, then hips, then arms"),
+    _ex("Marching in place", "bodyweight", "cardio", ["legs"], [C], [], "drive the knees and swing the arms"),
+    # Conditioning
+    _ex("Burpee", "bodyweight", "conditioning", ["full body"], [H], ["knee", "wrist", "shoulder"], "step back instead of jumping to scale"),
+    _ex("Mountain climber", "bodyweight", "conditioning", ["core", "shoulders"], [H], ["wrist"], "hips level with the shoulders"),
+    _ex("Squat jump", "bodyweight", "conditioning", ["quads", "glutes"], [H], ["knee", "ankle"], "land softly"),
+    _ex("Dumbbell thruster", "dumbbells", "conditioning", ["full body"], [H], ["knee", "shoulder"], "drive from the legs into the press"),
+    _ex("Dumbbell swing", "dumbbells", "conditioning", ["glutes", "hamstrings"], [H], ["back"], "snap the hips, arms just guide"),
+    _ex("Skater hop", "bodyweight", "conditioning", ["glutes", "legs"], [H], ["knee", "ankle"], "stick each landing"),
+    _ex("Bike sprint", "gym_access", "conditioning", ["legs"], [H, C], [], "all-out effort, then easy spin"),
+    _ex("High-knee march", "bodyweight", "conditioning", ["legs", "core"], [H], [], "fast arms, tall posture"),
+    _ex("Banded jumping jack", "resistance_bands", "conditioning", ["glutes", "legs"], [H], ["knee", "ankle"], "band above the knees"),
+    # Mobility, yoga and pilates
+    _ex("Cat-cow", "bodyweight", "mobility", ["spine"], [Y, P], [], "move one vertebra at a time"),
+    _ex("World's greatest stretch", "bodyweight", "mobility", ["hips", "thoracic spine"], [Y], [], "rotate toward the front knee"),
+    _ex("Downward dog", "bodyweight", "mobility", ["hamstrings", "shoulders"], [Y], ["wrist", "shoulder"], "press the floor away"),
+    _ex("Child's pose", "bodyweight", "mobility", ["back", "hips"], [Y], ["knee"], "breathe into the lower back"),
+    _ex("Pigeon stretch", "bodyweight", "mobility", ["hips", "glutes"], [Y], ["knee", "hip"], "keep the hips square"),
+    _ex("Half-kneeling hip flexor stretch", "bodyweight", "mobility", ["hip flexors"], [Y], [], "tuck the pelvis under"),
+    _ex("Open book rotation", "bodyweight", "mobility", ["thoracic spine"], [Y, P], [], "follow the moving hand with your eyes"),
+    _ex("Warrior II", "bodyweight", "mobility", ["legs", "hips"], [Y], [], "front knee tracks over the middle toes"),
+    _ex("Supine hamstring stretch", "bodyweight", "mobility", ["hamstrings"], [Y, P], [], "keep the other leg long"),
+    _ex("Banded shoulder pass-through", "resistance_bands", "mobility", ["shoulders"], [Y], ["shoulder"], "wide grip, slow circles"),
+    _ex("Pilates hundred", "bodyweight", "mobility", ["core"], [P], ["neck"], "pump the arms, breathe in five and out five"),
+    _ex("Pilates roll-up", "bodyweight", "mobility", ["core", "spine"], [P], ["back"], "peel up one vertebra at a time"),
+    _ex("Pilates single-leg stretch", "bodyweight", "mobility", ["core"], [P], ["neck"], "keep the lower back down"),
+    _ex("Pilates side-lying leg lift", "bodyweight", "mobility", ["glutes", "hips"], [P], [], "lift from the hip, not the waist"),
+]
+
+
+class ExerciseLibrary:
+    """Exercises indexed by equipment, movement pattern, muscle group, workout type and contraindication."""
+
+    def __init__(self, exercises: Iterable[Exercise] = EXERCISES):
+        self.exercises = list(exercises)
+        self.by_equipment: Dict[str, List[Exercise]] = defaultdict(list)
+        self.by_pattern: Dict[str, List[Exercise]] = defaultdict(list)
+        self.by_muscle: Dict[str, List[Exercise]] = defaultdict(list)
+        self.by_workout_type: Dict[str, List[Exercise]] = defaultdict(list)
+        self.by_contraindication: Dict[str, Set[str]] = defaultdict(set)
+        for exercise in self.exercises:
+            self.by_equipment[exercise.equipment].append(exercise)
+            self.by_pattern[exercise.pattern].append(exercise)
+            for muscle in exercise.muscles:
+                self.by_muscle[muscle].append(exercise)
+            for workout_type in exercise.workout_types:
+                self.by_workout_type[workout_type].append(exercise)
+            for region in exercise.contraindications:
+                self.by_contraindication[region].add(exercise.name)
+
+    def select(
+        self,
+        pattern: Optional[str] = None,
+        equipment: Iterable[str] = ("bodyweight",),
+        avoid_regions: Iterable[str] = (),
+        workout_type: Optional[str] = None,
+    ) -> List[Exercise]:
+        """Exercises matching every given filter, in library order.
+
+        ``equipment`` is what the user has; bodyweight moves are always
+        allowed and gym access covers every kind of equipment.
+        """
+        available = set(equipment) | {"bodyweight"}
+        if "gym_access" in available:
+            available |= set(EQUIPMENT)
+        excluded: Set[str] = set()
+        for region in avoid_regions:
+            excluded |= self.by_contraindication.get(region, set())
+        candidates = self.by_pattern.get(pattern, []) if pattern else self.exercises
+        return [
+            e for e in candidates
+            if e.equipment in available
+            and e.name not in excluded
+            and (workout_type is None or workout_type in e.workout_types)
+        ]
+
+
+_library: Optional[ExerciseLibrary] = None
+
+
+def get_exercise_library() -> ExerciseLibrary:
+    global _library
+    if _library is None:
+        _library = ExerciseLibrary()
+    return _library
@@ -0,0 +1,365 @@
+from __future__ import annotations
+
+import difflib
+import re
+from typing import Dict, List, Optional, Tuple
+
+from models.schemas import EQUIPMENT, GOALS, TIMES, WORKOUT_TYPES
+
+
+# Synonym phrases per allowlist value. Multi-word phrases match as substrings;
+# single words of five letters or more also match misspellings through difflib.
+GENDER_SYNONYMS = {
+    "male": ["male", "man", "guy", "dude", "boy", "gentleman"],
+    "female": ["female", "woman", "girl", "lady", "gal"],
+    "other": ["non binary", "nonbinary", "non-binary", "genderqueer", "genderfluid", "other gender"],
+    "prefer_not_to_say": ["prefer not to say", "rather not say", "rather not share", "prefer not to share"],
+}
+ACTIVITY_SYNONYMS = {
+    "sedentary": ["sedentary", "not active", "not very active", "inactive", "desk job", "sit all day", "couch potato"],
+    "lightly_active": ["lightly active", "light activity", "a little active", "slightly active", "somewhat active", "a bit active"],
+    "moderately_active": ["moderately active", "moderate", "moderately", "fairly active", "reasonably active", "average activity"],
+    "very_active": ["very active", "quite active", "really active", "highly active", "pretty active"],
+    "extremely_active": ["extremely active", "super active", "athlete", "train every day", "incredibly active"],
+}
+GOAL_SYNONYMS = {
+    "weight_loss": ["weight loss", "lose weight", "losing weight", "fat loss", "lose fat", "burn fat", "slim down", "get lean", "drop pounds", "shed pounds", "tone up"],
+    "muscle_gain": ["muscle gain", "gain muscle", "build muscle", "building muscle", "put on muscle", "bulk", "bulking", "get bigger", "hypertrophy"],
+    "endurance": ["endurance", "stamina", "run longer", "marathon", "cardio fitness", "conditioning"],
+    "strength": ["strength", "stronger", "get strong", "lift heavier", "strong"],
+    "flexibility": ["flexibility", "flexible", "mobility", "stretching", "limber"],
+    "maintenance": ["maintenance", "maintain", "stay fit", "stay in shape", "keep fit", "stay healthy", "keep in shape"],
+}
+EQUIPMENT_SYNONYMS = {
+    "bodyweight": ["bodyweight", "body weight", "no equipment", "without equipment", "nothing at home", "calisthenics"],
+    "dumbbells": ["dumbbells", "dumbbell", "dumb bells", "free weights", "kettlebell", "kettlebells"],
+    "resistance_bands": ["resistance bands", "resistance band", "bands", "band", "elastic bands"],
+    "gym_access": ["gym", "gym access", "gym membership", "fitness center", "health club"],
+}
+WORKOUT_TYPE_SYNONYMS = {
+    "cardio": ["cardio", "running", "cycling", "jogging", "swimming", "rowing"],
+    "strength_training": ["strength training", "weight training", "weightlifting", "lifting weights", "lifting", "resistance training"],
+    "yoga": ["yoga"],
+    "pilates": ["pilates"],
+    "HIIT": ["hiit", "high intensity", "interval training", "intervals", "tabata", "circuit training"],
+}
+TIME_SYNONYMS = {
+    "morning": ["morning", "mornings", "early", "before work", "sunrise"],
+    "afternoon": ["afternoon", "afternoons", "lunch", "lunchtime", "midday", "noon"],
+    "evening": ["evening", "evenings", "night", "nights", "after work", "tonight"],
+}
+
+# Free-text FINAL-stage fields the rules do not try to capture. When these
+# cues appear the LLM still gets the transcript.
+FREE_TEXT_CUES = [
+    "injur", "pain", "hurt", "sore", "surgery", "sprain", "arthritis", "pregnan", "condition", "doctor",
+    "avoid", "don't like", "do not like", "dont like", "hate", "can't do", "cannot do", "can't stand", "dislike",
+    "knee", "back", "shoulder", "ankle", "wrist", "hip", "neck", "elbow",
+]
+FREE_TEXT_CUE_RE = re.compile(r"\b(?:" + "|".join(re.escape(cue) for cue in FREE_TEXT_CUES) + ")")
+NO_INJURY_RE = re.compile(r"\b(?:no|without|not any|don't have any|do not have any) (?:injuries|injury|pain)\b")
+
+# A synonym heard within NEGATION_SCOPE words after a negation cue ("I don't have a gym",
+# "no dumbbells") does not count, unless the phrase itself carries the cue ("no equipment").
+# The scope also ends at clause breaks, so "not a gym, just bodyweight" keeps bodyweight.
+NEGATION_CUES = {"no", "not", "don't", "dont", "doesn't", "didn't", "haven't", "hasn't", "never", "without", "nor", "can't", "cannot"}
+SCOPE_BREAKS = {",", ".", ";", "!", "?", "but", "just", "only", "instead", "and", "except", "rather"}
+NEGATION_SCOPE = 4
+
+# Goal phrases tolerate this many filler words between their words ("lose some weight",
+# "build more muscle"). Goal words left over once every matched phrase is taken out
+# mean the rules missed a goal, so the turn goes to the LLM.
+GOAL_PHRASE_GAP = 2
+GOAL_CUES = {
+    "lose", "losing", "weight", "fat", "slim", "lean", "tone", "toned", "toning", "muscle", "muscles",
+    "muscular", "build", "building", "bulk", "gain", "bigger", "strong", "stronger", "strength",
+    "stamina", "endurance", "fit", "fitness", "cardio", "flexible", "flexibility", "mobility", "shape",
+    "healthy", "maintain",
+}
+
+UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+
+def _words_to_digits(text: str) -> str:
+    """Rewrite spelled-out numbers as digits ("one hundred and eighty" -> "180", "thirty-five" -> "35").
+
+    Also splits punctuation and unit suffixes into their own tokens ("80kg" -> "80 kg").
+    """
+    out: List[str] = []
+    current: Optional[int] = None
+    last = ""
+
+    def flush() -> None:
+        nonlocal current, last
+        if current is not None:
+            out.append(str(current))
+        current, last = None, ""
+
+    for token in re.findall(r"[a-z']+|\d+(?:\.\d+)?|\S", text.replace("-", " ")):
+        if token in UNITS:
+            value = UNITS[token]
+            if current is not None and ((last == "tens" and value < 10) or last == "hundred"):
+                current += value
+            else:
+                flush()
+                current = value
+            last = "unit"
+        elif token in TENS:
+            if current is not None and last == "hundred":
+                current += TENS[token]
+            else:
+                flush()
+                current = TENS[token]
+            last = "tens"
+        elif token == "hundred" and current is not None and last == "unit" and current < 10:
+            current *= 100
+            last = "hundred"
+        elif token == "and" and last == "hundred":
+            continue
+        else:
+            flush()
+            out.append(token)
+    flush()
+    return " ".join(out)
+
+
+def _normalize(transcript: str) -> str:
+    text = transcript.lower().replace("’", "'")
+    text = re.sub(r"(\d),(\d)", r"\1\2", text)
+    return _words_to_digits(text)
+
+
+def _mask_negated(text: str) -> str:
+    """Blank out the words in negation scopes, keeping every other character in place."""
+    chars = list(text)
+    remaining = 0
+    for match in re.finditer(r"\S+", text):
+        token = match.group()
+        if token in NEGATION_CUES:
+            remaining = NEGATION_SCOPE
+        elif token in SCOPE_BREAKS:
+            remaining = 0
+        elif remaining:
+            chars[match.start() : match.end()] = "_" * len(token)
+            remaining -= 1
+    return "".join(chars)
+
+
+def _negated_phrase(phrase: str) -> bool:
+    return any(word in NEGATION_CUES for word in phrase.split())
+
+
+def _phrase_re(phrase: str, gap: int = 0) -> str:
+    """Regex for a synonym phrase, allowing up to ``gap`` filler words between its words."""
+    if not gap:
+        return r"\b" + re.escape(phrase) + r"\b"
+    joiner = r"\s+(?:[a-z']+\s+){0,%d}" % gap
+    return r"\b" + joiner.join(re.escape(word) for word in phrase.split()) + r"\b"
+
+
+def _match_synonyms(text: str, synonyms: Dict[str, List[str]], gap: int = 0) -> List[str]:
+    """Return every allowlist value whose synonyms occur in the text outside a negation, in allowlist order."""
+    masked = _mask_negated(text)
+    words = re.findall(r"[a-z]+", masked)
+    found = []
+    for value, phrases in synonyms.items():
+        for phrase in phrases:
+            if _negated_phrase(phrase):
+                hit = phrase in text
+            elif " " in phrase or "-" in phrase:
+                hit = bool(re.search(_phrase_re(phrase, gap), masked)) if gap else phrase in masked
+            elif len(phrase) <= 4:
+                hit = phrase in words
+            else:
+                # Same first letter keeps "inactive" from fuzzy-matching "active"
+                candidates = [w for w in words if w[0] == phrase[0]]
+                hit = phrase in words or bool(difflib.get_close_matches(phrase, candidates, n=1, cutoff=0.85))
+            if hit:
+                found.append(value)
+                break
+    return found
+
+
+def _most_specific(text: str, synonyms: Dict[str, List[str]], gap: int = 0) -> List[str]:
+    """Like _match_synonyms, but drops values whose only match is inside a longer matched phrase.
+
+    "very active" should not also count as "moderately active"'s bare "active" etc.
+    """
+    masked = _mask_negated(text)
+    matches = []
+    for value, phrases in synonyms.items():
+        spans = [(m.start(), m.end()) for p in phrases
+                 for m in re.finditer(_phrase_re(p, gap), text if _negated_phrase(p) else masked)]
+        if spans:
+            matches.append((value, spans))
+    keep = []
+    for value, spans in matches:
+        covered = all(
+            any(o_start <= start and end <= o_end and (o_end - o_start) > (end - start)
+                for other, other_spans in matches if other != value for o_start, o_end in other_spans)
+            for start, end in spans
+        )
+        if not covered:
+            keep.append(value)
+    return keep
+
+
+def _parse_height_cm(text: str) -> Optional[float]:
+    feet = re.search(r"(\d)\s*(?:'|foot|feet|ft)\s*(?:(\d{1,2}(?:\.\d)?)\s*(?:\"|''|inches|inch|in)?)?", text)
+    if feet:
+        inches = float(feet.group(2) or 0)
+        if inches < 12:
+            return round((int(feet.group(1)) * 12 + inches) * 2.54, 1)
+    cm = re.search(r"(\d{3}(?:\.\d+)?)\s*(?:cm|centimeters|centimetres|centimeter|centimetre)\b", text)
+    if cm:
+        return float(cm.group(1))
+    metres = re.search(r"\b([12](?:\.\d{1,2})?)\s*(?:m|meters|metres|meter|metre)\b(?:\s*(\d{1,2}))?", text)
+    if metres:
+        value = float(metres.group(1))
+        if metres.group(2) and "." not in metres.group(1):
+            value += int(metres.group(2)) / 100
+        return round(value * 100, 1)
+    tall = re.search(r"\b(1[4-9]\d|2[0-2]\d)\b(?=[^\d]{0,12}\btall\b)", text)
+    if tall:
+        return float(tall.group(1))
+    return None
+
+
+def _parse_weight_kg(text: str) -> Optional[float]:
+    stone = re.search(r"(\d{1,2})\s*(?:stone|st)\b(?:\s*(?:and\s*)?(\d{1,2})\s*(?:pounds|pound|lbs|lb)?)?", text)
+    if stone:
+        pounds = int(stone.group(1)) * 14 + int(stone.group(2) or 0)
+        return round(pounds * 0.45359237, 1)
+    pounds = re.search(r"(\d{2,3}(?:\.\d+)?)\s*(?:pounds|pound|lbs|lb)\b", text)
+    if pounds:
+        return round(float(pounds.group(1)) * 0.45359237, 1)
+    kilos = re.search(r"(\d{2,3}(?:\.\d+)?)\s*(?:kg|kgs|kilos|kilo|kilograms|kilogram|kilogrammes)\b", text)
+    if kilos:
+        return float(kilos.group(1))
+    weigh = re.search(r"\bweigh(?:s|t|ing)?\b\D{0,12}(\d{2,3}(?:\.\d+)?)", text)
+    if weigh:
+        return float(weigh.group(1))
+    return None
+
+
+def _parse_age(text: str) -> Optional[int]:
+    patterns = [
+        r"(\d{1,2})\s*(?:years?|yrs?)(?:\s*old|\s*of age)?",
+        r"\bage(?:d)?\s*(?:is\s*)?(\d{1,2})\b",
+        r"\b(?:i'm|i am|im)\s*(\d{1,2})\b(?!\s*(?:'|foot|feet|ft|cm|kg|kilos|pounds|lbs|stone|st|m)\b)",
+        r"\b(\d{1,2})\s*(?:year old|yo)\b",
+        r"^(\d{1,2})\s*(?:,|and\b|$)",
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            age = int(match.group(1))
+            if 10 <= age <= 99:
+                return age
+    return None
+
+
+def _extract_basic(text: str) -> Tuple[Dict, float]:
+    genders = _match_synonyms(text, GENDER_SYNONYMS)
+    activities = _most_specific(text, ACTIVITY_SYNONYMS) or _match_synonyms(text, ACTIVITY_SYNONYMS)
+    selections = {
+        "name": None,
+        "age": _parse_age(text),
+        "gender": genders[0] if len(genders) == 1 else None,
+        "height_cm": _parse_height_cm(text),
+        "weight_kg": _parse_weight_kg(text),
+        "activity_level": activities[0] if len(activities) == 1 else None,
+    }
+    name = re.search(r"\b(?:my name is|i'm called|call me)\s+([a-z]+)", text)
+    if name:
+        selections["name"] = name.group(1).capitalize()
+
+    required = ["age", "gender", "height_cm", "weight_kg", "activity_level"]
+    confidence = sum(selections[f] is not None for f in required) / len(required)
+    # Ambiguity (two genders or activity levels heard) lowers confidence even if one was chosen
+    if len(genders) > 1 or len(activities) > 1:
+        confidence *= 0.5
+    height, weight = selections["height_cm"], selections["weight_kg"]
+    if (height is not None and not 120 <= height <= 230) or (weight is not None and not 30 <= weight <= 250):
+        confidence *= 0.5
+    return selections, confidence
+
+
+def _unmatched_cues(text: str, synonyms: Dict[str, List[str]], cues: set, gap: int = 0) -> List[str]:
+    """Cue words outside negations that no synonym phrase accounts for."""
+    rest = _mask_negated(text)
+    for phrases in synonyms.values():
+        for phrase in phrases:
+            rest = re.sub(_phrase_re(phrase, gap), " ", rest)
+    return [word for word in re.findall(r"[a-z]+", rest) if word in cues]
+
+
+def _extract_goals(text: str) -> Tuple[Dict, float]:
+    goals = _most_specific(text, GOAL_SYNONYMS, GOAL_PHRASE_GAP) or _match_synonyms(text, GOAL_SYNONYMS, GOAL_PHRASE_GAP)
+    if not goals:
+        return {"goals": []}, 0.0
+    # A goal word the phrases did not account for ("tone my arms") may be a goal the rules missed
+    confidence = 0.5 if _unmatched_cues(text, GOAL_SYNONYMS, GOAL_CUES, GOAL_PHRASE_GAP) else 1.0
+    return {"goals": [g for g in GOALS if g in goals]}, confidence
+
+
+def _extract_final(text: str) -> Tuple[Dict, float]:
+    equipment = _match_synonyms(text, EQUIPMENT_SYNONYMS)
+    selections = {
+        "injuries": [],
+        "equipment": [e for e in EQUIPMENT if e in equipment],
+        "preferred_workout_types": [w for w in WORKOUT_TYPES if w in _match_synonyms(text, WORKOUT_TYPE_SYNONYMS)],
+        "preferred_training_times": [t for t in TIMES if t in _match_synonyms(text, TIME_SYNONYMS)],
+        "not_preferred_exercises": [],
+        "special_considerations": [],
+    }
+    if FREE_TEXT_CUE_RE.search(NO_INJURY_RE.sub(" ", text)):
+        return selections, 0.3
+    filled = sum(bool(selections[k]) for k in ("equipment", "preferred_workout_types", "preferred_training_times"))
+    return selections, 0.5 + 0.5 * filled / 3 if filled else 0.0
+
+
+def extract_fields_locally(stage: str, transcript: str) -> Tuple[Dict, float]:
+    """Deterministic extraction of stage selections from a short transcript.
+
+    Returns ``(selections, confidence)`` in the same shape the LLM
+    extractor produces. Confidence is in [0, 1]: the share of required
+    fields found, lowered when the transcript is ambiguous or carries
+    free text (injuries, dislikes) that the rules do not capture.
+    """
+    text = _normalize(transcript)
+    stage = stage.lower()
+    if stage == "basic":
+        return _extract_basic(text)
+    if stage == "goals":
+        return _extract_goals(text)
+    if stage == "final":
+        return _extract_final(text)
+    return {}, 0.0
+
+
+class ExtractionStats:
+    """Counts how often the local extractor resolved a turn without the LLM."""
+
+    def __init__(self):
+        self.local = 0
+        self.llm = 0
+
+    def stats(self) -> Dict:
+        total = self.local + self.llm
+        return {
+            "local": self.local,
+            "llm": self.llm,
+            "local_rate": round(self.local / total, 4) if total else 0.0,
+        }
+
+
+extraction_stats = ExtractionStats()
+
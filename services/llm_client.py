@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from core.config import GROQ_API_KEY
+from services.backend_router import BackendRouter, get_backend_router
+from services.singleflight import SingleFlight, request_key
+from services.telemetry import metrics
+
+
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+DEFAULT_MODEL = "llama3-8b-8192"
+
+
+def count_tokens(usage: Optional[Dict]) -> None:
+    """Add an upstream response's token usage to the metrics, when it reports any."""
+    if usage:
+        for kind in ("prompt", "completion"):
+            metrics.count("upstream_tokens_total", usage.get(f"{kind}_tokens", 0),
+                          help="Tokens billed by the upstream LLM", kind=kind)
+
+
+def latency_class(max_tokens: int) -> str:
+    """Bucket chat calls by output budget: acknowledgements, extraction and plan generation take very different times."""
+    if max_tokens <= 200:
+        return "short"
+    if max_tokens <= 600:
+        return "medium"
+    return "long"
+
+
+class LLMClient:
+    """Shared async client for the Groq chat-completions and transcription APIs.
+
+    One instance per worker process keeps a bounded pool of keep-alive
+    connections so concurrent sessions never block the event loop or pay a
+    fresh TLS handshake per call.
+    """
+
+    def __init__(
+        self,
+        base_url: str = GROQ_BASE_URL,
+        api_key: Optional[str] = GROQ_API_KEY,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 30.0,
+        coalesce: bool = True,
+        router: Optional[BackendRouter] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self.singleflight = SingleFlight() if coalesce else None
+        self.router = router
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=self._limits,
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+            )
+        return self._client
+
+    async def chat(
+        self,
+        messages: List[Dict],
+        max_tokens: int = 150,
+        temperature: float = 0.7,
+        model: str = DEFAULT_MODEL,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Send a chat-completions request and return the first choice's content.
+
+        Concurrent calls with the same model, messages and parameters share a
+        single upstream request. With a router the request is guarded by the
+        "groq_chat" circuit breaker and hedged against the p95 of calls with
+        a similar ``max_tokens`` (see latency_class). Raises httpx.HTTPError on
+        transport failures or non-2xx responses and CircuitOpenError while the
+        circuit is open.
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+
+        async def send() -> str:
+            response = await self.client.post(
+                "/chat/completions",
+                json=payload,
+                timeout=timeout if timeout is not None else self.timeout,
+            )
+            response.raise_for_status()
+            body = response.json()
+            count_tokens(body.get("usage"))
+            return body["choices"][0]["message"]["content"]
+
+        async def routed() -> str:
+            if self.router is None:
+                return await send()
+            return await self.router.call("groq_chat", send, hedge=True, latency_class=latency_class(max_tokens))
+
+        if self.singleflight is None:
+            return await routed()
+        return await self.singleflight.do(request_key(**payload), routed)
+
+    def _track(self, backend: str):
+        return self.router.track(backend) if self.router is not None else contextlib.nullcontext()
+
+    def stats(self) -> Dict:
+        return self.singleflight.stats() if self.singleflight else {}
+
+    async def stream_chat(
+        self,
+        messages: List[Dict],
+        max_tokens: int = 150,
+        temperature: float = 0.7,
+        model: str = DEFAULT_MODEL,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion, yielding content deltas as the upstream SSE events arrive."""
+        async with self._track("groq_stream"), self.client.stream(
+            "POST",
+            "/chat/completions",
+            json={
+                "model": model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "stream": True,
+            },
+            timeout=timeout if timeout is not None else self.timeout,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                count_tokens(chunk.get("usage") or chunk.get("x_groq", {}).get("usage"))
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    async def transcribe(
+        self,
+        audio: bytes,
+        filename: str = "audio",
+        model: str = "whisper-large-v3",
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Send audio bytes to the remote transcription API and return the text."""
+        async with self._track("groq_transcribe"):
+            response = await self.client.post(
+                "/audio/transcriptions",
+                files={"file": (filename, audio)},
+                data={"model": model},
+                timeout=timeout if timeout is not None else self.timeout,
+            )
+            response.raise_for_status()
+        return response.json().get("text", "").strip()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_llm_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Return the process-wide LLM client, creating it on first use."""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+            timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+            coalesce=os.getenv("LLM_COALESCE", "1").lower() not in ("0", "false", "no"),
+            router=get_backend_router(),
+        )
+    return _llm_client
+
+
+async def close_llm_client() -> None:
+    """Close the pooled connections; called on application shutdown."""
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.aclose()
+        _llm_client = None
@@ -1,9 +1,16 @@
-from typing import Dict
-import requests
+import asyncio
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
 
 from models.user import UserProfile
-from core.config import GROQ_API_KEY
-from models.schemas import Basics, GoalBlock, PrefsConstraints
+from models.schemas import Basics, GoalBlock, PrefsConstraints, StructuredPlan
+from services.llm_client import LLMClient, get_llm_client
+from services.plan_cache import PlanCache, personalize_plan, profile_cache_key
+from services.plan_engine import PlanEngine
+from services.response_cache import ResponseCache, age_band, basics_fingerprint, goals_fingerprint
+from services.structured_plan import PLAN_SCHEMA_EXAMPLE, parse_structured_plan, plan_from_markdown, render_plan
+from services.telemetry import metrics, span
+
+LLM_FALLBACK_MESSAGE = "I apologize, but I'm having trouble processing your request right now."
 
 class WorkoutOrchestrator:
     """
@@ -13,40 +20,85 @@ class WorkoutOrchestrator:
     3. Generate workout - detailed response
     """
     
-    def __init__(self):
-        self.api_key = GROQ_API_KEY
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
+    def __init__(
+        self,
+        llm: LLMClient | None = None,
+        ack_cache: Optional[ResponseCache] = None,
+        plan_cache: Optional[PlanCache] = None,
+        plan_engine: Optional[PlanEngine] = None,
+        structured_plans: bool = False,
+    ):
+        self._llm = llm
+        self.ack_cache = ack_cache
+        self.plan_cache = plan_cache
+        self.plan_engine = plan_engine
+        self.structured_plans = structured_plans
+        self._refills: Set[asyncio.Task] = set()
+        self._refilling: Set[str] = set()
+
+    @property
+    def llm(self) -> LLMClient:
+        return self._llm or get_llm_client()
 
-    def _call_llm(self, system_prompt: str, user_prompt: str, max_tokens: int = 150) -> str:
+    async def _call_llm(self, system_prompt: str, user_prompt: str, max_tokens: int = 150) -> str:
         """Simple LLM call helper"""
         try:
-            response = requests.post(
-                self.base_url,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "llama3-8b-8192",
-                    "messages": [
+            with span("llm"):
+                return await self.llm.chat(
+                    [
                         {"role": "system", "content": system_prompt},
                         {"role": "user", "content": user_prompt}
                     ],
-                    "max_tokens": max_tokens,
-                    "temperature": 0.7
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()["choices"][0]["message"]["content"]
-            else:
-                return "I apologize, but I'm having trouble processing your request right now."
-                
+                    max_tokens=max_tokens,
+                    temperature=0.7
+                )
         except Exception:
-            return "I apologize, but I'm having trouble processing your request right now."
+            metrics.count("llm_fallbacks_total", help="Stage LLM calls answered with the fallback message")
+            return LLM_FALLBACK_MESSAGE
+
+    async def _cached_ack(self, key: str, system_prompt: str, user_prompt: str, max_tokens: int = 100) -> str:
+        """Serve a short acknowledgement from the profile-bucketed cache when possible.
+
+        A hit on a key that still has fewer than the configured number of
+        variants schedules one more upstream call in the background.
+        """
+        if self.ack_cache is None:
+            return await self._call_llm(system_prompt, user_prompt, max_tokens=max_tokens)
+
+        cached = self.ack_cache.get(key)
+        if cached is not None:
+            if self.ack_cache.wants_more(key) and key not in self._refilling:
+                self._refilling.add(key)
+                task = asyncio.create_task(self._refill_ack(key, system_prompt, user_prompt, max_tokens))
+                self._refills.add(task)
+                task.add_done_callback(self._refills.discard)
+            return cached
+
+        response = await self._call_llm(system_prompt, user_prompt, max_tokens=max_tokens)
+        if response != LLM_FALLBACK_MESSAGE:
+            self.ack_cache.add(key, response)
+        return response
+
+    async def _refill_ack(self, key: str, system_prompt: str, user_prompt: str, max_tokens: int) -> None:
+        try:
+            response = await self._call_llm(system_prompt, user_prompt, max_tokens=max_tokens)
+            if response != LLM_FALLBACK_MESSAGE:
+                self.ack_cache.add(key, response)
+        finally:
+            self._refilling.discard(key)
 
-    def analyze_basic_info(self, basics: Basics) -> Dict:
+    def _basics_summary(self, basics: Basics) -> str:
+        """The user's basics as shown to the acknowledgement prompts.
+
+        With the ack cache on, a reply is shared by everyone in the same
+        basics_fingerprint bucket, so the prompt only gets the bucketed
+        fields and cannot quote one user's exact numbers to another.
+        """
+        if self.ack_cache is not None:
+            return f"Age {age_band(basics.age)}, {basics.gender}, {basics.activity_level} activity level"
+        return f"Age {basics.age}, {basics.gender}, {basics.height_cm}cm, {basics.weight_kg}kg, {basics.activity_level} activity level"
+
+    async def analyze_basic_info(self, basics: Basics) -> Dict:
         """First LLM call - concise response to basic info"""
         try:
             system_prompt = """You are Mylo, a friendly, human-sounding fitness coach.
@@ -55,12 +107,12 @@ class WorkoutOrchestrator:
                 Length: 1–2 sentences total.
                 Avoid: restating every number; medical advice; questions about missing info (the app already has it)."""
             
-            user_prompt = f"""User Info: Age {basics.age}, {basics.gender}, {basics.height_cm}cm, {basics.weight_kg}kg, {basics.activity_level} activity level.
+            user_prompt = f"""User Info: {self._basics_summary(basics)}.
 
                 Write 1–2 friendly sentences that sound like a human coach.
                 Briefly reflect the context (e.g., activity level or life stage) and invite them to share goals next."""
 
-            response = self._call_llm(system_prompt, user_prompt, max_tokens=100)
+            response = await self._cached_ack(basics_fingerprint(basics), system_prompt, user_prompt)
             
             return {
                 "status": "success",
@@ -73,7 +125,7 @@ class WorkoutOrchestrator:
                 "message": "Thanks! I've recorded your basic information."
             }
 
-    def analyze_goals(self, basics: Basics, goals: GoalBlock) -> Dict:
+    async def analyze_goals(self, basics: Basics, goals: GoalBlock) -> Dict:
         """Second LLM call - concise response to goals"""
         try:
             system_prompt = """You are Mylo, a motivating, down-to-earth fitness coach.
@@ -82,7 +134,7 @@ class WorkoutOrchestrator:
                 Length: 2–3 sentences total.
                 Avoid: interrogations or checklists. No clarifying questions are needed."""
             
-            user_prompt = f"""User Profile: {basics.age}yr old {basics.gender}, {basics.height_cm}cm, {basics.weight_kg}kg, {basics.activity_level} activity level.
+            user_prompt = f"""User Profile: {self._basics_summary(basics)}.
                 Goals: {', '.join(goals.goals)}
 
                 Write 2–3 sentences:
@@ -90,7 +142,7 @@ class WorkoutOrchestrator:
                 - Name 1–2 focus ideas (e.g., progressive overload, form quality, consistency). 
                 - Invite them to tell more about their likings and dislikes."""
 
-            response = self._call_llm(system_prompt, user_prompt, max_tokens=100)
+            response = await self._cached_ack(goals_fingerprint(basics, goals), system_prompt, user_prompt)
             
             return {
                 "status": "success",
@@ -103,76 +155,195 @@ class WorkoutOrchestrator:
                 "message": "Great! I've recorded your fitness goals."
             }
 
-    def generate_workout(self, user_profile: UserProfile) -> Dict:
-        """Third LLM call - generate detailed workout plan"""
+    def _workout_prompts(self, user_profile: UserProfile) -> Tuple[str, str]:
+        """Build the (system, user) prompts for weekly plan generation"""
+        system_prompt = """You are Mylo, an expert strength & conditioning coach.
+
+        Goal: Create a **complete, weekly workout plan** for the user based on their profile, goals, preferences, and available equipment.
+
+        Tone & Style:
+        - Sound natural and motivating, like a real coach.
+        - Be clear and structured. Use markdown-style headers for each day and bullets under each.
+        - Include rest days and active recovery days.
+        - Adapt workouts to the user’s injuries, restrictions, and available equipment.
+        - Recommend training split (e.g. upper/lower, push/pull/legs, full-body 3x/week) that best suits their goals and experience level.
+
+        Each training day should include:
+        - **Day Name/Focus** (e.g. “Day 1 – Lower Body Strength”)
+        - **Warm-Up**
+        - **Main Workout**: exercises with sets/reps + rest + brief coaching cues
+        - **Cool-Down**
+        - **Optional Modifications** (if applicable for injuries/equipment)
+
+        Structure (use markdown format):
+        # Weekly Workout Plan
+        ## Overview
+        - Days per week: <#>
+        - Split type: <e.g. 4-day upper/lower>
+        - Equipment: <list>
+
+        ## Day 1 – <Title>
+        - Warm-Up:
+        - ...
+        - Main Workout:
+        - ...
+        - Cool-Down:
+        - ...
+
+        (repeat for each day)
+
+        ## Tips
+        - Mention how the user should progress each week (e.g. increase reps, weight, or RPE)
+        - Encourage consistency and recovery.
+
+        If the user has specific injuries or no equipment, adapt accordingly.
+        Avoid medical advice or hype.
+        """
+        
+        # Build user context
+        goals_text = ", ".join([goal.goal_type for goal in user_profile.goals])
+        equipment_text = ", ".join(user_profile.restrictions.equipment) if user_profile.restrictions.equipment else "bodyweight only"
+        workout_types_text = ", ".join(user_profile.preferences.preferred_workout_types) if user_profile.preferences.preferred_workout_types else "any type"
+        
+        user_prompt = f"""Build a complete weekly workout plan for this user:
+
+        USER PROFILE:
+        - Age: {user_profile.physical_stats.age}
+        - Gender: {user_profile.physical_stats.gender}
+        - Activity Level: {user_profile.activity_level}
+        - Goals: {goals_text}
+        - Available Equipment: {equipment_text}
+        - Preferred Workout Types: {workout_types_text}
+        - Injuries/Restrictions: {', '.join(user_profile.restrictions.injuries) if user_profile.restrictions.injuries else 'none'}
+
+        
+        Create a professional weekly workout split that’s safe, goal-aligned, and realistic for their profile. Make sure it includes rest or recovery days. Keep it structured but motivating — like a coach planning for a client."""
+
+        return system_prompt, user_prompt
+
+    def _structured_prompts(self, user_profile: UserProfile) -> Tuple[str, str]:
+        """Build the (system, user) prompts for a weekly plan returned as StructuredPlan JSON"""
+        system_prompt = f"""You are Mylo, an expert strength & conditioning coach.
+        Create a complete weekly workout plan adapted to the user's goals, injuries and equipment,
+        with rest and active recovery days and a training split that suits their experience level.
+        Return ONLY minified JSON in exactly this shape, with no markdown:
+        {PLAN_SCHEMA_EXAMPLE}
+        - days: all 7 days in order; a rest day is {{"title":"Rest"}}.
+        - warm_up: used on every training day; give a day its own "warm_up" only if it differs.
+        - main and cool_down items: "Exercise SETSxREPS, rest Ns – cue", cues of at most 6 words.
+        - modifications: only for the user's injuries or equipment limits.
+        - tips: leave out; standard progression tips are added for you.
+        Avoid medical advice or hype."""
+        return system_prompt, self._workout_prompts(user_profile)[1]
+
+    def _parse_structured(self, response: str) -> Optional[StructuredPlan]:
+        """The StructuredPlan in an LLM reply, or None when it does not validate"""
         try:
-            system_prompt = """You are Mylo, an expert strength & conditioning coach.
-
-            Goal: Create a **complete, weekly workout plan** for the user based on their profile, goals, preferences, and available equipment.
-
-            Tone & Style:
-            - Sound natural and motivating, like a real coach.
-            - Be clear and structured. Use markdown-style headers for each day and bullets under each.
-            - Include rest days and active recovery days.
-            - Adapt workouts to the user’s injuries, restrictions, and available equipment.
-            - Recommend training split (e.g. upper/lower, push/pull/legs, full-body 3x/week) that best suits their goals and experience level.
-
-            Each training day should include:
-            - **Day Name/Focus** (e.g. “Day 1 – Lower Body Strength”)
-            - **Warm-Up**
-            - **Main Workout**: exercises with sets/reps + rest + brief coaching cues
-            - **Cool-Down**
-            - **Optional Modifications** (if applicable for injuries/equipment)
-
-            Structure (use markdown format):
-            # Weekly Workout Plan
-            ## Overview
-            - Days per week: <#>
-            - Split type: <e.g. 4-day upper/lower>
-            - Equipment: <list>
-
-            ## Day 1 – <Title>
-            - Warm-Up:
-            - ...
-            - Main Workout:
-            - ...
-            - Cool-Down:
-            - ...
-
-            (repeat for each day)
-
-            ## Tips
-            - Mention how the user should progress each week (e.g. increase reps, weight, or RPE)
-            - Encourage consistency and recovery.
-
-            If the user has specific injuries or no equipment, adapt accordingly.
-            Avoid medical advice or hype.
-            """
-            
-            # Build user context
-            goals_text = ", ".join([goal.goal_type for goal in user_profile.goals])
-            equipment_text = ", ".join(user_profile.restrictions.equipment) if user_profile.restrictions.equipment else "bodyweight only"
-            workout_types_text = ", ".join(user_profile.preferences.preferred_workout_types) if user_profile.preferences.preferred_workout_types else "any type"
-            
-            user_prompt = f"""Build a complete weekly workout plan for this user:
+            return parse_structured_plan(response)
+        except ValueError:
+            metrics.count("structured_plan_rejects_total", help="Structured plan replies that failed validation")
+            return None
 
-            USER PROFILE:
-            - Age: {user_profile.physical_stats.age}
-            - Gender: {user_profile.physical_stats.gender}
-            - Activity Level: {user_profile.activity_level}
-            - Goals: {goals_text}
-            - Available Equipment: {equipment_text}
-            - Preferred Workout Types: {workout_types_text}
-            - Injuries/Restrictions: {', '.join(user_profile.restrictions.injuries) if user_profile.restrictions.injuries else 'none'}
+    def structured_plan(self, workout: str, user_profile: UserProfile) -> Optional[StructuredPlan]:
+        """The structured form of a plan in the rendered layout, when structured plans are enabled"""
+        return plan_from_markdown(workout, user_profile) if self.structured_plans else None
 
-            
-            Create a professional weekly workout split that’s safe, goal-aligned, and realistic for their profile. Make sure it includes rest or recovery days. Keep it structured but motivating — like a coach planning for a client."""
+    def cached_workout(self, user_profile: UserProfile) -> Optional[str]:
+        """Return a cached plan for an equivalent canonical profile, if any"""
+        if self.plan_cache is None:
+            return None
+        plan = self.plan_cache.get(profile_cache_key(user_profile))
+        if plan is not None and self.plan_cache.personalize:
+            plan = personalize_plan(plan, user_profile)
+        return plan
+
+    def store_workout(self, user_profile: UserProfile, plan: str) -> None:
+        """Remember a freshly generated plan for equivalent profiles"""
+        if self.plan_cache is not None and plan != LLM_FALLBACK_MESSAGE:
+            self.plan_cache.put(profile_cache_key(user_profile), plan)
+
+    def _polish_prompts(self, draft: str) -> Tuple[str, str]:
+        """Build the (system, user) prompts that reword an engine plan without changing its content"""
+        system_prompt = """You are Mylo, a motivating, down-to-earth strength & conditioning coach.
+        Task: rewrite the workout plan you are given so it reads like a real coach wrote it.
+        Keep every markdown header, day, exercise, set/rep scheme and rest period exactly as given.
+        You may reword the coaching cues, the rest-day lines and the tips. Do not add or remove exercises.
+        Return only the markdown plan."""
+        return system_prompt, draft
+
+    def _engine_draft(self, user_profile: UserProfile) -> Optional[str]:
+        """The rule-based plan when the engine covers this profile, else None"""
+        if self.plan_engine is None or not self.plan_engine.covers(user_profile):
+            return None
+        with span("plan_engine"):
+            return self.plan_engine.build(user_profile)
+
+    async def generate_workout(self, user_profile: UserProfile, use_cache: bool = True) -> Dict:
+        """Third LLM call - generate detailed workout plan
+
+        Profiles the plan engine covers are planned locally, with the LLM
+        only polishing the wording when the engine is in polish mode; the
+        rest go to the LLM. With use_cache=False the plan cache is not
+        consulted, but the fresh plan still replaces the cached one.
+
+        With structured plans enabled the LLM returns a terse StructuredPlan
+        that is rendered to the usual markdown here (falling back to the
+        markdown prompt if the reply does not validate), and the result
+        carries the structured ``plan`` whenever the workout is in the
+        rendered layout.
+        """
+        try:
+            draft = self._engine_draft(user_profile)
+            if draft is not None and not self.plan_engine.polish:
+                if self.plan_cache is not None and self.plan_cache.personalize:
+                    draft = personalize_plan(draft, user_profile)
+                return {
+                    "status": "success",
+                    "workout": draft,
+                    "cached": False,
+                    "engine": True,
+                    "plan": self.structured_plan(draft, user_profile),
+                }
+
+            if use_cache:
+                cached = self.cached_workout(user_profile)
+                if cached is not None:
+                    return {
+                        "status": "success",
+                        "workout": cached,
+                        "cached": True,
+                        "engine": draft is not None,
+                        "plan": self.structured_plan(cached, user_profile),
+                    }
 
-            response = self._call_llm(system_prompt, user_prompt, max_tokens=2000)
+            plan, response = None, None
+            if self.structured_plans and draft is None:
+                system_prompt, user_prompt = self._structured_prompts(user_profile)
+                response = await self._call_llm(system_prompt, user_prompt, max_tokens=1200)
+                if response != LLM_FALLBACK_MESSAGE:
+                    plan = self._parse_structured(response)
+                    # A reply that does not validate is retried once with the markdown prompt
+                    response = render_plan(plan, user_profile) if plan is not None else None
+            if response is None:
+                if draft is not None:
+                    system_prompt, user_prompt = self._polish_prompts(draft)
+                else:
+                    system_prompt, user_prompt = self._workout_prompts(user_profile)
+                response = await self._call_llm(system_prompt, user_prompt, max_tokens=2000)
+                if response == LLM_FALLBACK_MESSAGE and draft is not None:
+                    # Polishing is optional; the engine plan stands on its own
+                    response = draft
+                plan = self.structured_plan(response, user_profile)
+            self.store_workout(user_profile, response)
+            if self.plan_cache is not None and self.plan_cache.personalize:
+                response = personalize_plan(response, user_profile)
             
             return {
                 "status": "success",
-                "workout": response
+                "workout": response,
+                "cached": False,
+                "engine": draft is not None,
+                "plan": plan,
             }
             
         except Exception as e:
@@ -181,4 +352,28 @@ class WorkoutOrchestrator:
                 "message": str(e)
             }
 
+    async def stream_workout(self, user_profile: UserProfile) -> AsyncIterator[str]:
+        """Streaming variant of generate_workout - yields plan text as tokens arrive.
 
+        An engine plan that needs no polishing is yielded in one piece.
+        Streaming always uses the markdown prompt, so text can be shown as
+        it arrives. Upstream failures propagate to the caller, which has already started
+        responding and must report the error in-band.
+        """
+        draft = self._engine_draft(user_profile)
+        if draft is not None and not self.plan_engine.polish:
+            yield draft
+            return
+        if draft is not None:
+            system_prompt, user_prompt = self._polish_prompts(draft)
+        else:
+            system_prompt, user_prompt = self._workout_prompts(user_profile)
+        async for token in self.llm.stream_chat(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=2000,
+            temperature=0.7
+        ):
+            yield token
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from models.user import UserProfile
+from services.response_cache import age_band
+
+
+NO_INJURY_PHRASES = {"", "none", "no", "n/a", "na", "nothing", "no injuries", "no injury", "not really", "nope"}
+INJURY_FILLER_WORDS = {
+    "a", "the", "my", "some", "bad", "sore", "weak", "injury", "injured", "injuries", "pain", "painful",
+    "issue", "issues", "problem", "problems", "hurt", "hurts", "trouble",
+}
+
+
+def normalize_injury(text: str) -> str:
+    """Reduce free-text injury descriptions to a stable phrase ("Bad knee!" and "knee pain" -> "knee")."""
+    text = re.sub(r"[^a-z0-9 ]+", " ", text.lower())
+    text = " ".join(text.split())
+    if text in NO_INJURY_PHRASES:
+        return ""
+    words = [w for w in text.split() if w not in INJURY_FILLER_WORDS]
+    return " ".join(words) or text
+
+
+def _normalized_list(values: List[str]) -> List[str]:
+    return sorted({v.strip().lower() for v in values if v and v.strip()})
+
+
+def canonicalize_profile(user_profile: UserProfile) -> Dict:
+    """Reduce a UserProfile to the inputs the plan prompt actually depends on.
+
+    Lists are de-duplicated and sorted, age is bucketed, and injuries are
+    normalized so trivially different phrasings share a cache entry. Height,
+    weight, name and training times are not part of the prompt and are left out.
+    """
+    injuries = sorted({n for n in (normalize_injury(i) for i in user_profile.restrictions.injuries) if n})
+    return {
+        "age_band": age_band(user_profile.physical_stats.age),
+        "gender": (user_profile.physical_stats.gender or "").lower(),
+        "activity_level": (user_profile.activity_level or "").lower(),
+        "goals": _normalized_list([g.goal_type for g in user_profile.goals]),
+        "equipment": _normalized_list(user_profile.restrictions.equipment) or ["bodyweight"],
+        "workout_types": _normalized_list(user_profile.preferences.preferred_workout_types),
+        "injuries": injuries,
+    }
+
+
+def profile_cache_key(user_profile: UserProfile) -> str:
+    canonical = json.dumps(canonicalize_profile(user_profile), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+PLAN_TITLE = "# Weekly Workout Plan"
+
+
+def personalize_plan(plan: str, user_profile: UserProfile) -> str:
+    """Cheap templated touch-up of a cached plan: put the user's name in the title."""
+    if not user_profile.name or user_profile.name == "User" or PLAN_TITLE not in plan:
+        return plan
+    return plan.replace(PLAN_TITLE, f"{PLAN_TITLE} for {user_profile.name}", 1)
+
+
+class PlanCache:
+    """Persistent plan cache: zlib-compressed plans in a SQLite file indexed by profile key.
+
+    Entries are evicted least-recently-used first once the compressed total
+    exceeds ``max_bytes``. Plans are stored un-personalized; ``personalize``
+    tells the caller whether to apply personalize_plan on the way out.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, personalize: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.personalize = personalize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "key TEXT PRIMARY KEY, plan BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS plans_last_access ON plans (last_access)")
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM plans").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT plan FROM plans WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE plans SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return zlib.decompress(row[0]).decode()
+
+    def put(self, key: str, plan: str) -> None:
+        blob = zlib.compress(plan.encode(), 9)
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM plans WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans (key, plan, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()),
+            )
+            self._bytes += len(blob) - (previous[0] if previous else 0)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes:
+            row = self._conn.execute("SELECT key, size FROM plans ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM plans WHERE key = ?", (row[0],))
+            self._bytes -= row[1]
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def create_plan_cache() -> Optional[PlanCache]:
+    """Build the plan cache from PLAN_CACHE_* settings, or None when disabled."""
+    if os.getenv("PLAN_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    return PlanCache(
+        os.getenv("PLAN_CACHE_PATH", "plan_cache.db"),
+        max_bytes=int(os.getenv("PLAN_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+        personalize=os.getenv("PLAN_CACHE_PERSONALIZE", "1").lower() not in ("0", "false", "no"),
+    )
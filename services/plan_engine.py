@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional
+
+from models.schemas import ACTIVITY, EQUIPMENT, GOALS, WORKOUT_TYPES
+from models.user import UserProfile
+from services.exercise_library import Exercise, ExerciseLibrary, get_exercise_library
+from services.plan_cache import PLAN_TITLE, normalize_injury
+
+# Words that may accompany a body region in an injury without changing what to avoid
+INJURY_QUALIFIERS = {"left", "right", "both", "lower", "upper", "mild", "minor", "old", "slight", "tight", "stiff"}
+REGION_ALIASES = {
+    "knee": "knee", "knees": "knee", "back": "back", "spine": "back", "shoulder": "shoulder", "shoulders": "shoulder",
+    "wrist": "wrist", "wrists": "wrist", "hip": "hip", "hips": "hip", "ankle": "ankle", "ankles": "ankle",
+    "neck": "neck", "elbow": "elbow", "elbows": "elbow",
+}
+
+DAYS_PER_WEEK = {
+    "sedentary": 3, "lightly_active": 3, "moderately_active": 4, "very_active": 5, "extremely_active": 5,
+}
+# T = training day, A = active recovery, R = rest
+WEEK_LAYOUTS = {3: "TRTRTAR", 4: "TTRTTAR", 5: "TTATTTR"}
+SPLITS = {
+    3: ("3-day full body", [
+        ("Full Body A", ["squat", "push_horizontal", "pull_horizontal", "hinge", "core"]),
+        ("Full Body B", ["hinge", "push_vertical", "pull_vertical", "lunge", "core"]),
+        ("Full Body C", ["lunge", "push_horizontal", "pull_horizontal", "squat", "core"]),
+    ]),
+    4: ("4-day upper/lower", [
+        ("Lower Body", ["squat", "hinge", "lunge", "core"]),
+        ("Upper Body", ["push_horizontal", "pull_horizontal", "push_vertical", "pull_vertical", "core"]),
+        ("Lower Body", ["hinge", "lunge", "squat", "core"]),
+        ("Upper Body", ["push_vertical", "pull_vertical", "push_horizontal", "pull_horizontal", "core"]),
+    ]),
+    5: ("5-day upper/lower plus conditioning", [
+        ("Lower Body", ["squat", "hinge", "lunge", "core"]),
+        ("Upper Body", ["push_horizontal", "pull_horizontal", "push_vertical", "pull_vertical", "core"]),
+        ("Conditioning", ["conditioning", "conditioning", "conditioning", "core"]),
+        ("Lower Body", ["hinge", "lunge", "squat", "core"]),
+        ("Upper Body", ["push_vertical", "pull_vertical", "push_horizontal", "pull_horizontal", "core"]),
+    ]),
+}
+# Patterns to fall back to when injuries or equipment rule out every option
+SUBSTITUTE_PATTERNS = {
+    "squat": ["hinge"], "lunge": ["hinge"], "push_vertical": ["push_horizontal", "pull_horizontal"],
+    "push_horizontal": ["pull_horizontal"], "pull_vertical": ["pull_horizontal"], "conditioning": ["cardio"],
+    "hinge": ["core"], "cardio": ["conditioning"],
+}
+
+# The first goal in this order sets the loading scheme
+GOAL_PRIORITY = ["strength", "muscle_gain", "weight_loss", "endurance", "flexibility", "maintenance"]
+# goal -> (main lift scheme, accessory scheme, finisher pattern or None, finisher prescription)
+SCHEMES = {
+    "strength": ("5x5, rest 2-3 min", "3x8, rest 90s", None, ""),
+    "muscle_gain": ("4x8-12, rest 90s", "3x12-15, rest 60s", None, ""),
+    "weight_loss": ("3x12-15, rest 45s", "3x15, rest 30s", "conditioning", "40s on / 20s off x 3 rounds"),
+    "endurance": ("3x15-20, rest 30s", "3x20, rest 30s", "cardio", "20 min steady"),
+    "flexibility": ("3x10-12, rest 60s", "2x12, rest 45s", "mobility", "60s per side"),
+    "maintenance": ("3x10, rest 60s", "3x12, rest 45s", None, ""),
+}
+PROGRESSION_TIPS = {
+    "strength": "Add 2.5-5% load to the main lifts once every set hits 5 clean reps.",
+    "muscle_gain": "Add a rep per set each week; when you reach the top of the range, increase the weight.",
+    "weight_loss": "Shorten rests by 5s or add a finisher round every week, keeping form crisp.",
+    "endurance": "Add 2-3 minutes to the steady cardio or 2 reps per set each week.",
+    "flexibility": "Hold each stretch 10s longer every week and breathe slowly into end range.",
+    "maintenance": "Add a rep or a little load when a session starts to feel easy.",
+}
+SESSION_TYPE_TITLES = {"cardio": "Cardio", "HIIT": "HIIT Circuit", "yoga": "Yoga Flow", "pilates": "Pilates"}
+REGION_NOTES = {
+    "knee": "Knee: squats, lunges and jumps are swapped for hip-dominant work; keep every bend pain-free.",
+    "back": "Back: loaded hinges and overhead pressing are removed; brace before every rep.",
+    "shoulder": "Shoulder: overhead and deep pressing are removed; stay in a pain-free range.",
+    "wrist": "Wrist: floor-supported push-ups are removed; use handles or fists if needed.",
+    "hip": "Hip: deep hip stretches are removed; keep hip bending within comfort.",
+    "ankle": "Ankle: jumping and running are removed; choose low-impact cardio.",
+    "neck": "Neck: head-lifting core work is removed; rest your head on the floor.",
+    "elbow": "Elbow: hanging and door-frame pulls are removed; use bands or light dumbbells.",
+}
+
+
+def injury_regions(injuries: List[str]) -> Optional[List[str]]:
+    """Map injuries to body regions, or None if any injury is free text the engine cannot interpret."""
+    regions = []
+    for injury in injuries:
+        words = [w for w in normalize_injury(injury).split() if w not in INJURY_QUALIFIERS]
+        if not words:
+            continue
+        if len(words) != 1 or words[0] not in REGION_ALIASES:
+            return None
+        regions.append(REGION_ALIASES[words[0]])
+    return sorted(set(regions))
+
+
+REST_DAY_NOTE = "Full rest: sleep well, walk if you feel like it."
+CLOSING_TIPS = [
+    "Keep at least one full rest day between your hardest sessions and aim for 7-9 hours of sleep.",
+    "Consistency beats intensity: a good week is every planned session done with solid form.",
+]
+
+
+def plan_equipment(user_profile: UserProfile) -> List[str]:
+    """Equipment a plan is written for: the profile's, or bodyweight when it lists none."""
+    return sorted(set(user_profile.restrictions.equipment) or {"bodyweight"})
+
+
+def primary_goal(user_profile: UserProfile) -> str:
+    """The goal that sets the loading scheme and progression tip."""
+    goals = {g.goal_type for g in user_profile.goals}
+    return next((g for g in GOAL_PRIORITY if g in goals), "maintenance")
+
+
+def default_modifications(user_profile: UserProfile) -> List[str]:
+    """The "Optional Modifications" lines the engine writes for this profile's injuries and equipment."""
+    modifications = [REGION_NOTES[r] for r in injury_regions(user_profile.restrictions.injuries) or []]
+    if plan_equipment(user_profile) == ["bodyweight"]:
+        modifications.append("No equipment: slow the lowering phase to 3s to make bodyweight moves harder.")
+    return modifications
+
+
+def default_tips(user_profile: UserProfile) -> List[str]:
+    """The "Tips" lines the engine writes for this profile's goal."""
+    return [PROGRESSION_TIPS[primary_goal(user_profile)], *CLOSING_TIPS]
+
+
+class PlanEngine:
+    """Builds weekly plans from the exercise library and split templates, without an LLM.
+
+    The output follows the markdown structure the generate_workout prompt
+    asks for, and the same profile always yields the same plan. ``covers``
+    reports whether a profile stays inside the enums and the known injury
+    regions; anything else goes to the LLM. ``polish`` tells the caller to
+    have the LLM rewrite the wording of engine plans.
+    """
+
+    def __init__(self, library: Optional[ExerciseLibrary] = None, polish: bool = False):
+        self.library = library or get_exercise_library()
+        self.polish = polish
+        self.routed = 0
+        self.declined = 0
+
+    def covers(self, user_profile: UserProfile) -> bool:
+        """Whether the engine can plan for this profile; counted for the stats endpoint."""
+        restrictions = user_profile.restrictions
+        covered = (
+            user_profile.activity_level in ACTIVITY
+            and bool(user_profile.goals)
+            and all(g.goal_type in GOALS for g in user_profile.goals)
+            and all(e in EQUIPMENT for e in restrictions.equipment)
+            and all(w in WORKOUT_TYPES for w in user_profile.preferences.preferred_workout_types)
+            and not restrictions.not_preferred_exercises
+            and not restrictions.special_considerations
+            and injury_regions(restrictions.injuries) is not None
+        )
+        if covered:
+            self.routed += 1
+        else:
+            self.declined += 1
+        return covered
+
+    def stats(self) -> Dict:
+        total = self.routed + self.declined
+        return {
+            "polish": self.polish,
+            "routed": self.routed,
+            "declined": self.declined,
+            "coverage": round(self.routed / total, 4) if total else 0.0,
+        }
+
+    def _pick(self, pattern: str, equipment: List[str], regions: List[str], used: set, rotation: int) -> Optional[Exercise]:
+        for candidate_pattern in [pattern] + SUBSTITUTE_PATTERNS.get(pattern, []):
+            options = [e for e in self.library.select(candidate_pattern, equipment, regions) if e.name not in used]
+            if options:
+                # Prefer exercises that use the equipment the user actually has
+                pool = [e for e in options if e.equipment != "bodyweight"] or options
+                return pool[rotation % len(pool)]
+        return None
+
+    def _line(self, exercise: Exercise, prescription: str) -> str:
+        return f"- {exercise.name} {prescription} – {exercise.cue}"
+
+    def _training_day(
+        self, title: str, patterns: List[str], equipment: List[str], regions: List[str], goal: str, rotation: int,
+    ) -> List[str]:
+        main_scheme, accessory_scheme, finisher, finisher_dose = SCHEMES[goal]
+        used: set = set()
+        lines = ["- Main Workout:"]
+        for index, pattern in enumerate(patterns):
+            exercise = self._pick(pattern, equipment, regions, used, rotation)
+            if exercise is None:
+                continue
+            used.add(exercise.name)
+            scheme = "3x40s work, 20s rest" if exercise.pattern == "conditioning" else (
+                main_scheme if index < 2 else accessory_scheme
+            )
+            lines.append(self._line(exercise, scheme))
+        if finisher and title != "Conditioning":
+            exercise = self._pick(finisher, equipment, regions, used, rotation)
+            if exercise is not None:
+                lines.append(f"- Finisher: {exercise.name} {finisher_dose} – {exercise.cue}")
+        return lines
+
+    def _session_day(self, workout_type: str, equipment: List[str], regions: List[str], rotation: int) -> List[str]:
+        """A non-lifting session for users whose preferred types leave out strength training."""
+        lines = ["- Main Workout:"]
+        if workout_type == "cardio":
+            exercise = self._pick("cardio", equipment, regions, set(), rotation)
+            lines.append(self._line(exercise, "30 min steady, conversational pace"))
+        elif workout_type == "HIIT":
+            used: set = set()
+            for _ in range(4):
+                exercise = self._pick("conditioning", equipment, regions, used, rotation)
+                if exercise is None:
+                    break
+                used.add(exercise.name)
+                lines.append(self._line(exercise, "40s on / 20s off x 4 rounds"))
+        else:
+            options = self.library.select("mobility", equipment, regions, workout_type=workout_type)
+            options += [e for e in self.library.select("core", equipment, regions, workout_type=workout_type)]
+            for exercise in options[rotation % 2::2][:5] or options[:5]:
+                lines.append(self._line(exercise, "5 slow reps or 45s hold"))
+        return lines
+
+    def _warm_up(self, equipment: List[str], regions: List[str]) -> List[str]:
+        cardio = self._pick("cardio", equipment, regions, set(), 0)
+        mobility = self.library.select("mobility", equipment, regions)[:2]
+        return ["- Warm-Up:", f"- {cardio.name} 5 min, easy pace"] + [f"- {m.name} x8 – {m.cue}" for m in mobility]
+
+    def _cool_down(self, equipment: List[str], regions: List[str], rotation: int) -> List[str]:
+        stretches = self.library.select("mobility", equipment, regions, workout_type="yoga")
+        picked = [stretches[(rotation + i) % len(stretches)] for i in range(min(3, len(stretches)))]
+        return ["- Cool-Down:"] + [f"- {s.name} 45s – {s.cue}" for s in picked]
+
+    def build(self, user_profile: UserProfile) -> str:
+        """Render the weekly plan for a profile that ``covers`` accepts."""
+        equipment = plan_equipment(user_profile)
+        regions = injury_regions(user_profile.restrictions.injuries) or []
+        goal = primary_goal(user_profile)
+        days = DAYS_PER_WEEK[user_profile.activity_level]
+        split_name, templates = SPLITS[days]
+        types = user_profile.preferences.preferred_workout_types
+        session_types = [t for t in WORKOUT_TYPES if t in types and t != "strength_training"]
+        lifting = not types or "strength_training" in types
+        if not lifting:
+            split_name = f"{days}-day " + " / ".join(SESSION_TYPE_TITLES[t].lower() for t in session_types)
+
+        lines = [
+            PLAN_TITLE,
+            "## Overview",
+            f"- Days per week: {days}",
+            f"- Split type: {split_name}",
+            f"- Equipment: {', '.join(e.replace('_', ' ') for e in equipment)}",
+        ]
+        training_index = 0
+        for day_number, kind in enumerate(WEEK_LAYOUTS[days], start=1):
+            lines.append("")
+            if kind == "R":
+                lines += [f"## Day {day_number} – Rest", f"- {REST_DAY_NOTE}"]
+                continue
+            if kind == "A":
+                recovery_type = next((t for t in ("yoga", "pilates") if t in session_types), "yoga")
+                lines.append(f"## Day {day_number} – Active Recovery ({SESSION_TYPE_TITLES[recovery_type]})")
+                lines += ["- Warm-Up:", "- 3 min easy breathing and gentle joint circles"]
+                lines += self._session_day(recovery_type, equipment, regions, day_number)
+                lines += self._cool_down(equipment, regions, day_number)
+                continue
+
+            if lifting:
+                title, patterns = templates[training_index % len(templates)]
+                if title != "Conditioning" and session_types and training_index == len(templates) - 1:
+                    # Let the last lifting day lean into a preferred session type
+                    title = f"{title} + {SESSION_TYPE_TITLES[session_types[0]]}"
+                lines.append(f"## Day {day_number} – {title}")
+                lines += self._warm_up(equipment, regions)
+                lines += self._training_day(title, patterns, equipment, regions, goal, training_index)
+                if " + " in title:
+                    lines += self._session_day(session_types[0], equipment, regions, training_index)[1:]
+            else:
+                session = session_types[training_index % len(session_types)]
+                lines.append(f"## Day {day_number} – {SESSION_TYPE_TITLES[session]}")
+                lines += self._warm_up(equipment, regions)
+                lines += self._session_day(session, equipment, regions, training_index)
+            lines += self._cool_down(equipment, regions, training_index)
+            training_index += 1
+
+        modifications = default_modifications(user_profile)
+        if modifications:
+            lines += ["", "## Optional Modifications"] + [f"- {m}" for m in modifications]
+        lines += ["", "## Tips"] + [f"- {tip}" for tip in default_tips(user_profile)]
+        return "\n".join(lines) + "\n"
+
+
+def create_plan_engine() -> Optional[PlanEngine]:
+    """Build the plan engine from PLAN_ENGINE ("route", "polish" or "off"), or None when off."""
+    mode = os.getenv("PLAN_ENGINE", "route").lower()
+    if mode in ("off", "0", "false", "no"):
+        return None
+    if mode not in ("route", "polish"):
+        raise ValueError(f"Unknown PLAN_ENGINE mode: {mode}")
+    return PlanEngine(polish=mode == "polish")
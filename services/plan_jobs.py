@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+from models.user import UserProfile
+from services.orchestrator import LLM_FALLBACK_MESSAGE, WorkoutOrchestrator
+from services.plan_cache import profile_cache_key
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+# Client-supplied priorities are clamped to [-MAX_PRIORITY, MAX_PRIORITY]
+MAX_PRIORITY = 5
+
+OnSuccess = Callable[[Dict], Optional[Awaitable[None]]]
+
+
+async def check_callback_url(url: str, allowed_hosts: Iterable[str], allow_private: bool = False) -> None:
+    """Raise ValueError unless ``url`` may receive job callbacks.
+
+    The URL must be http(s) on one of ``allowed_hosts`` (an entry starting
+    with "." also allows its subdomains), and unless ``allow_private`` the
+    host must resolve only to public addresses: no loopback, private,
+    link-local (cloud metadata) or reserved ranges.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+    host = parts.hostname.lower()
+    if not any(host == allowed or (allowed.startswith(".") and host.endswith(allowed)) for allowed in allowed_hosts):
+        raise ValueError(f"callback host {host} is not allowed")
+    if allow_private:
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, ValueError) as exc:
+        raise ValueError(f"callback host {host} does not resolve") from exc
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if getattr(address, "ipv4_mapped", None) is not None:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            raise ValueError(f"callback host {host} resolves to a non-public address")
+
+
+class PlanJobQueue:
+    """Durable background queue for workout-plan generation.
+
+    Jobs live in a WAL-mode SQLite file, so queued work and finished results
+    survive a restart. ``workers`` asyncio tasks claim jobs highest priority
+    first. A claim is a lease, and a job whose lease runs out (its worker
+    died) is picked up again. Failed attempts are retried with linear
+    backoff up to ``max_attempts``. A resubmission for the same session and
+    canonical profile returns the existing job instead of queueing another.
+    Callbacks only go to ``callback_hosts`` (see check_callback_url).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        orchestrator: WorkoutOrchestrator,
+        workers: int = 4,
+        max_attempts: int = 3,
+        retry_seconds: float = 2.0,
+        lease_seconds: float = 120.0,
+        ttl_seconds: float = 24 * 3600,
+        on_success: Optional[OnSuccess] = None,
+        callback_hosts: Iterable[str] = (),
+        callback_allow_private: bool = False,
+    ):
+        self.path = path
+        self.orchestrator = orchestrator
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.lease_seconds = lease_seconds
+        self.ttl_seconds = ttl_seconds
+        self.on_success = on_success
+        self.callback_hosts = {host.strip().lower() for host in callback_hosts if host.strip()}
+        self.callback_allow_private = callback_allow_private
+        self.submitted = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.callbacks_sent = 0
+        self.callbacks_failed = 0
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+        self._http: Optional[httpx.AsyncClient] = None
+        self._submits_since_sweep = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_jobs ("
+            "job_id TEXT PRIMARY KEY, session_id TEXT NOT NULL, profile_key TEXT NOT NULL, "
+            "profile TEXT NOT NULL, use_cache INTEGER NOT NULL, priority INTEGER NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, callback_url TEXT, "
+            "workout TEXT, cached INTEGER, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, run_after REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS plan_jobs_session ON plan_jobs (session_id, profile_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS plan_jobs_ready ON plan_jobs (status, priority, created_at)")
+
+    def submit(
+        self,
+        session_id: str,
+        user_profile: UserProfile,
+        priority: int = 0,
+        callback_url: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Dict:
+        """Queue a plan for ``user_profile`` and return the job record.
+
+        ``priority`` is clamped to [-MAX_PRIORITY, MAX_PRIORITY]. A queued, running or (unless ``use_cache`` is off) succeeded job for
+        the same session and canonical profile is returned as is, with
+        ``deduplicated`` set.
+        """
+        key = profile_cache_key(user_profile)
+        priority = max(-MAX_PRIORITY, min(MAX_PRIORITY, priority))
+        statuses = ("queued", "running", "succeeded") if use_cache else ("queued", "running")
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT * FROM plan_jobs WHERE session_id = ? AND profile_key = ? "
+                f"AND status IN ({','.join('?' * len(statuses))}) ORDER BY created_at DESC LIMIT 1",
+                (session_id, key, *statuses),
+            ).fetchone()
+            if row is not None:
+                self.deduplicated += 1
+                return {**self._record(row), "deduplicated": True}
+
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO plan_jobs (job_id, session_id, profile_key, profile, use_cache, priority, status, "
+                "callback_url, created_at, updated_at, run_after) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, session_id, key, user_profile.model_dump_json(), int(use_cache), priority,
+                 callback_url, now, now, now),
+            )
+            self.submitted += 1
+            self._submits_since_sweep += 1
+            if self._submits_since_sweep >= 100:
+                self._submits_since_sweep = 0
+                self._sweep()
+            row = self._conn.execute("SELECT * FROM plan_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        self._wakeup.set()
+        return {**self._record(row), "deduplicated": False}
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM plan_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._record(row) if row is not None else None
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict:
+        record = {
+            "job_id": row["job_id"],
+            "session_id": row["session_id"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+        if row["status"] == "succeeded":
+            record["workout"] = row["workout"]
+            record["cached"] = bool(row["cached"])
+        if row["status"] == "failed":
+            record["error"] = row["error"]
+        return record
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM plan_jobs WHERE status = 'queued'").fetchone()[0]
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Lease the next runnable job: queued and due, or running with an expired lease."""
+        now = time.time()
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    "SELECT job_id, updated_at FROM plan_jobs "
+                    "WHERE status IN ('queued', 'running') AND run_after <= ? "
+                    "ORDER BY priority DESC, created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+                # Compare-and-set on updated_at so another process sharing the file cannot claim it too
+                claimed = self._conn.execute(
+                    "UPDATE plan_jobs SET status = 'running', attempts = attempts + 1, updated_at = ?, run_after = ? "
+                    "WHERE job_id = ? AND updated_at = ?",
+                    (now, now + self.lease_seconds, row["job_id"], row["updated_at"]),
+                ).rowcount
+                if claimed:
+                    return self._conn.execute("SELECT * FROM plan_jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+
+    def _next_due_in(self) -> float:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(run_after) FROM plan_jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()
+        if row[0] is None:
+            return self.lease_seconds
+        return max(0.0, row[0] - time.time())
+
+    def _finish(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE plan_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def _sweep(self) -> None:
+        self._conn.execute(
+            "DELETE FROM plan_jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+            (time.time() - self.ttl_seconds,),
+        )
+
+    async def _run(self, job: sqlite3.Row) -> None:
+        user_profile = UserProfile.model_validate_json(job["profile"])
+        result = await self.orchestrator.generate_workout(user_profile, use_cache=bool(job["use_cache"]))
+        if result["status"] == "success" and result["workout"] != LLM_FALLBACK_MESSAGE:
+            self._finish(job["job_id"], status="succeeded", workout=result["workout"], cached=int(result["cached"]), error=None)
+            self.succeeded += 1
+        else:
+            error = result.get("message") or "Upstream model unavailable"
+            if job["attempts"] < self.max_attempts:
+                self.retries += 1
+                self._finish(
+                    job["job_id"], status="queued", error=error,
+                    run_after=time.time() + self.retry_seconds * job["attempts"],
+                )
+                return
+            self._finish(job["job_id"], status="failed", error=error)
+            self.failed += 1
+
+        record = self.get(job["job_id"])
+        if record["status"] == "succeeded" and self.on_success is not None:
+            try:
+                outcome = self.on_success(record)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+            except Exception as exc:
+                print(f"[plan_jobs] on_success hook failed for {job['job_id']}: {exc}")
+        if job["callback_url"]:
+            await self._deliver(job["callback_url"], record)
+
+    async def check_callback(self, url: str) -> None:
+        """Raise ValueError unless ``url`` is an allowed callback target."""
+        if not self.callback_hosts:
+            raise ValueError("Job callbacks are not enabled on this server")
+        await check_callback_url(url, self.callback_hosts, self.callback_allow_private)
+
+    async def _deliver(self, url: str, record: Dict, attempts: int = 3) -> None:
+        """POST the finished job to its callback URL, retrying transient failures."""
+        try:
+            # Checked again here: the host may resolve differently than at submit time
+            await self.check_callback(url)
+        except ValueError as exc:
+            print(f"[plan_jobs] Not delivering {record['job_id']}: {exc}")
+            self.callbacks_failed += 1
+            return
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=10.0)
+        for attempt in range(attempts):
+            try:
+                response = await self._http.post(url, json=record)
+                if response.status_code < 500:
+                    self.callbacks_sent += 1
+                    return
+            except httpx.HTTPError:
+                pass
+            if attempt + 1 < attempts:
+                await asyncio.sleep(self.retry_seconds * (attempt + 1))
+        self.callbacks_failed += 1
+
+    async def _worker(self) -> None:
+        while True:
+            job = self._claim()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(1.0, self._next_due_in()) or 0.05)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if job["attempts"] > self.max_attempts:
+                self._finish(job["job_id"], status="failed", error=job["error"] or "Worker lost the job")
+                self.failed += 1
+                continue
+            try:
+                await self._run(job)
+            except Exception as exc:
+                # Leave the lease to expire so the job is retried rather than lost
+                print(f"[plan_jobs] Job {job['job_id']} crashed: {exc}")
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop; jobs left over from a previous run resume."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        for _ in range(self.workers):
+            task = asyncio.create_task(self._worker())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM plan_jobs GROUP BY status").fetchall())
+        return {
+            "workers": self.workers,
+            "jobs": {status: counts.get(status, 0) for status in JOB_STATUSES},
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retries": self.retries,
+            "callbacks_sent": self.callbacks_sent,
+            "callbacks_failed": self.callbacks_failed,
+        }
+
+
+def create_plan_job_queue(orchestrator: WorkoutOrchestrator, on_success: Optional[OnSuccess] = None) -> PlanJobQueue:
+    """Build the plan job queue from PLAN_JOB_* settings.
+
+    Callbacks are off unless PLAN_JOB_CALLBACK_HOSTS lists the hosts that
+    may receive them (comma-separated); PLAN_JOB_CALLBACK_ALLOW_PRIVATE=1
+    permits private addresses for local development.
+    """
+    return PlanJobQueue(
+        os.getenv("PLAN_JOB_PATH", "plan_jobs.db"),
+        orchestrator,
+        workers=int(os.getenv("PLAN_JOB_WORKERS", "4")),
+        max_attempts=int(os.getenv("PLAN_JOB_MAX_ATTEMPTS", "3")),
+        retry_seconds=float(os.getenv("PLAN_JOB_RETRY_SECONDS", "2")),
+        lease_seconds=float(os.getenv("PLAN_JOB_LEASE_SECONDS", "120")),
+        ttl_seconds=float(os.getenv("PLAN_JOB_TTL_SECONDS", str(24 * 3600))),
+        on_success=on_success,
+        callback_hosts=os.getenv("PLAN_JOB_CALLBACK_HOSTS", "").split(","),
+        callback_allow_private=os.getenv("PLAN_JOB_CALLBACK_ALLOW_PRIVATE", "0").lower() in ("1", "true", "yes"),
+    )
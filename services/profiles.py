@@ -0,0 +1,29 @@
+from models.schemas import ConversationState
+from models.user import FitnessGoal, PhysicalStats, Restrictions, UserPreferences, UserProfile
+
+
+def create_user_profile(state: ConversationState) -> UserProfile:
+    """Create a UserProfile from conversation state"""
+    return UserProfile(
+        user_id=state.session_id,
+        name=state.basics.name or "User",
+        physical_stats=PhysicalStats(
+            height=state.basics.height_cm,
+            weight=state.basics.weight_kg,
+            gender=state.basics.gender,
+            age=state.basics.age
+        ),
+        goals=[FitnessGoal(goal_type=goal) for goal in state.goals_block.goals],
+        preferences=UserPreferences(
+            preferred_workout_types=state.prefs.preferred_workout_types,
+            preferred_training_times=state.prefs.preferred_training_times
+        ),
+        activity_level=state.basics.activity_level,
+        restrictions=Restrictions(
+            injuries=state.prefs.injuries,
+            equipment=state.prefs.equipment,
+            not_preferred_exercises=state.prefs.not_preferred_exercises,
+            special_considerations=state.prefs.special_considerations
+        ),
+        created_at=None
+    )
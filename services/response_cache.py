@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from models.schemas import Basics, GoalBlock
+
+
+AGE_BANDS = [(0, 17), (18, 24), (25, 34), (35, 44), (45, 54), (55, 64), (65, 200)]
+
+
+def age_band(age: Optional[int]) -> str:
+    if age is None:
+        return "unknown"
+    for low, high in AGE_BANDS:
+        if low <= age <= high:
+            return f"{low}-{high}" if high < 200 else f"{low}+"
+    return "unknown"
+
+
+def basics_fingerprint(basics: Basics) -> str:
+    """Coarse key for the BASIC-stage acknowledgement: age band, gender and activity level."""
+    gender = (basics.gender or "unknown").lower()
+    activity = (basics.activity_level or "unknown").lower()
+    return f"basic|{age_band(basics.age)}|{gender}|{activity}"
+
+
+def goals_fingerprint(basics: Basics, goals: GoalBlock) -> str:
+    """Coarse key for the GOALS-stage acknowledgement: the basics key plus the sorted goal set."""
+    goal_set = ",".join(sorted({g.lower() for g in goals.goals}))
+    return f"goals|{basics_fingerprint(basics).split('|', 1)[1]}|{goal_set}"
+
+
+class ResponseCache:
+    """LRU + TTL cache holding several interchangeable responses per key.
+
+    ``get`` returns a random variant once a key has at least one; callers use
+    ``wants_more`` to top a key up to ``variants_per_key`` in the background so
+    repeat visitors do not all see the same sentence. Keys are namespaced by
+    the text before the first ``|`` and counters are kept per namespace.
+    """
+
+    def __init__(
+        self,
+        max_keys: int = 2048,
+        variants_per_key: int = 3,
+        ttl_seconds: float = 7 * 24 * 3600,
+        path: Optional[str] = None,
+    ):
+        self.max_keys = max_keys
+        self.variants_per_key = variants_per_key
+        self.ttl_seconds = ttl_seconds
+        self.path = Path(path) if path else None
+        # key -> (variants, created_at wall-clock so entries survive restarts)
+        self._entries: "OrderedDict[str, tuple[List[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self.evictions = 0
+        if self.path and self.path.exists():
+            self.load()
+
+    def get(self, key: str) -> Optional[str]:
+        namespace = key.split("|", 1)[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._counters[namespace]["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters[namespace]["hits"] += 1
+            return random.choice(entry[0])
+
+    def wants_more(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and len(entry[0]) < self.variants_per_key
+
+    def add(self, key: str, response: str) -> None:
+        with self._lock:
+            variants, created_at = self._entries.get(key, ([], time.time()))
+            if response not in variants:
+                variants = (variants + [response])[-self.variants_per_key:]
+            self._entries[key] = (variants, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            per_stage = {}
+            for namespace, counts in self._counters.items():
+                lookups = counts["hits"] + counts["misses"]
+                per_stage[namespace] = {
+                    **counts,
+                    "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0,
+                }
+            return {"keys": len(self._entries), "evictions": self.evictions, "stages": per_stage}
+
+    def save(self) -> None:
+        """Atomically write live entries to ``path`` (no-op without a path)."""
+        if not self.path:
+            return
+        with self._lock:
+            payload = {key: {"variants": v, "created_at": c} for key, (v, c) in self._entries.items()}
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(payload))
+        os.replace(tmp, self.path)
+
+    def load(self) -> None:
+        try:
+            payload = json.loads(self.path.read_text())
+        except (OSError, ValueError) as exc:
+            print(f"[response_cache] Ignoring unreadable cache file {self.path}: {exc}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, entry in payload.items():
+                if now - entry["created_at"] <= self.ttl_seconds:
+                    self._entries[key] = (entry["variants"][-self.variants_per_key:], entry["created_at"])
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Build the acknowledgement cache from RESPONSE_CACHE_* settings, or None when disabled."""
+    if os.getenv("RESPONSE_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    return ResponseCache(
+        max_keys=int(os.getenv("RESPONSE_CACHE_MAX_KEYS", "2048")),
+        variants_per_key=int(os.getenv("RESPONSE_CACHE_VARIANTS", "3")),
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+        path=os.getenv("RESPONSE_CACHE_PATH") or None,
+    )
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from models.schemas import ConversationState
+from services.state_codec import decode_state, encode_state
+
+
+class SessionStore(ABC):
+    """Storage for ConversationState keyed by session id.
+
+    Implementations expire idle sessions after ``ttl_seconds`` and keep
+    hit/miss/eviction counters for the stats endpoint. ``get`` returns a
+    decoded copy, so two turns that read the same session and then ``put``
+    it are last-writer-wins: the later put replaces the earlier one whole.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.writes = 0
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[ConversationState]:
+        """Return the stored state, or None if unknown or expired."""
+
+    @abstractmethod
+    def put(self, state: ConversationState) -> None:
+        """Insert or replace the state for ``state.session_id``."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Drop a session if present."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "writes": self.writes,
+        }
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process LRU store with idle TTL, an entry cap and a byte cap.
+
+    States are kept in the compact binary encoding from state_codec, so
+    ``get`` returns a fresh object and the byte cap counts actual payload
+    sizes.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 10_000, max_bytes: int = 64 * 1024 * 1024):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[ConversationState]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            data, touched = entry
+            now = time.monotonic()
+            if now - touched > self.ttl_seconds:
+                self._remove(session_id)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries[session_id] = (data, now)
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+        return decode_state(data)
+
+    def put(self, state: ConversationState) -> None:
+        data = encode_state(state)
+        with self._lock:
+            if state.session_id in self._entries:
+                self._remove(state.session_id)
+            self._entries[state.session_id] = (data, time.monotonic())
+            self._bytes += len(data)
+            self.writes += 1
+            self._evict()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._entries:
+                self._remove(session_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats["bytes"] = self._bytes
+        return stats
+
+    def _remove(self, session_id: str) -> None:
+        data, _ = self._entries.pop(session_id)
+        self._bytes -= len(data)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        # Expired entries cluster at the LRU end, so drop those first
+        while self._entries:
+            oldest_id, (_, touched) = next(iter(self._entries.items()))
+            if now - touched <= self.ttl_seconds:
+                break
+            self._remove(oldest_id)
+            self.expirations += 1
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared by every worker process on the host through a WAL-mode SQLite file.
+
+    Rows hold the compact binary encoding from state_codec; JSON rows
+    written before it are still read. Counters are per process.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 3600, max_entries: int = 100_000):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes_since_sweep = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[ConversationState]:
+        row = self._conn().execute(
+            "SELECT data, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        data, expires_at = row
+        if expires_at < time.time():
+            self.delete(session_id)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        if isinstance(data, str):
+            return ConversationState.model_validate_json(data)
+        return decode_state(data)
+
+    def put(self, state: ConversationState) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+            (state.session_id, encode_state(state), time.time() + self.ttl_seconds),
+        )
+        self.writes += 1
+        self._writes_since_sweep += 1
+        if self._writes_since_sweep >= 100:
+            self._writes_since_sweep = 0
+            self._sweep()
+
+    def delete(self, session_id: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _sweep(self) -> None:
+        conn = self._conn()
+        self.expirations += conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            # expires_at is last write + TTL, so the smallest values are least recently used
+            self.evictions += conn.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY expires_at LIMIT ?)",
+                (overflow,),
+            ).rowcount
+
+
+def create_session_store() -> SessionStore:
+    """Build the session store selected by SESSION_STORE ("memory" or "sqlite").
+
+    The default is "memory" for a single web worker. With WEB_CONCURRENCY
+    above 1 (the Procfile's uvicorn --workers), it is "sqlite" so every
+    worker sees the same sessions.
+    """
+    default = "sqlite" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "memory"
+    backend = os.getenv("SESSION_STORE", default).lower()
+    ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            os.getenv("SESSION_DB_PATH", "sessions.db"),
+            ttl_seconds=ttl_seconds,
+            max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "100000")),
+        )
+    if backend == "memory":
+        return InMemorySessionStore(
+            ttl_seconds=ttl_seconds,
+            max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "10000")),
+            max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+    raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
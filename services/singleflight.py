@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+
+def request_key(**params: Any) -> str:
+    """Stable hash of a JSON-serializable request description."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class SingleFlight:
+    """Coalesce concurrent identical async calls onto one in-flight task.
+
+    The first caller for a key starts the work; callers arriving before it
+    finishes await the same result (or exception). The shared task is
+    shielded, so one caller being cancelled does not cancel it for the rest;
+    it is only cancelled once every caller waiting on it has gone.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.calls = 0
+        self.deduplicated = 0
+        self.cancelled = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.deduplicated += 1
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[key] == 1 and not task.done():
+                task.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def stats(self) -> Dict:
+        total = self.calls + self.deduplicated
+        return {
+            "upstream_calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+            "cancelled": self.cancelled,
+            "dedup_rate": round(self.deduplicated / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from models.schemas import PrefsConstraints
+from models.user import UserProfile
+from services.orchestrator import LLM_FALLBACK_MESSAGE, WorkoutOrchestrator
+from services.plan_cache import profile_cache_key
+
+
+def predicted_prefs() -> PrefsConstraints:
+    """The FINAL-stage answers most users give: bodyweight only, no injuries, no preferences."""
+    return PrefsConstraints(equipment=["bodyweight"])
+
+
+class PlanSpeculator:
+    """Starts generate_workout for predicted preferences before the FINAL stage arrives.
+
+    At most ``max_share`` of the upstream connection pool is spent on
+    speculative plans at once; beyond that, speculation is skipped. When
+    the real preferences arrive, ``claim`` hands over the speculative plan
+    if the canonical profile matches and cancels it otherwise. Unclaimed
+    plans are dropped after ``ttl_seconds``.
+    """
+
+    def __init__(self, orchestrator: WorkoutOrchestrator, max_share: float = 0.2, ttl_seconds: float = 600):
+        self.orchestrator = orchestrator
+        self.max_share = max_share
+        self.ttl_seconds = ttl_seconds
+        # session_id -> (profile key, generation task, started at)
+        self._pending: Dict[str, Tuple[str, asyncio.Task, float]] = {}
+        # Every speculative generation still running, claimed or not; these hold upstream connections
+        self._running: Set[asyncio.Task] = set()
+        self.started = 0
+        self.skipped_budget = 0
+        self.already_cached = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @property
+    def limit(self) -> int:
+        return math.floor(self.max_share * self.orchestrator.llm.max_connections)
+
+    def in_flight(self) -> int:
+        return len(self._running)
+
+    def start(self, session_id: str, user_profile: UserProfile) -> bool:
+        """Begin generating the plan for ``user_profile`` in the background if the budget allows."""
+        self._expire()
+        self._drop(session_id)
+        if self.orchestrator.cached_workout(user_profile) is not None:
+            self.already_cached += 1
+            return False
+        if self.in_flight() >= self.limit:
+            self.skipped_budget += 1
+            return False
+        task = asyncio.create_task(self.orchestrator.generate_workout(user_profile, use_cache=False))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        self._pending[session_id] = (profile_cache_key(user_profile), task, time.monotonic())
+        self.started += 1
+        return True
+
+    async def claim(self, session_id: str, user_profile: UserProfile) -> Optional[Dict]:
+        """Return the speculative generate_workout result for this session if it matches ``user_profile``.
+
+        A matching plan still being generated is awaited, which is never
+        slower than starting over. A mismatch cancels it and returns None.
+        """
+        entry = self._pending.pop(session_id, None)
+        if entry is None:
+            return None
+        key, task, _ = entry
+        if key != profile_cache_key(user_profile):
+            task.cancel()
+            self.misses += 1
+            return None
+        try:
+            result = await asyncio.shield(task)
+        except Exception:
+            self.misses += 1
+            return None
+        if result["status"] != "success" or result["workout"] == LLM_FALLBACK_MESSAGE:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def _drop(self, session_id: str) -> None:
+        entry = self._pending.pop(session_id, None)
+        if entry is not None:
+            entry[1].cancel()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        for session_id in [s for s, (_, _, started) in self._pending.items() if started < cutoff]:
+            self._drop(session_id)
+            self.expired += 1
+
+    def shutdown(self) -> None:
+        for session_id in list(self._pending):
+            self._drop(session_id)
+
+    def stats(self) -> Dict:
+        claimed = self.hits + self.misses
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight(),
+            "pending": len(self._pending),
+            "started": self.started,
+            "skipped_budget": self.skipped_budget,
+            "already_cached": self.already_cached,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / claimed, 4) if claimed else 0.0,
+        }
+
+
+def create_plan_speculator(orchestrator: WorkoutOrchestrator) -> Optional[PlanSpeculator]:
+    """Build the speculator from SPECULATION_* settings, or None when disabled."""
+    if os.getenv("SPECULATION_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    return PlanSpeculator(
+        orchestrator,
+        max_share=float(os.getenv("SPECULATION_MAX_SHARE", "0.2")),
+        ttl_seconds=float(os.getenv("SPECULATION_TTL_SECONDS", "600")),
+    )
@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import json
+import math
+import struct
+import uuid
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+from models.schemas import (
+    ACTIVITY,
+    EQUIPMENT,
+    GENDER,
+    GOALS,
+    TIMES,
+    WORKOUT_TYPES,
+    ChatStage,
+    ConversationState,
+)
+
+# Version 2 added a second flags byte and the structured plan; version 1 payloads still decode
+VERSION = 2
+# Label for the encoding when a state is sent over the wire as base64
+STATE_ENCODING = f"compact-v{VERSION}"
+_STAGES = list(ChatStage)
+# Names that can appear in ConversationState.missing. Codes are positions: append only.
+MISSING_FIELDS = (
+    "name", "age", "gender", "height_cm", "weight_kg", "activity_level", "goals", "injuries", "equipment",
+    "preferred_workout_types", "preferred_training_times", "not_preferred_exercises", "special_considerations",
+)
+# Plans shorter than this are stored as-is; zlib's header would eat the saving
+_COMPRESS_MIN_BYTES = 64
+# Preset zlib dictionary: the plan layout shared by the LLM prompt and the plan engine, most common last.
+# Changing it changes the format, so it needs a new VERSION.
+_PLAN_DICTIONARY = (
+    "- Equipment: bodyweight, dumbbells, resistance bands, gym access\n"
+    "- Split type: full-body 3x/week, upper/lower, push/pull/legs\n"
+    "sets, reps, rest 60s, rest 90s, 3x8-10, 3x10-12, 2x12, per side, easy pace, RPE\n"
+    "strength training, cardio, yoga, pilates, HIIT, Active Recovery, Lower Body, Upper Body, Full Body, Conditioning\n"
+    "squat, deadlift, lunge, press, row, plank, push-up, bridge, stretch, carry, curl\n"
+    "## Optional Modifications\n## Tips\n"
+    "- Keep at least one full rest day between your hardest sessions and aim for 7-9 hours of sleep.\n"
+    "- Consistency beats intensity: a good week is every planned session done with solid form.\n"
+    "## Day 7 – Rest\n- Full rest: sleep well, walk if you feel like it.\n"
+    "- Cool-Down:\n- Finisher: \n- Main Workout:\n- Warm-Up:\n- Brisk walk 5 min, easy pace\n"
+    "# Weekly Workout Plan\n## Overview\n- Days per week: 4\n- Split type: \n- Equipment: \n\n## Day 1 – "
+).encode("utf-8")
+
+# Header flags after the stage bits
+_BASICS, _GOALS, _PREFS, _WORKOUT, _WORKOUT_ZLIB, _UUID = (1 << n for n in range(2, 8))
+# Second header byte
+_PLAN, _PLAN_ZLIB = 1, 2
+# Basics presence bits 0-5 follow field order; these mark a float stored as a double
+_HEIGHT_DOUBLE, _WEIGHT_DOUBLE = 1 << 6, 1 << 7
+_DOUBLE = struct.Struct("<d")
+
+
+def _varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _string(out: bytearray, value: str) -> None:
+    data = value.encode("utf-8")
+    _varint(out, len(data))
+    out += data
+
+
+def _strings(out: bytearray, values: Sequence[str]) -> None:
+    _varint(out, len(values))
+    for value in values:
+        _string(out, value)
+
+
+def _enum(out: bytearray, value: str, vocab: Sequence[str]) -> None:
+    """0 then the string for values outside ``vocab``, else code + 1."""
+    try:
+        _varint(out, vocab.index(value) + 1)
+    except ValueError:
+        out.append(0)
+        _string(out, value)
+
+
+def _enum_list(out: bytearray, values: Sequence[str], vocab: Sequence[str]) -> None:
+    """A bitset when ``values`` are distinct allowlist entries in allowlist order, else a list of enums.
+
+    The low bit of the leading varint says which: ``mask << 1 | 1`` or ``count << 1``.
+    """
+    mask, last = 0, -1
+    for value in values:
+        code = vocab.index(value) if value in vocab else -1
+        if code <= last:
+            break
+        mask |= 1 << code
+        last = code
+    else:
+        _varint(out, mask << 1 | 1)
+        return
+    _varint(out, len(values) << 1)
+    for value in values:
+        _enum(out, value, vocab)
+
+
+def _text(out: bytearray, value: str) -> bool:
+    """Write long text, zlib-compressed against the plan dictionary when that is smaller. Returns True if compressed."""
+    data = value.encode("utf-8")
+    packed = False
+    if len(data) >= _COMPRESS_MIN_BYTES:
+        compressor = zlib.compressobj(6, zdict=_PLAN_DICTIONARY)
+        compressed = compressor.compress(data) + compressor.flush()
+        if len(compressed) < len(data):
+            data, packed = compressed, True
+    _varint(out, len(data))
+    out += data
+    return packed
+
+
+def _pack_float(out: bytearray, value: float) -> bool:
+    """Write ``value`` as zigzag tenths when that is exact, else as a double. Returns True for a double."""
+    if math.isfinite(value) and abs(value) < 1e15:
+        tenths = round(value * 10)
+        if _DOUBLE.pack(tenths / 10) == _DOUBLE.pack(value):
+            _varint(out, tenths << 1 if tenths >= 0 else (-tenths << 1) - 1)
+            return False
+    out += _DOUBLE.pack(value)
+    return True
+
+
+def encode_state(state: ConversationState) -> bytes:
+    """Pack a ConversationState into the compact binary form read by decode_state.
+
+    Allowlist values become small integer codes and allowlist lists become
+    bitsets; values outside the allowlists, free text and list order are
+    kept, so the round trip is exact. A canonical UUID session id takes 16
+    bytes. A long workout plan and the structured plan (as JSON) are
+    zlib-compressed against a preset dictionary of the plan layout.
+    """
+    out = bytearray((VERSION, 0, 0))
+    flags = _STAGES.index(state.stage)
+    try:
+        session_uuid = uuid.UUID(state.session_id)
+    except ValueError:
+        session_uuid = None
+    if session_uuid is not None and str(session_uuid) == state.session_id:
+        flags |= _UUID
+        out += session_uuid.bytes
+    else:
+        _string(out, state.session_id)
+    _enum_list(out, state.missing, MISSING_FIELDS)
+
+    basics = state.basics
+    if basics is not None:
+        flags |= _BASICS
+        at = len(out)
+        out.append(0)
+        present = 0
+        if basics.name is not None:
+            present |= 1
+            _string(out, basics.name)
+        if basics.age is not None:
+            present |= 1 << 1
+            _varint(out, basics.age << 1 if basics.age >= 0 else (-basics.age << 1) - 1)
+        if basics.gender is not None:
+            present |= 1 << 2
+            _enum(out, basics.gender, GENDER)
+        if basics.height_cm is not None:
+            present |= 1 << 3 | (_HEIGHT_DOUBLE if _pack_float(out, basics.height_cm) else 0)
+        if basics.weight_kg is not None:
+            present |= 1 << 4 | (_WEIGHT_DOUBLE if _pack_float(out, basics.weight_kg) else 0)
+        if basics.activity_level is not None:
+            present |= 1 << 5
+            _enum(out, basics.activity_level, ACTIVITY)
+        out[at] = present
+    if state.goals_block is not None:
+        flags |= _GOALS
+        _enum_list(out, state.goals_block.goals, GOALS)
+    prefs = state.prefs
+    if prefs is not None:
+        flags |= _PREFS
+        _strings(out, prefs.injuries)
+        _enum_list(out, prefs.equipment, EQUIPMENT)
+        _enum_list(out, prefs.preferred_workout_types, WORKOUT_TYPES)
+        _enum_list(out, prefs.preferred_training_times, TIMES)
+        _strings(out, prefs.not_preferred_exercises)
+        _strings(out, prefs.special_considerations)
+    if state.workout is not None:
+        flags |= _WORKOUT | (_WORKOUT_ZLIB if _text(out, state.workout) else 0)
+    if state.plan is not None:
+        # Every optional field of the plan models defaults to None, so dropping nulls loses nothing
+        out[2] = _PLAN | (_PLAN_ZLIB if _text(out, state.plan.model_dump_json(exclude_none=True)) else 0)
+    out[1] = flags
+    return bytes(out)
+
+
+class _Reader:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def varint(self) -> int:
+        value = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def zigzag(self) -> int:
+        value = self.varint()
+        return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+    def raw(self, size: int) -> bytes:
+        end = self.pos + size
+        if end > len(self.data):
+            raise IndexError("truncated")
+        chunk = self.data[self.pos : end]
+        self.pos = end
+        return chunk
+
+    def string(self) -> str:
+        return self.raw(self.varint()).decode("utf-8")
+
+    def text(self, compressed: bool) -> str:
+        data = self.raw(self.varint())
+        if compressed:
+            decompressor = zlib.decompressobj(zdict=_PLAN_DICTIONARY)
+            data = decompressor.decompress(data) + decompressor.flush()
+            if not decompressor.eof:
+                raise ValueError("truncated compressed text")
+        return data.decode("utf-8")
+
+    def strings(self) -> List[str]:
+        return [self.string() for _ in range(self.varint())]
+
+    def enum(self, vocab: Sequence[str]) -> str:
+        code = self.varint()
+        return vocab[code - 1] if code else self.string()
+
+    def enum_list(self, vocab: Sequence[str]) -> List[str]:
+        header = self.varint()
+        if header & 1:
+            mask = header >> 1
+            if mask >> len(vocab):
+                raise ValueError("bitset has bits past the allowlist")
+            return [value for code, value in enumerate(vocab) if mask >> code & 1]
+        return [self.enum(vocab) for _ in range(header >> 1)]
+
+    def float(self, double: bool) -> float:
+        if double:
+            return _DOUBLE.unpack(self.raw(8))[0]
+        return self.zigzag() / 10
+
+
+def decode_state(data: bytes) -> ConversationState:
+    """Rebuild the ConversationState packed by encode_state. Raises ValueError on malformed input."""
+    if not data or data[0] not in (1, VERSION):
+        raise ValueError(f"Unsupported state encoding version: {data[0] if data else None}")
+    try:
+        return _decode(_Reader(data))
+    except (IndexError, KeyError, UnicodeDecodeError, json.JSONDecodeError, zlib.error, struct.error) as exc:
+        raise ValueError(f"Malformed encoded state: {exc}") from None
+
+
+def _decode(reader: _Reader) -> ConversationState:
+    flags = reader.data[1]
+    flags2 = reader.data[2] if reader.data[0] >= 2 else 0
+    reader.pos = 3 if reader.data[0] >= 2 else 2
+    stage = _STAGES[flags & 0b11]
+    session_id = str(uuid.UUID(bytes=reader.raw(16))) if flags & _UUID else reader.string()
+    missing = reader.enum_list(MISSING_FIELDS)
+
+    basics: Optional[Dict] = None
+    if flags & _BASICS:
+        present = reader.data[reader.pos]
+        reader.pos += 1
+        values: Dict[str, object] = {}
+        if present & 1:
+            values["name"] = reader.string()
+        if present & 1 << 1:
+            values["age"] = reader.zigzag()
+        if present & 1 << 2:
+            values["gender"] = reader.enum(GENDER)
+        if present & 1 << 3:
+            values["height_cm"] = reader.float(bool(present & _HEIGHT_DOUBLE))
+        if present & 1 << 4:
+            values["weight_kg"] = reader.float(bool(present & _WEIGHT_DOUBLE))
+        if present & 1 << 5:
+            values["activity_level"] = reader.enum(ACTIVITY)
+        basics = values
+    goals_block = {"goals": reader.enum_list(GOALS)} if flags & _GOALS else None
+    prefs: Optional[Dict] = None
+    if flags & _PREFS:
+        prefs = {
+            "injuries": reader.strings(),
+            "equipment": reader.enum_list(EQUIPMENT),
+            "preferred_workout_types": reader.enum_list(WORKOUT_TYPES),
+            "preferred_training_times": reader.enum_list(TIMES),
+            "not_preferred_exercises": reader.strings(),
+            "special_considerations": reader.strings(),
+        }
+    workout = reader.text(bool(flags & _WORKOUT_ZLIB)) if flags & _WORKOUT else None
+    plan = json.loads(reader.text(bool(flags2 & _PLAN_ZLIB))) if flags2 & _PLAN else None
+    if reader.pos != len(reader.data):
+        raise ValueError("trailing bytes after encoded state")
+    # One validation pass in pydantic-core is cheaper than model_construct per nested model
+    return ConversationState.model_validate({
+        "session_id": session_id,
+        "stage": stage,
+        "basics": basics,
+        "goals_block": goals_block,
+        "prefs": prefs,
+        "missing": missing,
+        "workout": workout,
+        "plan": plan,
+    })
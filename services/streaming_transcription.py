@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import io
+import os
+import re
+import time
+import wave
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from services.fast_extract import extract_fields_locally
+from services.telemetry import span
+from services.transcription import (
+    MAX_UPLOAD_BYTES,
+    SAMPLE_RATE,
+    _FFMPEG_ARGS,
+    _FFMPEG_OUTPUT,
+    _pcm_to_float32,
+    compute_missing,
+    extract_fields_from_transcript,
+    prefer_remote_transcription,
+    transcribe_audio_to_text,
+    transcribe_locally,
+)
+
+STREAM_FORMATS = ("auto", "pcm16")
+# Candidate commit points are 100 ms frames
+_FRAME = SAMPLE_RATE // 10
+# The final pass starts this far before the last commit point, so a word cut there is heard whole
+_OVERLAP = SAMPLE_RATE // 5
+
+
+def _pcm16_to_wav(pcm: bytes) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return buf.getvalue()
+
+
+def _quietest_cut(samples) -> int:
+    """Index of the lowest-energy 100 ms frame in the second half of ``samples``."""
+    import numpy as np
+
+    frames = len(samples) // _FRAME
+    first = frames // 2
+    if frames - first < 1:
+        return len(samples)
+    energy = np.square(samples[: frames * _FRAME].reshape(frames, _FRAME)).mean(axis=1)
+    return int(first + np.argmin(energy[first:])) * _FRAME + _FRAME // 2
+
+
+def _join(parts: List[str]) -> str:
+    return " ".join(part.strip() for part in parts if part and part.strip())
+
+
+def _merge_overlap(head: str, tail: str, max_words: int = 4) -> str:
+    """Join transcripts of overlapping audio, dropping the words ``tail`` repeats from the end of ``head``."""
+    head_words, tail_words = head.split(), tail.split()
+
+    def norm(words: List[str]) -> List[str]:
+        return [re.sub(r"[^\w']", "", word.lower()) for word in words]
+
+    for n in range(min(max_words, len(head_words), len(tail_words)), 0, -1):
+        if norm(head_words[-n:]) == norm(tail_words[:n]):
+            tail_words = tail_words[n:]
+            break
+    return _join([head, " ".join(tail_words)])
+
+
+class StreamLimiter:
+    """Caps concurrent audio streams: each one holds an ffmpeg process and runs Whisper about once a second."""
+
+    def __init__(self, max_streams: int):
+        self.max_streams = max_streams
+        self.active = 0
+        self.rejected = 0
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Hold one stream slot for the block. Raises HTTPException(503) when all are taken."""
+        if self.active >= self.max_streams:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many concurrent audio streams", headers={"Retry-After": "1"})
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+
+    def stats(self) -> Dict:
+        return {"max_streams": self.max_streams, "active": self.active, "rejected": self.rejected}
+
+
+stream_limiter = StreamLimiter(int(os.getenv("STREAM_MAX_CONCURRENT", "8")))
+
+
+class StreamingTranscriber:
+    """Transcribes one spoken answer while it is still arriving.
+
+    Encoded chunks (or raw 16 kHz s16le PCM with ``fmt="pcm16"``) go into
+    one ffmpeg process as they arrive. Every ``partial_seconds`` of new
+    audio, Whisper re-reads the uncommitted window. ``on_partial`` then gets
+    the transcript so far and the locally extracted selections; partials
+    never call the LLM. Once the window grows past ``commit_seconds``, its
+    head up to the quietest point is transcribed once more and committed.
+    ``finish`` gives ffmpeg ``finalize_wait`` seconds to drain (killing it
+    after that) and waits as long again for an in-flight partial before
+    cancelling it. It then reuses the last partial when nothing came after
+    it, and otherwise re-decodes from the last commit point, with a little
+    overlap. Partials are best-effort: they are skipped while local Whisper
+    is busy or unavailable, and the final pass falls back to the remote API
+    with the whole recording.
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        on_partial: Callable[[Dict], Awaitable[None]],
+        fmt: str = "auto",
+        partial_seconds: float = 1.0,
+        commit_seconds: float = 8.0,
+        max_bytes: int = MAX_UPLOAD_BYTES,
+        finalize_wait: float = 0.2,
+    ):
+        if fmt not in STREAM_FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of {STREAM_FORMATS}")
+        self.stage = stage
+        self.on_partial = on_partial
+        self.fmt = fmt
+        self.partial_samples = int(partial_seconds * SAMPLE_RATE)
+        self.commit_samples = int(commit_seconds * SAMPLE_RATE)
+        self.max_bytes = max_bytes
+        self.finalize_wait = finalize_wait
+        self.partials = 0
+        self.finalize_seconds: Optional[float] = None
+        self._chunks: List[bytes] = []
+        self._received = 0
+        self._pcm = bytearray()
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._partial_task: Optional[asyncio.Task] = None
+        self._new_audio = asyncio.Event()
+        self._finishing = False
+        self._committed: List[str] = []
+        self._committed_at = 0
+        # (sample count covered, text of the window since _committed_at)
+        self._partial: Optional[Tuple[int, str]] = None
+
+    async def start(self) -> None:
+        if self.fmt == "auto":
+            try:
+                self._proc = await asyncio.create_subprocess_exec(
+                    "ffmpeg", *_FFMPEG_ARGS, "-i", "pipe:0", *_FFMPEG_OUTPUT,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+            except FileNotFoundError:
+                self._proc = None  # no local decoding; the final pass goes to the remote API
+            else:
+                self._reader = asyncio.create_task(self._read_pcm())
+        self._partial_task = asyncio.create_task(self._run_partials())
+
+    def _samples(self) -> int:
+        return len(self._pcm) // 2
+
+    def _window(self, start: int, end: int):
+        return _pcm_to_float32(bytes(self._pcm[start * 2 : end * 2]))
+
+    def _add_pcm(self, pcm: bytes) -> None:
+        self._pcm += pcm
+        self._new_audio.set()
+
+    async def _read_pcm(self) -> None:
+        while chunk := await self._proc.stdout.read(64 * 1024):
+            self._add_pcm(chunk)
+
+    async def feed(self, chunk: bytes) -> None:
+        """Accept the next chunk of audio. Raises HTTPException(413) past ``max_bytes``."""
+        self._received += len(chunk)
+        if self._received > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Audio stream exceeds {self.max_bytes} bytes")
+        self._chunks.append(chunk)
+        if self.fmt == "pcm16":
+            self._add_pcm(chunk)
+        elif self._proc is not None and self._proc.returncode is None:
+            try:
+                self._proc.stdin.write(chunk)
+                await self._proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # ffmpeg gave up on the stream; the final pass uses the raw bytes
+
+    async def _run_partials(self) -> None:
+        while not self._finishing:
+            await self._new_audio.wait()
+            self._new_audio.clear()
+            end = self._samples()
+            covered = self._partial[0] if self._partial else self._committed_at
+            if self._finishing or end - covered < self.partial_samples or prefer_remote_transcription():
+                continue
+            try:
+                self._partial = (end, await transcribe_locally(self._window(self._committed_at, end)))
+                if end - self._committed_at > self.commit_samples:
+                    await self._commit(end)
+            except Exception:
+                continue  # best-effort; the final pass covers whatever was missed
+            # Right after a commit the tail past the cut is left for the next partial
+            transcript = _join(self._committed + ([self._partial[1]] if self._partial else []))
+            selections, _ = extract_fields_locally(self.stage, transcript) if transcript else ({}, 0.0)
+            self.partials += 1
+            await self.on_partial({
+                "type": "partial",
+                "transcript": transcript,
+                "selections": selections,
+                "missing": compute_missing(self.stage, selections),
+                "audio_seconds": round(end / SAMPLE_RATE, 2),
+            })
+
+    async def _commit(self, end: int) -> None:
+        window = self._window(self._committed_at, end)
+        cut = _quietest_cut(window)
+        text = await transcribe_locally(window[:cut])
+        self._committed.append(text)
+        self._committed_at += cut
+        self._partial = None
+
+    def _raw(self) -> Tuple[bytes, str]:
+        raw = b"".join(self._chunks)
+        if self.fmt == "pcm16":
+            return _pcm16_to_wav(raw[: len(raw) // 2 * 2]), "stream.wav"
+        return raw, "stream.webm"
+
+    async def finish(self) -> Tuple[str, Dict]:
+        """End of stream: return ``(transcript, selections)`` for the whole answer.
+
+        Raises HTTPException(422) when no speech was recognized.
+        """
+        started = time.perf_counter()
+        if self._proc is not None:
+            if not self._proc.stdin.is_closing():
+                self._proc.stdin.close()
+            try:
+                await asyncio.wait_for(asyncio.gather(self._reader, self._proc.wait()), self.finalize_wait)
+            except asyncio.TimeoutError:
+                # A stuck decoder must not hold the socket open; the final pass uses the raw bytes
+                if self._proc.returncode is None:
+                    self._proc.kill()
+                    await self._proc.wait()
+        self._finishing = True
+        self._new_audio.set()
+        done, _ = await asyncio.wait({self._partial_task}, timeout=self.finalize_wait)
+        if not done:
+            # A cancelled partial or commit leaves the last finished partial in place
+            self._partial_task.cancel()
+            await asyncio.gather(self._partial_task, return_exceptions=True)
+
+        with span("finalize"):
+            end = self._samples()
+            raw, filename = self._raw()
+            decoded = self.fmt == "pcm16" or (self._proc is not None and self._proc.returncode == 0)
+            try:
+                if not decoded or end == 0 or prefer_remote_transcription():
+                    raise RuntimeError("no local transcription for this stream")
+                if self._partial is not None and self._partial[0] == end:
+                    transcript = _join(self._committed + [self._partial[1]])
+                elif end > self._committed_at:
+                    start = max(0, self._committed_at - _OVERLAP) if self._committed else 0
+                    tail = await transcribe_locally(self._window(start, end))
+                    transcript = _merge_overlap(_join(self._committed), tail)
+                else:
+                    transcript = _join(self._committed)
+            except Exception:
+                transcript = (await transcribe_audio_to_text(None, raw, filename)).strip() if raw else ""
+        if not transcript:
+            raise HTTPException(status_code=422, detail="No speech detected")
+
+        try:
+            selections = await extract_fields_from_transcript(self.stage, transcript)
+        except Exception:
+            selections = {}
+        self.finalize_seconds = time.perf_counter() - started
+        return transcript, selections
+
+    async def abort(self) -> None:
+        """Stop decoding and any in-flight partial; safe to call after ``finish``."""
+        self._finishing = True
+        for task in (self._partial_task, self._reader):
+            if task is not None and not task.done():
+                task.cancel()
+        if self._proc is not None and self._proc.returncode is None:
+            self._proc.kill()
+            await self._proc.wait()
+
+
+def create_streaming_transcriber(stage: str, on_partial: Callable[[Dict], Awaitable[None]], fmt: str = "auto") -> StreamingTranscriber:
+    """Build a transcriber for one stream from STREAM_* settings."""
+    return StreamingTranscriber(
+        stage,
+        on_partial,
+        fmt=fmt,
+        partial_seconds=float(os.getenv("STREAM_PARTIAL_SECONDS", "1.0")),
+        commit_seconds=float(os.getenv("STREAM_COMMIT_SECONDS", "8.0")),
+        finalize_wait=float(os.getenv("STREAM_FINALIZE_WAIT_SECONDS", "0.2")),
+    )
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import List, Optional
+
+from models.schemas import PlanDay, StructuredPlan
+from models.user import UserProfile
+from services.plan_cache import PLAN_TITLE
+from services.plan_engine import REST_DAY_NOTE, default_modifications, default_tips, plan_equipment
+
+# Shown to the LLM as the shape to return
+PLAN_SCHEMA_EXAMPLE = json.dumps({
+    "days_per_week": 4,
+    "split": "4-day upper/lower",
+    "warm_up": ["Brisk walk 5 min, easy pace", "Cat-cow x8 – move one vertebra at a time"],
+    "days": [
+        {"title": "Lower Body", "main": ["Goblet squat 3x10-12, rest 60s – elbows inside knees"], "cool_down": ["Child's pose 45s – sink the hips back"]},
+        {"title": "Rest"},
+    ],
+    "modifications": ["Knee: swap lunges for hip hinges"],
+}, ensure_ascii=False, separators=(",", ":"))
+
+
+def structured_plans_enabled() -> bool:
+    """PLAN_FORMAT=structured asks the LLM for a StructuredPlan and renders it locally; the default is markdown."""
+    plan_format = os.getenv("PLAN_FORMAT", "markdown").lower()
+    if plan_format not in ("markdown", "structured"):
+        raise ValueError(f"PLAN_FORMAT must be markdown or structured, not {plan_format!r}")
+    return plan_format == "structured"
+
+
+_SECTIONS = {"- Warm-Up:": "warm_up", "- Main Workout:": "main", "- Cool-Down:": "cool_down"}
+
+
+def parse_structured_plan(text: str) -> StructuredPlan:
+    """Validate an LLM reply as a StructuredPlan, ignoring any prose or code fence around the JSON object.
+
+    Raises ValueError when there is no valid plan in ``text``.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("no JSON object in the reply")
+    return StructuredPlan.model_validate_json(text[start : end + 1])
+
+
+def render_plan(plan: StructuredPlan, user_profile: UserProfile) -> str:
+    """Render a structured plan to the markdown layout of the plan engine and the generate_workout prompt.
+
+    The equipment line comes from the profile. Omitted modifications and
+    tips are filled with the engine's defaults for the profile.
+    """
+    lines = [
+        PLAN_TITLE,
+        "## Overview",
+        f"- Days per week: {plan.days_per_week}",
+        f"- Split type: {plan.split}",
+        f"- Equipment: {', '.join(e.replace('_', ' ') for e in plan_equipment(user_profile))}",
+    ]
+    for number, day in enumerate(plan.days, start=1):
+        lines += ["", f"## Day {number} – {day.title}"]
+        if day.note is not None or not day.main:
+            lines.append(f"- {day.note if day.note is not None else REST_DAY_NOTE}")
+        warm_up = day.warm_up if day.warm_up is not None else (plan.warm_up if day.main else [])
+        for header, items in (("- Warm-Up:", warm_up), ("- Main Workout:", day.main), ("- Cool-Down:", day.cool_down)):
+            if items:
+                lines += [header] + [f"- {item}" for item in items]
+    modifications = plan.modifications if plan.modifications is not None else default_modifications(user_profile)
+    if modifications:
+        lines += ["", "## Optional Modifications"] + [f"- {m}" for m in modifications]
+    tips = plan.tips if plan.tips is not None else default_tips(user_profile)
+    if tips:
+        lines += ["", "## Tips"] + [f"- {tip}" for tip in tips]
+    return "\n".join(lines) + "\n"
+
+
+def plan_from_markdown(markdown: str, user_profile: UserProfile) -> Optional[StructuredPlan]:
+    """Recover the structured plan from markdown in the render_plan layout, or None for any other text.
+
+    Engine plans and plans rendered from structured replies (including
+    cached or personalized ones) come back exactly; free-form LLM markdown
+    usually does not. The result always renders back to ``markdown``, up
+    to the personalized title.
+    """
+    lines = markdown.rstrip("\n").split("\n")
+    if len(lines) < 5 or not lines[0].startswith(PLAN_TITLE) or lines[1] != "## Overview":
+        return None
+    try:
+        days_per_week = int(lines[2].removeprefix("- Days per week: "))
+    except ValueError:
+        return None
+    split = lines[3].removeprefix("- Split type: ")
+
+    days: List[PlanDay] = []
+    extras = {}
+    block: Optional[dict] = None
+    section: Optional[str] = None
+    for line in lines[5:]:
+        if line == "":
+            block = section = None
+        elif line.startswith("## Day ") and " – " in line:
+            block = {"title": line.split(" – ", 1)[1], "warm_up": [], "main": [], "cool_down": [], "note": None}
+            days.append(block)
+        elif line in ("## Optional Modifications", "## Tips"):
+            block = extras.setdefault(line, {"items": []})
+            section = "items"
+        elif block is None or not line.startswith("- "):
+            return None
+        elif line in _SECTIONS and "items" not in block:
+            section = _SECTIONS[line]
+        elif section is not None:
+            block[section].append(line[2:])
+        elif block.get("note") is None and "items" not in block:
+            block["note"] = line[2:]
+        else:
+            return None
+
+    shared = next((day["warm_up"] for day in days if day["main"] and day["warm_up"]), [])
+    for day in days:
+        if day["main"] and day["warm_up"] == shared or not day["main"] and not day["warm_up"]:
+            day["warm_up"] = None
+        if not day["main"] and day["note"] == REST_DAY_NOTE:
+            day["note"] = None
+    try:
+        plan = StructuredPlan(
+            days_per_week=days_per_week,
+            split=split,
+            warm_up=shared,
+            days=[PlanDay(**day) for day in days],
+            modifications=extras.get("## Optional Modifications", {"items": []})["items"],
+            tips=extras.get("## Tips", {"items": []})["items"],
+        )
+    except ValueError:
+        return None
+    rendered = render_plan(plan, user_profile).split("\n")
+    return plan if rendered[1:] == markdown.split("\n")[1:] else None
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import contextvars
+import os
+import random
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Process-wide counters and histograms, rendered in the Prometheus text format.
+
+    Everything is updated from the event loop thread, so no locking.
+    """
+
+    def __init__(self, namespace: str = "mylo"):
+        self.namespace = namespace
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.help: Dict[str, str] = {}
+
+    def count(self, name: str, value: float = 1, help: str = "", **labels: str) -> None:
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+        if help:
+            self.help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, help: str = "", **labels: str) -> None:
+        series = self.histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(value)
+        if help:
+            self.help.setdefault(name, help)
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Exposition text for every series plus point-in-time ``gauges``."""
+        lines: List[str] = []
+        for name, series in sorted(self.counters.items()):
+            full = f"{self.namespace}_{name}"
+            lines += [f"# HELP {full} {self.help.get(name, name)}", f"# TYPE {full} counter"]
+            for labels, value in series.items():
+                lines.append(f"{full}{_labels(labels)} {value:g}")
+        for name, series in sorted(self.histograms.items()):
+            full = f"{self.namespace}_{name}"
+            lines += [f"# HELP {full} {self.help.get(name, name)}", f"# TYPE {full} histogram"]
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{full}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{full}_sum{_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{full}_count{_labels(labels)} {histogram.count}")
+        for name, value in sorted((gauges or {}).items()):
+            full = f"{self.namespace}_{name}"
+            lines += [f"# TYPE {full} gauge", f"{full} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def flatten_stats(stats: Dict, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a nested /stats dict as gauge names, e.g. ``plan_cache_hits``."""
+    gauges: Dict[str, float] = {}
+    for key, value in stats.items():
+        name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{key}" if prefix else str(key))
+        if isinstance(value, dict):
+            gauges.update(flatten_stats(value, name))
+        elif isinstance(value, (bool, int, float)):
+            gauges[name] = float(value)
+    return gauges
+
+
+metrics = Metrics()
+
+# (name, seconds) spans recorded while handling the current request, or None outside one
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("trace", default=None)
+
+
+def record(name: str, seconds: float) -> None:
+    """Record a measured stage duration on the current request and the stage histogram."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+    metrics.observe("stage_seconds", seconds, help="Time spent per request stage", stage=name)
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as stage ``name`` (see :func:`record`)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def server_timing(trace: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value; repeated stage names are summed."""
+    totals: Dict[str, float] = {}
+    for name, seconds in trace:
+        totals[name] = totals.get(name, 0.0) + seconds
+    totals["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+@contextlib.contextmanager
+def _profile(path: str) -> Iterator[None]:
+    """Profile one request into PROFILE_DIR, with pyinstrument when installed, else cProfile.
+
+    cProfile sees every coroutine the event loop runs meanwhile, not only
+    this request's, so prefer pyinstrument under concurrency.
+    """
+    out = Path(os.getenv("PROFILE_DIR", "profiles"))
+    out.mkdir(parents=True, exist_ok=True)
+    stem = out / f"{time.strftime('%Y%m%d-%H%M%S')}-{path.strip('/').replace('/', '_') or 'root'}-{random.getrandbits(16):04x}"
+    try:
+        from pyinstrument import Profiler  # type: ignore
+    except ImportError:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{stem}.prof")
+        return
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        Path(f"{stem}.html").write_text(profiler.output_html())
+
+
+class TimingMiddleware:
+    """ASGI middleware that traces each HTTP request.
+
+    Adds a Server-Timing header listing the spans recorded before the
+    response started, and records request latency per route and status.
+    PROFILE_SAMPLE_RATE > 0 profiles that fraction of requests. Set
+    SERVER_TIMING_ENABLED=0 to drop the header but keep the metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = os.getenv("SERVER_TIMING_ENABLED", "1").lower() not in ("0", "false", "no")
+        self.profile_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trace: List[Tuple[str, float]] = []
+        token = _trace.set(trace)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.header:
+                    timing = server_timing(trace, time.perf_counter() - start)
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", timing.encode()),
+                        (b"timing-allow-origin", b"*"),
+                    ]
+            await send(message)
+
+        profiling = self.profile_rate > 0 and random.random() < self.profile_rate
+        try:
+            with _profile(scope["path"]) if profiling else contextlib.nullcontext():
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            _trace.reset(token)
+            route = scope.get("route")
+            metrics.observe(
+                "http_request_seconds",
+                time.perf_counter() - start,
+                help="HTTP request latency, until the last body chunk was sent",
+                route=getattr(route, "path", "unmatched"),
+                method=scope["method"],
+                status=str(status),
+            )
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from services.fast_extract import DEFAULT_MIN_CONFIDENCE
+
+
+def transcript_cache_key(digest: str) -> str:
+    """Cache key for an upload: its SHA-256 plus every setting that changes the transcript or selections."""
+    settings = "|".join((
+        os.getenv("WHISPER_MODEL_SIZE", "tiny.en"),
+        "fast" if os.getenv("WHISPER_FAST_MODE", "0").lower() in ("1", "true", "yes") else "full",
+        "whisper-large-v3",  # remote fallback model
+        os.getenv("FAST_EXTRACT_ENABLED", "1").lower(),
+        os.getenv("FAST_EXTRACT_MIN_CONFIDENCE", str(DEFAULT_MIN_CONFIDENCE)),
+    ))
+    return f"{digest}|{settings}"
+
+
+class TranscriptCache:
+    """Content-addressed cache of transcripts and per-stage selections for uploaded audio.
+
+    A retried or re-uploaded recording skips Whisper, and when the same
+    stage was extracted before, the extraction call too. Entries are evicted
+    least-recently-used first once their total size exceeds ``max_bytes``.
+    With ``path`` set, entries are also written through to a SQLite file
+    (bounded by ``disk_max_bytes``) and read back on a memory miss, so they
+    survive restarts.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, path: Optional[str] = None, disk_max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.path = path
+        # key -> JSON of {"transcript": str, "selections": {stage: dict}}, so callers never share a dict with the cache
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.transcript_hits = 0
+        self.selection_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts ("
+                "key TEXT PRIMARY KEY, entry TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS transcripts_last_access ON transcripts (last_access)")
+            self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0]
+
+    def lookup(self, key: str, stage: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Return ``(transcript, selections)`` for an upload; either is None when not cached.
+
+        Selections are only returned for a stage that was extracted before.
+        """
+        with self._lock:
+            self.lookups += 1
+            payload = self._entries.get(key)
+            if payload is None and self._conn is not None:
+                row = self._conn.execute("SELECT entry FROM transcripts WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    payload = row[0]
+                    self._conn.execute("UPDATE transcripts SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self.disk_hits += 1
+                    self._store(key, payload)
+            if payload is None:
+                return None, None
+            self._entries.move_to_end(key)
+            self.transcript_hits += 1
+            entry = json.loads(payload)
+            selections = entry["selections"].get(stage)
+            if selections is not None:
+                self.selection_hits += 1
+            return entry["transcript"], selections
+
+    def put(self, key: str, transcript: str, stage: Optional[str] = None, selections: Optional[Dict] = None) -> None:
+        """Record a transcript, and the selections extracted from it for ``stage`` when given."""
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is None and self._conn is not None:
+                # Evicted from memory but still on disk: keep the selections stored for other stages
+                row = self._conn.execute("SELECT entry FROM transcripts WHERE key = ?", (key,)).fetchone()
+                previous = row[0] if row is not None else None
+            entry = json.loads(previous) if previous is not None else None
+            if entry is None or entry["transcript"] != transcript:
+                entry = {"transcript": transcript, "selections": {}}
+            if stage is not None and selections is not None:
+                entry["selections"][stage] = selections
+            payload = json.dumps(entry)
+            self._store(key, payload)
+            if self._conn is not None:
+                stored = self._conn.execute("SELECT size FROM transcripts WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO transcripts (key, entry, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, payload, len(payload), time.time()),
+                )
+                self._disk_bytes += len(payload) - (stored[0] if stored else 0)
+                self._evict_disk()
+
+    def _store(self, key: str, payload: str) -> None:
+        previous = self._entries.get(key)
+        self._bytes += len(key) + len(payload) - (len(key) + len(previous) if previous is not None else 0)
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            evicted, evicted_payload = self._entries.popitem(last=False)
+            self._bytes -= len(evicted) + len(evicted_payload)
+            self.evictions += 1
+
+    def _evict_disk(self) -> None:
+        while self._disk_bytes > self.disk_max_bytes:
+            row = self._conn.execute("SELECT key, size FROM transcripts ORDER BY last_access LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM transcripts WHERE key = ?", (row[0],))
+            self._disk_bytes -= row[1]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "disk_bytes": self._disk_bytes if self._conn is not None else None,
+                "lookups": self.lookups,
+                "transcript_hits": self.transcript_hits,
+                "selection_hits": self.selection_hits,
+                "disk_hits": self.disk_hits,
+                "transcript_hit_rate": round(self.transcript_hits / self.lookups, 4) if self.lookups else 0.0,
+                "selection_hit_rate": round(self.selection_hits / self.lookups, 4) if self.lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+def create_transcript_cache() -> Optional[TranscriptCache]:
+    """Build the transcript cache from TRANSCRIPT_CACHE_* settings, or None when disabled.
+
+    Entries stay in memory only unless TRANSCRIPT_CACHE_PATH names a SQLite file.
+    """
+    if os.getenv("TRANSCRIPT_CACHE_ENABLED", "1").lower() in ("0", "false", "no"):
+        return None
+    return TranscriptCache(
+        max_bytes=int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        path=os.getenv("TRANSCRIPT_CACHE_PATH") or None,
+        disk_max_bytes=int(os.getenv("TRANSCRIPT_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024))),
+    )
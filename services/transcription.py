@@ -1,17 +1,68 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import math
 import tempfile
+import time
 from pathlib import Path
 import os
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 from fastapi import HTTPException
 
-from core.config import GROQ_API_KEY
+from services.backend_router import CircuitOpenError, get_backend_router
+from services.fast_extract import DEFAULT_MIN_CONFIDENCE, extract_fields_locally, extraction_stats
+from services.llm_client import get_llm_client
+from services.telemetry import record, span
+from services.transcription_executor import TranscriptionExecutor, get_transcription_executor
+from services.transcription_worker import get_worker_client
 
 
 _whisper_model = None
+# Generous upper bound on Whisper tokens per second of speech, for the decode budget
+MAX_TOKENS_PER_SECOND = 6
+
+
+def _fast_mode_enabled() -> bool:
+    """WHISPER_FAST_MODE=1 selects int8-quantized linear layers plus greedy English-only decoding."""
+    return os.getenv("WHISPER_FAST_MODE", "0").lower() in ("1", "true", "yes")
+
+
+def quantize_whisper_model(model):
+    """Apply int8 dynamic quantization to every linear layer of a CPU Whisper model.
+
+    Whisper's own Linear subclass only adds a dtype cast that is a no-op in
+    fp32, so those modules are downgraded to plain nn.Linear first; otherwise
+    quantize_dynamic would skip them.
+    """
+    import torch  # type: ignore
+    import whisper  # type: ignore
+
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def transcribe_options(model, fast: Optional[bool] = None) -> Dict:
+    """Keyword arguments for ``model.transcribe``.
+
+    fp16 is only requested on CUDA, which avoids Whisper's fp16-on-CPU
+    warning and fallback. Fast mode decodes greedily at temperature 0 with no
+    fallback ladder and pins the language to English.
+    """
+    fast = _fast_mode_enabled() if fast is None else fast
+    options: Dict = {"fp16": next(model.parameters()).device.type == "cuda"}
+    if fast:
+        options.update(
+            language="en",
+            temperature=0.0,
+            beam_size=None,
+            best_of=None,
+            condition_on_previous_text=False,
+        )
+    return options
 
 
 def _get_whisper_model():
@@ -56,81 +107,281 @@ def _get_whisper_model():
                     raise HTTPException(status_code=500, detail="Could not download Whisper model due to SSL issues")
             else:
                 raise HTTPException(status_code=500, detail=f"Model loading failed: {ssl_exc}")
+
+        if _fast_mode_enabled():
+            _whisper_model = quantize_whisper_model(_whisper_model.cpu())
     return _whisper_model
 
 
-def transcribe_audio_to_text(file_path: Path) -> str:
-    """Transcribe an audio file to text using OpenAI Whisper or Groq API fallback.
+def decode_batch(model, audios: List) -> List[str]:
+    """Transcribe several short clips with one batched encoder/decoder pass.
+
+    Each clip (file path or 16 kHz float32 array) is padded or trimmed to
+    Whisper's 30s window and the log-mel spectrograms are stacked into one
+    batch. Clips longer than the window keep the sequential
+    ``model.transcribe`` path so nothing is cut off.
+    """
+    import torch  # type: ignore
+    import whisper  # type: ignore
+
+    audios = [whisper.load_audio(audio) if isinstance(audio, str) else audio for audio in audios]
+    texts: List[Optional[str]] = [None] * len(audios)
+    mels, indices = [], []
+    for i, audio in enumerate(audios):
+        if audio.shape[-1] > whisper.audio.N_SAMPLES:
+            texts[i] = model.transcribe(audio, **transcribe_options(model))["text"].strip()
+            continue
+        mels.append(whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels))
+        indices.append(i)
+
+    if mels:
+        # Cap decoding steps by the longest clip's duration; a short answer cannot need 224 tokens
+        longest = max(audios[i].shape[-1] for i in indices) / whisper.audio.SAMPLE_RATE
+        options = whisper.DecodingOptions(
+            language="en" if _fast_mode_enabled() or not model.is_multilingual else None,
+            fp16=model.device.type == "cuda",
+            without_timestamps=True,
+            sample_len=min(model.dims.n_text_ctx // 2, int(MAX_TOKENS_PER_SECOND * longest) + 16),
+        )
+        results = whisper.decode(model, torch.stack(mels).to(model.device), options)
+        for i, result in zip(indices, results):
+            texts[i] = result.text.strip()
+    return texts  # type: ignore[return-value]
+
+
+def short_clip_samples() -> int:
+    """Clips up to WHISPER_SHORT_CLIP_SECONDS (default 8) take the single-pass decode in transcribe_clip."""
+    return int(float(os.getenv("WHISPER_SHORT_CLIP_SECONDS", "8")) * SAMPLE_RATE)
+
+
+def transcribe_clip(model, audio) -> str:
+    """Transcribe one file path or 16 kHz float32 array.
+
+    Short arrays are decoded in one pass with a duration-capped token
+    budget (see decode_batch). This skips ``model.transcribe``'s
+    sliding-window loop, timestamp decoding and temperature fallback, which
+    a few seconds of speech do not need.
+    """
+    if not isinstance(audio, str) and audio.shape[-1] <= short_clip_samples():
+        return decode_batch(model, [audio])[0]
+    return model.transcribe(audio, **transcribe_options(model))["text"].strip()
+
+
+class TranscriptionBatcher:
+    """Micro-batching scheduler in front of the transcription executor.
+
+    Clips are admitted individually (so load shedding still applies per
+    request), held for up to ``window_ms`` or until ``max_batch`` have
+    arrived, then decoded together in a single worker call. Each caller gets
+    back the text for its own clip.
+    """
+
+    def __init__(self, executor: TranscriptionExecutor, window_ms: float, max_batch: int):
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._batch: List[Tuple[object, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+
+    async def transcribe(self, audio) -> str:
+        self.executor.admit()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append((audio, future))
+        if len(self._batch) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._batch = self._batch, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[object, asyncio.Future]]) -> None:
+        try:
+            texts = await self.executor.run_admitted([audio for audio, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+
+_batcher: Optional[TranscriptionBatcher] = None
+
+
+def transcription_mode() -> str:
+    """Where local Whisper runs, from TRANSCRIBE_MODE.
+
+    "pool" (default) spawns warmed worker processes from this process;
+    "worker" sends clips to a separately launched
+    ``python -m services.transcription_worker`` so this process never
+    imports torch.
+    """
+    mode = os.getenv("TRANSCRIBE_MODE", "pool").lower()
+    return mode if mode in ("pool", "worker") else "pool"
+
+
+def get_transcription_backend():
+    """The executor running local Whisper, or the client of the separate worker."""
+    if transcription_mode() == "worker":
+        return get_worker_client()
+    return get_transcription_executor()
+
+
+async def local_transcription_status() -> Dict:
+    """Whether local Whisper can take clips now, for the readiness probe."""
+    if os.getenv("TRANSCRIBE_ROUTING", "auto").lower() == "remote":
+        return {"mode": "remote", "ready": False, "detail": "Local transcription is disabled (TRANSCRIBE_ROUTING=remote)"}
+    backend = get_transcription_backend()
+    if transcription_mode() == "worker":
+        status = await backend.status()
+        return {**status, "mode": "worker", "socket": backend.path}
+    return {"mode": "pool", "ready": backend.ready, "workers": backend.workers, "warmup_error": backend.warmup_error}
+
+
+def get_local_transcriber():
+    """Return the worker client in worker mode (the worker batches on its side),
+    else the micro-batcher when TRANSCRIBE_BATCH_WINDOW_MS > 0, else the plain executor."""
+    global _batcher
+    if transcription_mode() == "worker":
+        return get_worker_client()
+    window_ms = float(os.getenv("TRANSCRIBE_BATCH_WINDOW_MS", "0"))
+    if window_ms <= 0:
+        return get_transcription_executor()
+    if _batcher is None:
+        _batcher = TranscriptionBatcher(
+            get_transcription_executor(),
+            window_ms=window_ms,
+            max_batch=int(os.getenv("TRANSCRIBE_MAX_BATCH", "8")),
+        )
+    return _batcher
+
+
+def prefer_remote_transcription() -> bool:
+    """Whether a new clip should skip local Whisper and go straight to the remote API.
+
+    TRANSCRIBE_ROUTING=local|remote pins the choice. In the default "auto"
+    mode the remote API is used while its circuit is closed and local
+    Whisper is unhealthy, has TRANSCRIBE_REMOTE_QUEUE_DEPTH clips queued, or
+    would take longer than the remote p95 given its current queue.
+    """
+    mode = os.getenv("TRANSCRIBE_ROUTING", "auto").lower()
+    if mode in ("local", "remote"):
+        return mode == "remote"
+    router = get_backend_router()
+    remote, local = router.backend("groq_transcribe"), router.backend("local_whisper")
+    if not remote.available:
+        return False
+    if not local.available:
+        return True
+    executor = get_transcription_backend()
+    if executor.queue_depth >= int(os.getenv("TRANSCRIBE_REMOTE_QUEUE_DEPTH", str(executor.workers))):
+        return True
+    if len(local.latency) and len(remote.latency):
+        expected_local = local.latency.percentile(0.5) * (executor.queue_depth // executor.workers + 1)
+        return expected_local > remote.latency.percentile(0.95)
+    return False
+
+
+async def transcribe_audio_to_text(audio, raw: Optional[bytes] = None, filename: str = "audio") -> str:
+    """Transcribe audio to text using OpenAI Whisper or Groq API fallback.
 
     Args:
-        file_path: path to audio file
+        audio: path to an audio file, a 16 kHz float32 array from decode_upload,
+            or None when local decoding failed (goes straight to the fallback)
+        raw: original encoded bytes, sent to the fallback API when given
+        filename: name reported to the fallback API
     Returns:
         transcript string (may be empty if nothing recognized)
     """
-    # Try local Whisper first
+    # Imported here because services.vad takes SAMPLE_RATE from this module
+    from services.vad import trim_silence, vad_enabled
+
+    if raw is None and isinstance(audio, (str, Path)):
+        raw, filename = Path(audio).read_bytes(), Path(audio).name
+    if audio is not None and not isinstance(audio, (str, Path)) and vad_enabled():
+        # Silence is rejected before any model runs, local or remote
+        with span("vad"):
+            audio = trim_silence(audio)
+        if audio is None:
+            raise HTTPException(status_code=422, detail="No speech detected")
+    if raw is not None and (audio is None or prefer_remote_transcription()):
+        return await _transcribe_with_groq_api(raw, filename)
+
+    # Local Whisper runs in a worker process so the event loop stays free
     try:
-        model = _get_whisper_model()
-        result = model.transcribe(str(file_path))
-        return result["text"].strip()
+        if audio is None:
+            raise RuntimeError("audio could not be decoded locally")
+        return await transcribe_locally(audio)
     except HTTPException:
-        raise
+        if raw is None or not get_backend_router().backend("groq_transcribe").available:
+            raise
+        return await _transcribe_with_groq_api(raw, filename)
     except Exception as exc:
         # If local Whisper fails (e.g., in production), try Groq API fallback
         try:
-            return _transcribe_with_groq_api(file_path)
+            return await _transcribe_with_groq_api(raw, filename)
         except Exception:
             raise HTTPException(status_code=500, detail=f"Transcription failed: {exc}")
 
 
-def _transcribe_with_groq_api(file_path: Path) -> str:
+async def transcribe_locally(audio) -> str:
+    """Run local Whisper on a file path or 16 kHz float32 array, through the local_whisper circuit.
+
+    Raises HTTPException(503) when the local queue is full and the worker's
+    error (or CircuitOpenError) otherwise; there is no remote fallback here.
+    """
+    local = get_local_transcriber()
+    with span("whisper"):
+        return await get_backend_router().call(
+            "local_whisper",
+            lambda: local.transcribe(str(audio) if isinstance(audio, Path) else audio),
+            # Load shedding (503) says nothing about Whisper's health
+            ignore=(HTTPException,),
+        )
+
+
+async def _transcribe_with_groq_api(audio: Optional[bytes], filename: str = "audio") -> str:
     """Fallback transcription using Groq API."""
-    import requests
-    
     try:
-        with open(file_path, 'rb') as audio_file:
-            files = {'file': audio_file}
-            headers = {'Authorization': f'Bearer {GROQ_API_KEY}'}
-            
-            response = requests.post(
-                'https://api.groq.com/openai/v1/audio/transcriptions',
-                headers=headers,
-                files=files,
-                data={'model': 'whisper-large-v3'},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json().get('text', '').strip()
-            else:
-                raise Exception(f"Groq API error: {response.status_code}")
-                
+        if not audio:
+            raise ValueError("no audio bytes available")
+        with span("transcribe_remote"):
+            return await get_llm_client().transcribe(audio, filename=filename)
+    except CircuitOpenError as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="Transcription is temporarily unavailable, please retry shortly",
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_in)))},
+        )
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Groq transcription failed: {exc}")
 
 
-def _call_groq_json(system_prompt: str, user_prompt: str) -> Dict:
+async def _call_groq_json(system_prompt: str, user_prompt: str) -> Dict:
     """Call Groq LLM and expect a compact JSON object in the response."""
-    import requests
-
     try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "llama3-8b-8192",
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                "max_tokens": 400,
-                "temperature": 0.0,
-            },
-            timeout=30,
+        content = await get_llm_client().chat(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            max_tokens=400,
+            temperature=0.0,
         )
-        content = response.json()["choices"][0]["message"]["content"].strip()
+        content = content.strip()
         # Extract JSON from content (model should return pure JSON)
         # Fallback: find first '{' ... last '}'
         try:
@@ -173,21 +424,42 @@ def _schema_for_stage(stage: str) -> Tuple[str, List[str]]:
     raise HTTPException(status_code=400, detail=f"Unsupported stage: {stage}")
 
 
-def extract_fields_from_transcript(stage: str, transcript: str) -> Dict:
-    """Use Groq LLM to extract structured fields from transcript for the given stage.
+def _is_empty(value) -> bool:
+    return value is None or value == "" or (isinstance(value, list) and len(value) == 0)
+
 
-    Returns only the selections dictionary keyed to the current stage.
+async def extract_fields_from_transcript(stage: str, transcript: str) -> Dict:
+    """Extract structured fields from transcript for the given stage.
+
+    The local rule-based extractor runs first. Groq is only called when
+    required fields are still missing or the local confidence is below
+    FAST_EXTRACT_MIN_CONFIDENCE, and local values fill any gaps the LLM
+    leaves. Returns only the selections dictionary keyed to the current stage.
     """
     schema, _ = _schema_for_stage(stage)
+    local: Dict = {}
+    if os.getenv("FAST_EXTRACT_ENABLED", "1").lower() not in ("0", "false", "no"):
+        with span("extract_local"):
+            local, confidence = extract_fields_locally(stage, transcript)
+        min_confidence = float(os.getenv("FAST_EXTRACT_MIN_CONFIDENCE", str(DEFAULT_MIN_CONFIDENCE)))
+        if not compute_missing(stage, local) and confidence >= min_confidence:
+            extraction_stats.local += 1
+            return local
+
+    extraction_stats.llm += 1
     system = (
         "You extract structured fields from short spoken transcripts. Return ONLY minified JSON matching the schema. "
         "Normalize units: height in centimeters, weight in kilograms. If unknown, use null or an empty array. "
         "If the user says 'I am 5 feet 10 inches tall', convert to 177.8 cm."
     )
     user = f"Schema: {schema}\nTranscript: {transcript}"
-    data = _call_groq_json(system, user)
+    with span("extract_llm"):
+        data = await _call_groq_json(system, user)
     if not isinstance(data, dict):
         raise HTTPException(status_code=500, detail="Invalid extraction payload")
+    for field, value in local.items():
+        if _is_empty(data.get(field)) and not _is_empty(value):
+            data[field] = value
     return data
 
 
@@ -196,21 +468,105 @@ def compute_missing(stage: str, selections: Dict) -> List[str]:
     _, required = _schema_for_stage(stage)
     missing: List[str] = []
     for field in required:
-        value = selections.get(field)
-        if value is None or value == "" or (isinstance(value, list) and len(value) == 0):
+        if _is_empty(selections.get(field)):
             missing.append(field)
     return missing
 
 
-def save_upload_to_temp(upload) -> Path:
-    """Persist an UploadFile-like object to a temporary file and return its path."""
-    suffix = ""
-    if hasattr(upload, "filename") and upload.filename:
-        suffix = "." + upload.filename.split(".")[-1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        content = upload.file.read()
-        tmp.write(content)
-        tmp.flush()
-        return Path(tmp.name)
+SAMPLE_RATE = 16000
+UPLOAD_CHUNK_BYTES = 64 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+_FFMPEG_ARGS = ["-nostdin", "-loglevel", "error", "-threads", "0"]
+_FFMPEG_OUTPUT = ["-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+
+
+def _pcm_to_float32(pcm: bytes):
+    import numpy as np
+
+    return np.frombuffer(pcm, np.int16).flatten().astype(np.float32) / 32768.0
 
 
+async def decode_upload(upload, max_bytes: int = MAX_UPLOAD_BYTES, hasher=None):
+    """Stream an UploadFile into ffmpeg and return ``(samples, raw)``.
+
+    Chunks are piped into ffmpeg's stdin as they are read, with no temp file,
+    and the 16 kHz mono float32 samples come back from stdout. Whisper
+    accepts that array directly. ``raw`` holds the encoded bytes for the
+    remote fallback. ``samples`` is None when ffmpeg is unavailable or cannot
+    decode the stream. Raises HTTPException(413) once more than ``max_bytes``
+    have been read. A ``hasher`` (e.g. ``hashlib.sha256()``) is fed every
+    chunk as it is read, so the upload's digest costs no second pass.
+    """
+    chunks: List[bytes] = []
+    read_seconds = 0.0
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", *_FFMPEG_ARGS, "-i", "pipe:0", *_FFMPEG_OUTPUT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        proc = None
+
+    async def feed() -> None:
+        nonlocal read_seconds
+        total = 0
+        while True:
+            started = time.perf_counter()
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            read_seconds += time.perf_counter() - started
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Audio upload exceeds {max_bytes} bytes")
+            chunks.append(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+            if proc is not None and proc.returncode is None:
+                try:
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    # ffmpeg gave up on the stream; keep reading so the fallbacks get all bytes
+                    pass
+        if proc is not None and not proc.stdin.is_closing():
+            proc.stdin.close()
+        record("upload_read", read_seconds)
+
+    if proc is None:
+        await feed()
+        return None, b"".join(chunks)
+
+    try:
+        _, pcm, _ = await asyncio.gather(feed(), proc.stdout.read(), proc.stderr.read())
+        await proc.wait()
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+
+    raw = b"".join(chunks)
+    if proc.returncode == 0 and pcm:
+        return _pcm_to_float32(pcm), raw
+    # Containers that need seeking (e.g. mp4 with a trailing moov atom) cannot
+    # be demuxed from a pipe; retry from a seekable temp file
+    return await _decode_from_temp_file(raw, getattr(upload, "filename", None)), raw
+
+
+async def _decode_from_temp_file(raw: bytes, filename: Optional[str]):
+    suffix = "." + filename.split(".")[-1] if filename and "." in filename else ""
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        tmp.write(raw)
+        tmp.flush()
+        proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", *_FFMPEG_ARGS, "-i", tmp.name, *_FFMPEG_OUTPUT,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        pcm, _ = await proc.communicate()
+    if proc.returncode != 0 or not pcm:
+        return None
+    return _pcm_to_float32(pcm)
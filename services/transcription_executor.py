@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+
+def _init_worker(threads: int) -> None:
+    """Process-pool initializer: pin torch threads and warm this worker's model."""
+    from services.transcription import _get_whisper_model
+
+    try:
+        import torch  # type: ignore
+
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    try:
+        _get_whisper_model()
+    except Exception as exc:
+        # Leave the worker alive; each job reports the failure so callers can fall back
+        print(f"[transcription-worker {os.getpid()}] Whisper warmup failed: {exc}")
+
+
+def _check_worker() -> None:
+    """Raise RuntimeError in a pool worker whose model failed to load."""
+    from services.transcription import _get_whisper_model
+
+    try:
+        _get_whisper_model()
+    except HTTPException as exc:
+        raise RuntimeError(exc.detail) from None
+
+
+def _transcribe_in_worker(audio) -> Tuple[str, float]:
+    """Run Whisper in a pool worker. Returns (text, service seconds).
+
+    Errors are re-raised as RuntimeError because HTTPException does not
+    survive pickling back to the parent.
+    """
+    from services.transcription import _get_whisper_model, transcribe_clip
+
+    start = time.perf_counter()
+    try:
+        text = transcribe_clip(_get_whisper_model(), audio)
+    except HTTPException as exc:
+        raise RuntimeError(exc.detail) from None
+    return text, time.perf_counter() - start
+
+
+def _transcribe_batch_in_worker(audios: List) -> Tuple[List[str], float]:
+    """Decode several short clips in one batched encoder/decoder pass in a pool worker."""
+    from services.transcription import _get_whisper_model, decode_batch
+
+    start = time.perf_counter()
+    try:
+        texts = decode_batch(_get_whisper_model(), audios)
+    except HTTPException as exc:
+        raise RuntimeError(exc.detail) from None
+    return texts, time.perf_counter() - start
+
+
+def _percentile(samples: Deque[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class TranscriptionExecutor:
+    """Runs Whisper inference in a pool of warmed worker processes.
+
+    At most ``workers + max_queue`` clips are admitted at once; beyond that
+    requests are shed with a 503 and a Retry-After estimate instead of
+    queueing without bound. Service times are per worker call, which covers
+    a whole batch when clips are micro-batched.
+    """
+
+    def __init__(self, workers: int, max_queue: int, threads_per_worker: int = 1, window: int = 512):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.threads_per_worker = threads_per_worker
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.ready = False
+        self.warmup_error: Optional[str] = None
+        self._service_times: Deque[float] = deque(maxlen=window)
+        self._queue_waits: Deque[float] = deque(maxlen=window)
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.threads_per_worker,),
+            )
+        return self._pool
+
+    def start(self) -> None:
+        """Spawn every worker now so model loading happens before the first request.
+
+        ``ready`` turns true once a worker reports a loaded model.
+        """
+        for _ in range(self.workers):
+            self.pool.submit(_check_worker).add_done_callback(self._warmed)
+
+    def _warmed(self, future) -> None:
+        try:
+            future.result()
+        except Exception as exc:
+            self.warmup_error = str(exc)
+        else:
+            self.ready = True
+            self.warmup_error = None
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._pending - self.workers)
+
+    def retry_after(self) -> int:
+        service = _percentile(self._service_times, 0.5) or 1.0
+        return max(1, math.ceil(service * (self.queue_depth + 1) / self.workers))
+
+    def admit(self, clips: int = 1) -> None:
+        """Reserve queue slots for ``clips`` clips, or raise HTTPException(503) when full.
+
+        Every admitted clip must later go through ``run_admitted``.
+        """
+        if self._pending + clips > self.workers + self.max_queue:
+            self.rejected += clips
+            raise HTTPException(
+                status_code=503,
+                detail="Transcription is busy, please retry shortly",
+                headers={"Retry-After": str(self.retry_after())},
+            )
+        self._pending += clips
+        self.submitted += clips
+
+    async def transcribe(self, audio) -> str:
+        """Transcribe a file path or 16 kHz float32 array in a worker process.
+
+        Raises HTTPException(503) when the admission queue is full and
+        RuntimeError when inference fails.
+        """
+        self.admit()
+        texts = await self.run_admitted([audio])
+        return texts[0]
+
+    async def run_admitted(self, audios: List) -> List[str]:
+        """Run already-admitted clips in one worker call (batched when more than one).
+
+        The slots are released when the worker call finishes, not when the
+        caller stops waiting: a cancelled caller cannot stop a job a worker
+        has already started.
+        """
+        start = time.perf_counter()
+        pool = self.pool
+        loop = asyncio.get_running_loop()
+        job = None
+        try:
+            if len(audios) == 1:
+                job = pool.submit(_transcribe_in_worker, audios[0])
+            else:
+                job = pool.submit(_transcribe_batch_in_worker, audios)
+            job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, len(audios)))
+            result, service_time = await asyncio.wrap_future(job)
+            texts = [result] if len(audios) == 1 else result
+        except BrokenProcessPool as exc:
+            self.failed += len(audios)
+            if self._pool is pool:
+                # Respawn and re-warm once, however many clips were in flight
+                self._pool = None
+                self.ready = False
+                self.start()
+            raise RuntimeError(f"Transcription worker crashed: {exc}") from exc
+        except Exception:
+            self.failed += len(audios)
+            raise
+        finally:
+            if job is None:
+                self._pending -= len(audios)
+
+        self.completed += len(audios)
+        self.batches += 1
+        self._service_times.append(service_time)
+        self._queue_waits.append(max(0.0, time.perf_counter() - start - service_time))
+        return texts
+
+    def _release(self, clips: int) -> None:
+        self._pending -= clips
+
+    def stats(self) -> Dict:
+        return {
+            "mode": "pool",
+            "ready": self.ready,
+            "workers": self.workers,
+            "in_flight": self._pending,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_batch_size": round(self.completed / self.batches, 2) if self.batches else 0.0,
+            "service_time_p50_ms": round(_percentile(self._service_times, 0.5) * 1000, 1),
+            "service_time_p95_ms": round(_percentile(self._service_times, 0.95) * 1000, 1),
+            "queue_wait_p50_ms": round(_percentile(self._queue_waits, 0.5) * 1000, 1),
+            "queue_wait_p95_ms": round(_percentile(self._queue_waits, 0.95) * 1000, 1),
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_executor: Optional[TranscriptionExecutor] = None
+
+
+def get_transcription_executor() -> TranscriptionExecutor:
+    """Return the process-wide transcription executor, sized from TRANSCRIBE_* settings.
+
+    TRANSCRIBE_WORKERS defaults to the available cores divided among the
+    WEB_CONCURRENCY web processes (at least 1). Each worker holds its own
+    Whisper model, and every web process has its own pool, so the total is
+    WEB_CONCURRENCY x TRANSCRIBE_WORKERS model copies. Set TRANSCRIBE_WORKERS
+    lower on hosts without the memory for that, or run one shared pool with
+    TRANSCRIBE_MODE=worker (services/transcription_worker.py).
+    """
+    global _executor
+    if _executor is None:
+        default_workers = max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1")))
+        workers = int(os.getenv("TRANSCRIBE_WORKERS", str(default_workers)))
+        _executor = TranscriptionExecutor(
+            workers=workers,
+            max_queue=int(os.getenv("TRANSCRIBE_MAX_QUEUE", str(2 * workers))),
+            threads_per_worker=int(os.getenv("TRANSCRIBE_THREADS_PER_WORKER", "1")),
+        )
+    return _executor
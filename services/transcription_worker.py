@@ -0,0 +1,235 @@
+"""Standalone transcription worker, so web processes never import torch or Whisper.
+
+Start it next to the web processes and point both at the same socket:
+
+    python -m services.transcription_worker --socket /tmp/mylo-transcribe.sock
+    TRANSCRIBE_MODE=worker TRANSCRIBE_WORKER_SOCKET=/tmp/mylo-transcribe.sock uvicorn app:app
+
+The worker owns the warmed Whisper pool, so TRANSCRIBE_WORKERS,
+TRANSCRIBE_MAX_QUEUE, TRANSCRIBE_BATCH_WINDOW_MS and WHISPER_* are read
+here, and every web process shares it.
+
+Each connection carries one request and one reply. Both are a 4-byte
+big-endian length followed by a JSON header. A transcription request's
+header is followed by ``samples`` little-endian float32 values at 16 kHz,
+unless it names a local file ``path`` instead.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import struct
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+DEFAULT_SOCKET = "/tmp/mylo-transcribe.sock"
+MAX_HEADER_BYTES = 64 * 1024
+
+_length = struct.Struct(">I")
+
+
+def _frame(header: Dict) -> bytes:
+    body = json.dumps(header).encode()
+    return _length.pack(len(body)) + body
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Dict:
+    (size,) = _length.unpack(await reader.readexactly(_length.size))
+    if size > MAX_HEADER_BYTES:
+        raise ValueError(f"header of {size} bytes is too large")
+    return json.loads(await reader.readexactly(size))
+
+
+class TranscriptionWorkerClient:
+    """Sends clips to a transcription worker over its Unix socket.
+
+    Offers the parts of TranscriptionExecutor the web process uses
+    (``transcribe``, ``queue_depth``, ``workers``, ``stats``), so routing and
+    load shedding work unchanged. The worker's 503s are re-raised as
+    HTTPException; an unreachable or failing worker raises RuntimeError,
+    which trips the local_whisper circuit and falls back to the remote API.
+    """
+
+    def __init__(self, path: str, timeout: float = 60.0, connect_timeout: float = 1.0):
+        self.path = path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.queue_depth = 0
+        self.workers = 1
+        self.ready = False
+        self.requests = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    async def _request(self, header: Dict, payload: bytes = b"") -> Dict:
+        reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(self.path), self.connect_timeout)
+        try:
+            writer.write(_frame(header) + payload)
+            await writer.drain()
+            reply = await asyncio.wait_for(_read_frame(reader), self.timeout)
+        finally:
+            writer.close()
+        self.queue_depth = reply.get("queue_depth", 0)
+        self.workers = reply.get("workers") or 1
+        self.ready = reply.get("ready", self.ready)
+        return reply
+
+    async def transcribe(self, audio) -> str:
+        """Transcribe a file path or 16 kHz float32 array in the worker."""
+        if isinstance(audio, str):
+            header, payload = {"op": "transcribe", "path": audio}, b""
+        else:
+            import numpy as np
+
+            samples = np.asarray(audio, dtype="<f4")
+            header, payload = {"op": "transcribe", "samples": int(samples.size)}, samples.tobytes()
+        self.requests += 1
+        try:
+            reply = await self._request(header, payload)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+            self.failed += 1
+            self.ready = False
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            raise RuntimeError(f"Transcription worker unavailable: {self.last_error}") from exc
+
+        if "error" not in reply:
+            self.completed += 1
+            return reply["text"]
+        if reply.get("status") == 503:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503, detail=reply["error"], headers={"Retry-After": str(reply.get("retry_after") or 1)}
+            )
+        self.failed += 1
+        self.last_error = reply["error"]
+        raise RuntimeError(reply["error"])
+
+    async def status(self) -> Dict:
+        """The worker's own readiness and pool stats, or why it cannot be reached."""
+        try:
+            return await self._request({"op": "status"})
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+            self.ready = False
+            return {"ready": False, "error": f"{type(exc).__name__}: {exc}"}
+
+    def start(self) -> None:
+        """Nothing to spawn; the worker is launched separately."""
+
+    def shutdown(self) -> None:
+        pass
+
+    def stats(self) -> Dict:
+        return {
+            "mode": "worker",
+            "socket": self.path,
+            "ready": self.ready,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "requests": self.requests,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+_client: Optional[TranscriptionWorkerClient] = None
+
+
+def get_worker_client() -> TranscriptionWorkerClient:
+    """Return the process-wide client for the worker at TRANSCRIBE_WORKER_SOCKET."""
+    global _client
+    if _client is None:
+        _client = TranscriptionWorkerClient(
+            os.getenv("TRANSCRIBE_WORKER_SOCKET", DEFAULT_SOCKET),
+            timeout=float(os.getenv("TRANSCRIBE_WORKER_TIMEOUT", "60")),
+        )
+    return _client
+
+
+class TranscriptionWorker:
+    """Serves transcription requests from web processes through the local Whisper pool."""
+
+    def __init__(self, path: str):
+        # Imported here: these pull in the pool that loads torch, which the web side never needs
+        from services.transcription import get_local_transcriber
+        from services.transcription_executor import get_transcription_executor
+
+        self.path = path
+        self.executor = get_transcription_executor()
+        self.transcriber = get_local_transcriber()
+        self.started = time.monotonic()
+        self.connections = 0
+
+    def _load(self) -> Dict:
+        return {"ready": self.executor.ready, "queue_depth": self.executor.queue_depth, "workers": self.executor.workers}
+
+    async def _transcribe(self, header: Dict, reader: asyncio.StreamReader) -> Dict:
+        if "path" in header:
+            audio = header["path"]
+        else:
+            import numpy as np
+
+            audio = np.frombuffer(await reader.readexactly(4 * int(header["samples"])), dtype="<f4")
+        try:
+            return {"text": await self.transcriber.transcribe(audio)}
+        except HTTPException as exc:
+            retry_after = (exc.headers or {}).get("Retry-After")
+            return {"error": exc.detail, "status": exc.status_code, "retry_after": retry_after}
+        except Exception as exc:
+            return {"error": str(exc), "status": 500}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            header = await _read_frame(reader)
+            if header.get("op") == "status":
+                reply: Dict = {
+                    **self.executor.stats(),
+                    "warmup_error": self.executor.warmup_error,
+                    "uptime_seconds": round(time.monotonic() - self.started, 1),
+                }
+            else:
+                reply = await self._transcribe(header, reader)
+            writer.write(_frame({**reply, **self._load()}))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # the web process went away or sent garbage; nothing to answer
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket from a previous run
+        self.executor.start()
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        print(f"[transcription-worker] listening on {self.path} with {self.executor.workers} Whisper workers")
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        async with server:
+            await stop.wait()
+        self.executor.shutdown()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def main(argv: Optional[Tuple[str, ...]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve local Whisper transcription to web processes over a Unix socket.")
+    parser.add_argument("--socket", default=os.getenv("TRANSCRIBE_WORKER_SOCKET", DEFAULT_SOCKET))
+    args = parser.parse_args(argv)
+    # The worker runs the pool itself, even when it shares the web processes' environment
+    os.environ["TRANSCRIBE_MODE"] = "pool"
+    asyncio.run(TranscriptionWorker(args.socket).serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+from typing import Dict, Optional
+
+from services.transcription import SAMPLE_RATE
+
+FRAME = SAMPLE_RATE * 30 // 1000  # 30 ms
+
+
+def vad_enabled() -> bool:
+    return os.getenv("VAD_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def find_speech(
+    samples,
+    min_dbfs: float = -50.0,
+    margin_db: float = 10.0,
+    min_speech_seconds: float = 0.15,
+    voiced_dbfs: float = -30.0,
+):
+    """Return ``(start, end)`` sample indices around the speech in a 16 kHz float32 clip, or None.
+
+    A frame counts as voiced when its RMS level is ``margin_db`` above the
+    clip's noise floor (10th percentile of frame levels) and above
+    ``min_dbfs``. Clips with less than ``min_speech_seconds`` of voiced
+    frames have no speech. Steady background noise never rises above its
+    own floor, so it is rejected. When the floor is below ``voiced_dbfs``,
+    frames louder than that also count, which keeps a clip that is voiced
+    throughout (trimmed tightly around the speech) from being judged
+    against its own level. Louder noise (a fan, a car) gets no such
+    shortcut.
+    """
+    import numpy as np
+
+    frames = len(samples) // FRAME
+    if frames == 0:
+        return None
+    power = np.square(samples[: frames * FRAME].reshape(frames, FRAME), dtype=np.float32).mean(axis=1)
+    levels = 10 * np.log10(power + 1e-12)
+    floor = float(np.percentile(levels, 10))
+    threshold = max(min_dbfs, floor + margin_db)
+    if floor < voiced_dbfs:
+        threshold = min(voiced_dbfs, threshold)
+    voiced = np.flatnonzero(levels > threshold)
+    if len(voiced) * FRAME < min_speech_seconds * SAMPLE_RATE:
+        return None
+    return int(voiced[0]) * FRAME, (int(voiced[-1]) + 1) * FRAME
+
+
+class VoiceActivityStats:
+    """Counts clips checked before Whisper, how many were rejected as silent and the audio trimmed off."""
+
+    def __init__(self):
+        self.clips = 0
+        self.rejected = 0
+        self.input_seconds = 0.0
+        self.trimmed_seconds = 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "clips": self.clips,
+            "rejected": self.rejected,
+            "input_seconds": round(self.input_seconds, 1),
+            "trimmed_seconds": round(self.trimmed_seconds, 1),
+            "trimmed_rate": round(self.trimmed_seconds / self.input_seconds, 4) if self.input_seconds else 0.0,
+        }
+
+
+vad_stats = VoiceActivityStats()
+
+
+def trim_silence(samples, pad_seconds: Optional[float] = None):
+    """Cut leading and trailing silence from a 16 kHz float32 clip, keeping ``pad_seconds`` around the speech.
+
+    Returns None when the clip has no speech. Thresholds come from
+    VAD_MIN_DBFS and VAD_PAD_SECONDS.
+    """
+    pad = int(SAMPLE_RATE * (float(os.getenv("VAD_PAD_SECONDS", "0.25")) if pad_seconds is None else pad_seconds))
+    vad_stats.clips += 1
+    vad_stats.input_seconds += len(samples) / SAMPLE_RATE
+    speech = find_speech(samples, min_dbfs=float(os.getenv("VAD_MIN_DBFS", "-50")))
+    if speech is None:
+        vad_stats.rejected += 1
+        return None
+    start, end = max(0, speech[0] - pad), min(len(samples), speech[1] + pad)
+    vad_stats.trimmed_seconds += (len(samples) - (end - start)) / SAMPLE_RATE
+    return samples[start:end]
@@ -0,0 +1,20 @@
+import pytest
+
+from models.schemas import Basics, ChatStage, ConversationState, GoalBlock, PrefsConstraints
+
+
+@pytest.fixture
+def final_state() -> ConversationState:
+    """A session that has answered every stage, without a plan yet."""
+    return ConversationState(
+        session_id="0b5c6f2e-8f43-4d0e-9a57-3c1f0d6b2a11",
+        stage=ChatStage.FINAL,
+        basics=Basics(name="Sam", age=34, gender="female", height_cm=167.5, weight_kg=61.2, activity_level="lightly_active"),
+        goals_block=GoalBlock(goals=["weight_loss", "strength"]),
+        prefs=PrefsConstraints(
+            injuries=["bad knee"],
+            equipment=["dumbbells", "kettlebell"],
+            preferred_workout_types=["strength_training"],
+            preferred_training_times=["morning"],
+        ),
+    )
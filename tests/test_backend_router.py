@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services.backend_router import BackendRouter, CircuitOpenError
+
+
+def _status_error(status: int, headers=None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://upstream.test/v1")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, headers=headers, request=request))
+
+
+async def _fail(exc: BaseException):
+    raise exc
+
+
+async def _ok(value="ok", delay: float = 0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+def test_breaker_opens_after_consecutive_failures_then_probes():
+    async def scenario():
+        router = BackendRouter(failure_threshold=2, reset_seconds=0.05, hedge=False)
+        for _ in range(2):
+            with pytest.raises(httpx.ConnectError):
+                await router.call("groq", lambda: _fail(httpx.ConnectError("down")))
+        backend = router.backend("groq")
+        assert backend.breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await router.call("groq", _ok)
+        assert backend.short_circuited == 1
+
+        await asyncio.sleep(0.06)
+        assert await router.call("groq", _ok) == "ok"
+        assert backend.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_failed_probe_reopens_the_circuit():
+    async def scenario():
+        router = BackendRouter(failure_threshold=1, reset_seconds=0.02, hedge=False)
+        with pytest.raises(httpx.ConnectError):
+            await router.call("groq", lambda: _fail(httpx.ConnectError("down")))
+        await asyncio.sleep(0.03)
+        with pytest.raises(httpx.ConnectError):
+            await router.call("groq", lambda: _fail(httpx.ConnectError("still down")))
+        assert router.backend("groq").breaker.state == "open"
+        assert router.backend("groq").breaker.opened == 2
+
+    asyncio.run(scenario())
+
+
+def test_client_errors_do_not_count_against_the_backend():
+    async def scenario():
+        router = BackendRouter(failure_threshold=1, hedge=False)
+        with pytest.raises(httpx.HTTPStatusError):
+            await router.call("groq", lambda: _fail(_status_error(400)))
+        return router.backend("groq")
+
+    backend = asyncio.run(scenario())
+    assert backend.breaker.state == "closed"
+    assert backend.failures == 0
+
+
+def test_rate_limit_opens_for_retry_after():
+    async def scenario():
+        router = BackendRouter(failure_threshold=5, hedge=False)
+        with pytest.raises(httpx.HTTPStatusError):
+            await router.call("groq", lambda: _fail(_status_error(429, {"Retry-After": "3"})))
+        return router.backend("groq")
+
+    backend = asyncio.run(scenario())
+    assert backend.breaker.state == "open"
+    assert backend.rate_limited == 1
+    assert 2 < backend.breaker.retry_in() <= 3
+
+
+def _router_with_latency(seconds: float, latency_class=None) -> BackendRouter:
+    router = BackendRouter(hedge_min_samples=3, hedge_min_delay=0.01)
+    backend = router.backend("groq")
+    histogram = backend.latency if latency_class is None else backend.class_latency(latency_class)
+    for _ in range(3):
+        histogram.record(seconds)
+    return router
+
+
+def test_no_hedge_before_enough_samples():
+    router = BackendRouter(hedge_min_samples=3)
+    router.backend("groq").latency.record(0.1)
+    assert router.hedge_delay("groq") is None
+
+
+def test_hedge_delay_is_per_latency_class():
+    router = _router_with_latency(2.0, latency_class="long")
+    assert router.hedge_delay("groq", "long") == 2.0
+    assert router.hedge_delay("groq", "short") is None
+
+
+def test_slow_attempt_is_hedged_and_the_loser_cancelled():
+    async def scenario():
+        router = _router_with_latency(0.02)
+        attempts, cancelled = [], []
+
+        async def fn():
+            attempt = len(attempts)
+            attempts.append(attempt)
+            try:
+                await asyncio.sleep(1.0 if attempt == 0 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(attempt)
+                raise
+            return attempt
+
+        started = time.perf_counter()
+        result = await router.call("groq", fn, hedge=True)
+        await asyncio.sleep(0)
+        return result, time.perf_counter() - started, cancelled, router.backend("groq")
+
+    result, elapsed, cancelled, backend = asyncio.run(scenario())
+    assert result == 1
+    assert elapsed < 0.5
+    assert cancelled == [0]
+    assert (backend.hedged, backend.hedge_wins) == (1, 1)
+
+
+def test_fast_attempt_is_not_hedged():
+    async def scenario():
+        router = _router_with_latency(0.5)
+        result = await router.call("groq", lambda: _ok(delay=0.01), hedge=True)
+        return result, router.backend("groq").hedged
+
+    assert asyncio.run(scenario()) == ("ok", 0)
+
+
+def test_cancelling_the_caller_during_the_hedge_delay_cancels_the_attempt():
+    async def scenario():
+        router = _router_with_latency(0.5)
+        cancelled = asyncio.Event()
+
+        async def fn():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        call = asyncio.ensure_future(router.call("groq", fn, hedge=True))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        await asyncio.sleep(0)
+        return cancelled.is_set()
+
+    assert asyncio.run(scenario())
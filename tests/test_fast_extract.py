@@ -0,0 +1,56 @@
+import pytest
+
+from services.fast_extract import DEFAULT_MIN_CONFIDENCE, extract_fields_locally
+
+
+@pytest.mark.parametrize("transcript, goals", [
+    ("I want to get stronger and lose some weight", ["weight_loss", "strength"]),
+    ("build some muscle and improve my endurance", ["muscle_gain", "endurance"]),
+    ("lose weight", ["weight_loss"]),
+    ("I don't want to bulk, just lose weight", ["weight_loss"]),
+    ("not really about strength, more flexibility and mobility", ["flexibility"]),
+])
+def test_goals_resolved_locally(transcript, goals):
+    selections, confidence = extract_fields_locally("goals", transcript)
+    assert selections["goals"] == goals
+    assert confidence >= DEFAULT_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("transcript", [
+    "I want to tone my arms and get stronger",
+    "get stronger and build up my cardio",
+])
+def test_unmatched_goal_words_fall_back_to_llm(transcript):
+    _, confidence = extract_fields_locally("goals", transcript)
+    assert confidence < DEFAULT_MIN_CONFIDENCE
+
+
+def test_no_goal_heard():
+    assert extract_fields_locally("goals", "get fit") == ({"goals": []}, 0.0)
+
+
+def test_basic_fields():
+    selections, confidence = extract_fields_locally(
+        "basic", "I'm thirty-five, a woman, five foot six, 140 pounds and fairly active"
+    )
+    assert selections["age"] == 35
+    assert selections["gender"] == "female"
+    assert selections["height_cm"] == 167.6
+    assert selections["weight_kg"] == 63.5
+    assert selections["activity_level"] == "moderately_active"
+    assert confidence == 1.0
+
+
+@pytest.mark.parametrize("transcript, equipment", [
+    ("I don't have a gym, just bodyweight", ["bodyweight"]),
+    ("I have no dumbbells, only resistance bands", ["resistance_bands"]),
+    ("no equipment at home", ["bodyweight"]),
+])
+def test_negated_equipment(transcript, equipment):
+    selections, _ = extract_fields_locally("final", transcript)
+    assert selections["equipment"] == equipment
+
+
+def test_injury_cues_lower_final_confidence():
+    _, confidence = extract_fields_locally("final", "dumbbells in the morning, but my knee hurts")
+    assert confidence < DEFAULT_MIN_CONFIDENCE
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from services.plan_jobs import MAX_PRIORITY, PlanJobQueue, check_callback_url
+from services.profiles import create_user_profile
+
+
+class FakeOrchestrator:
+    """generate_workout that fails the first ``failures`` calls, then succeeds."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+
+    async def generate_workout(self, user_profile, use_cache=True):
+        self.calls += 1
+        if self.calls <= self.failures:
+            return {"status": "error", "message": "upstream busy"}
+        return {"status": "success", "workout": f"# Weekly Workout Plan for {user_profile.name}", "cached": False}
+
+
+@pytest.fixture
+def profile(final_state):
+    return create_user_profile(final_state)
+
+
+def _queue(tmp_path, orchestrator=None, **kwargs) -> PlanJobQueue:
+    return PlanJobQueue(str(tmp_path / "jobs.db"), orchestrator or FakeOrchestrator(), **kwargs)
+
+
+async def _wait_for(queue: PlanJobQueue, job_id: str, status: str, timeout: float = 2.0) -> dict:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while (record := queue.get(job_id))["status"] != status:
+        assert asyncio.get_running_loop().time() < deadline, record
+        await asyncio.sleep(0.01)
+    return record
+
+
+def test_claims_highest_priority_first_and_clamps(tmp_path, profile):
+    queue = _queue(tmp_path)
+    low = queue.submit("a", profile, priority=-1)
+    high = queue.submit("b", profile, priority=100)
+    assert high["priority"] == MAX_PRIORITY
+    assert queue._claim()["job_id"] == high["job_id"]
+    assert queue._claim()["job_id"] == low["job_id"]
+    assert queue._claim() is None
+
+
+def test_resubmission_returns_the_existing_job(tmp_path, profile):
+    queue = _queue(tmp_path)
+    first = queue.submit("a", profile)
+    again = queue.submit("a", profile)
+    assert again["job_id"] == first["job_id"]
+    assert again["deduplicated"] is True
+    assert queue.submit("a", profile, use_cache=False)["job_id"] == first["job_id"]
+
+
+def test_expired_lease_is_claimed_again(tmp_path, profile):
+    queue = _queue(tmp_path, lease_seconds=0.0)
+    job = queue.submit("a", profile)
+    assert queue._claim()["attempts"] == 1
+    reclaimed = queue._claim()
+    assert reclaimed["job_id"] == job["job_id"]
+    assert reclaimed["attempts"] == 2
+
+
+def test_failed_attempts_are_retried(tmp_path, profile):
+    async def scenario():
+        finished = []
+        queue = _queue(tmp_path, FakeOrchestrator(failures=2), retry_seconds=0.01, workers=1, on_success=finished.append)
+        job = queue.submit("a", profile)
+        queue.start()
+        try:
+            record = await _wait_for(queue, job["job_id"], "succeeded")
+        finally:
+            await queue.stop()
+        return record, queue.stats(), finished
+
+    record, stats, finished = asyncio.run(scenario())
+    assert record["attempts"] == 3
+    assert record["workout"] == "# Weekly Workout Plan for Sam"
+    assert stats["retries"] == 2
+    assert [job["job_id"] for job in finished] == [record["job_id"]]
+
+
+def test_job_fails_after_max_attempts(tmp_path, profile):
+    async def scenario():
+        queue = _queue(tmp_path, FakeOrchestrator(failures=10), retry_seconds=0.01, max_attempts=2, workers=1)
+        job = queue.submit("a", profile)
+        queue.start()
+        try:
+            return await _wait_for(queue, job["job_id"], "failed")
+        finally:
+            await queue.stop()
+
+    record = asyncio.run(scenario())
+    assert record["attempts"] == 2
+    assert record["error"] == "upstream busy"
+
+
+@pytest.mark.parametrize("url, hosts", [
+    ("ftp://hooks.example.com/done", {"hooks.example.com"}),
+    ("https://other.example.org/done", {"hooks.example.com"}),
+    ("https://evilexample.com/done", {".example.com"}),
+    ("http://localhost:8000/done", {"localhost"}),
+    ("http://169.254.169.254/latest/meta-data", {"169.254.169.254"}),
+    ("http://10.0.0.5/done", {"10.0.0.5"}),
+    ("http://[::ffff:127.0.0.1]/done", {"::ffff:127.0.0.1"}),
+])
+def test_callback_url_rejected(url, hosts):
+    with pytest.raises(ValueError):
+        asyncio.run(check_callback_url(url, hosts))
+
+
+@pytest.mark.parametrize("url, hosts, allow_private", [
+    ("https://8.8.8.8/done", {"8.8.8.8"}, False),
+    ("https://hooks.example.com/done", {".example.com"}, True),
+    ("http://localhost:8000/done", {"localhost"}, True),
+])
+def test_callback_url_allowed(url, hosts, allow_private):
+    asyncio.run(check_callback_url(url, hosts, allow_private))
+
+
+def test_callbacks_disabled_without_allowed_hosts(tmp_path):
+    with pytest.raises(ValueError, match="not enabled"):
+        asyncio.run(_queue(tmp_path).check_callback("https://8.8.8.8/done"))
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight, request_key
+
+
+def test_request_key_ignores_argument_order():
+    assert request_key(a=1, b=[1, 2]) == request_key(b=[1, 2], a=1)
+    assert request_key(a=1) != request_key(a=2)
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    async def scenario():
+        flight, calls = SingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "plan"
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["plan"] * 5
+    assert len(calls) == 1
+    assert stats["deduplicated"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_cancelled_waiter_leaves_the_call_to_the_others():
+    async def scenario():
+        flight = SingleFlight()
+        upstream_cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                upstream_cancelled.set()
+                raise
+            return "plan"
+
+        first = asyncio.ensure_future(flight.do("k", fetch))
+        second = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return result, upstream_cancelled.is_set(), flight.cancelled
+
+    assert asyncio.run(scenario()) == ("plan", False, 0)
+
+
+def test_last_waiter_leaving_cancels_the_call():
+    async def scenario():
+        flight = SingleFlight()
+        upstream_cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                upstream_cancelled.set()
+                raise
+
+        waiters = [asyncio.ensure_future(flight.do("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        return upstream_cancelled.is_set(), flight.cancelled, flight.stats()["in_flight"]
+
+    assert asyncio.run(scenario()) == (True, 1, 0)
+
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(3)), return_exceptions=True)
+
+    assert [str(error) for error in asyncio.run(scenario())] == ["upstream down"] * 3
@@ -0,0 +1,44 @@
+import pytest
+
+from models.schemas import Basics, ChatStage, ConversationState
+from services.plan_engine import PlanEngine
+from services.profiles import create_user_profile
+from services.state_codec import decode_state, encode_state
+from services.structured_plan import plan_from_markdown
+
+
+def test_round_trip_without_answers():
+    state = ConversationState(session_id="not-a-uuid", stage=ChatStage.BASIC, missing=["age", "gender"])
+    assert decode_state(encode_state(state)) == state
+
+
+def test_round_trip_with_plan(final_state):
+    profile = create_user_profile(final_state)
+    final_state.workout = PlanEngine().build(profile)
+    final_state.plan = plan_from_markdown(final_state.workout, profile)
+    assert final_state.plan is not None
+
+    data = encode_state(final_state)
+    assert decode_state(data) == final_state
+    assert len(data) < len(final_state.model_dump_json())
+
+
+@pytest.mark.parametrize("basics", [
+    Basics(age=40, gender="robot", activity_level="sometimes"),
+    Basics(height_cm=180.123456, weight_kg=72.0),
+    Basics(),
+])
+def test_round_trip_unusual_basics(basics):
+    state = ConversationState(session_id="s", stage=ChatStage.GOALS, basics=basics)
+    assert decode_state(encode_state(state)) == state
+
+
+def test_free_text_workout_round_trips():
+    state = ConversationState(session_id="s", stage=ChatStage.FINAL, workout="Walk 20 min – daily. ✅\n" * 20)
+    assert decode_state(encode_state(state)) == state
+
+
+def test_rejects_truncated_payload(final_state):
+    data = encode_state(final_state)
+    with pytest.raises(ValueError):
+        decode_state(data[: len(data) // 2])
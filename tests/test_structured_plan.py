@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from services.plan_engine import PlanEngine, default_modifications, default_tips
+from services.profiles import create_user_profile
+from services.structured_plan import PLAN_SCHEMA_EXAMPLE, parse_structured_plan, plan_from_markdown, render_plan
+
+
+def test_parse_ignores_surrounding_prose():
+    plan = parse_structured_plan(f"Here is the plan:\n```json\n{PLAN_SCHEMA_EXAMPLE}\n```")
+    assert plan.days_per_week == 4
+    assert [day.title for day in plan.days] == ["Lower Body", "Rest"]
+    assert plan.tips is None
+
+
+@pytest.mark.parametrize("reply", [
+    "Sorry, I cannot help with that.",
+    json.dumps({"days_per_week": 4, "split": "full body"}),
+    json.dumps({"days_per_week": 9, "split": "x", "days": [{"title": "A"}]}),
+])
+def test_parse_rejects_invalid_replies(reply):
+    with pytest.raises(ValueError):
+        parse_structured_plan(reply)
+
+
+def test_render_fills_profile_defaults(final_state):
+    profile = create_user_profile(final_state)
+    markdown = render_plan(parse_structured_plan(PLAN_SCHEMA_EXAMPLE), profile)
+    assert markdown.startswith("# Weekly Workout Plan\n## Overview\n- Days per week: 4\n")
+    assert "## Day 2 – Rest" in markdown
+    assert "- Knee: swap lunges for hip hinges" in markdown
+    for tip in default_tips(profile):
+        assert f"- {tip}" in markdown
+
+
+def test_engine_plan_round_trips(final_state):
+    profile = create_user_profile(final_state)
+    markdown = PlanEngine().build(profile)
+    plan = plan_from_markdown(markdown, profile)
+    assert plan is not None
+    assert render_plan(plan, profile) == markdown
+    assert plan.modifications == default_modifications(profile)
+
+
+def test_free_form_markdown_is_not_a_structured_plan(final_state):
+    assert plan_from_markdown("# My plan\n\nRun every day.", create_user_profile(final_state)) is None